@@ -0,0 +1,209 @@
+"""
+Análisis de pérdidas sobre el historial de sacos (vectorizado con pandas/NumPy)
+
+Lee la exportación columnar de `sacos` (ver exportar.py) y calcula en una
+sola pasada, por día/fábrica y por día/fábrica/lote:
+
+- sacos pesados y tasa FUERA_RANGO (el `estado` que guardó la estación, con
+  la tolerancia que tenía en ese momento),
+- kg faltantes y unidades faltantes estimadas (`diferencia / peso_base`),
+- percentiles de la diferencia (p05, p50, p95).
+
+El resumen por día/fábrica se sube a `perdidas` con `tipo = 'PESAJE'`
+(upsert por fecha + fábrica + tipo). Cada corrida solo recalcula los días
+que recibieron sacos nuevos desde la anterior (`_perdidas_marca.json`).
+
+Uso:
+    python analisis_perdidas.py --exportar          # exporta sacos nuevos y recalcula
+    python analisis_perdidas.py --todo --reporte perdidas.csv --sin-subir
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from exportar import cargar, exportar_tabla, DIRECTORIO_EXPORTES, SUPABASE_URL, SUPABASE_KEY
+
+# ==================== CONFIGURACIÓN ====================
+
+TIPO_PERDIDA = 'PESAJE'     # Valor de perdidas.tipo para las filas de este análisis
+UNIDADES_POR_LOTE = {'ATUN-5': 5, 'PALM-3': 3}  # Códigos de PRODUCTOS en las estaciones
+TAMANO_UPSERT = 500
+MARCA_ANALISIS = '_perdidas_marca.json'
+
+# ========================================================
+
+
+def unidades_por_saco(lotes: pd.Series) -> np.ndarray:
+    """Unidades de cada saco según el lote (ATUN-5 → 5); sin dato → NaN"""
+    # Se resuelve una vez por lote distinto y se expande con los códigos de la categoría
+    lotes = lotes.astype('category')
+    distintos = pd.Series(lotes.cat.categories.astype(str))
+    sufijo = pd.to_numeric(distintos.str.extract(r'-(\d+)$')[0], errors='coerce')
+    por_lote = distintos.map(UNIDADES_POR_LOTE).astype('float64').fillna(sufijo).to_numpy(dtype='float64')
+    return np.append(por_lote, np.nan)[lotes.cat.codes.to_numpy()]  # código -1 (nulo) → NaN
+
+
+def preparar(sacos: pd.DataFrame) -> pd.DataFrame:
+    """Columnas derivadas por saco, todas calculadas sobre arreglos completos"""
+    objetivo = sacos['peso_objetivo'].to_numpy(dtype='float64')
+    real = sacos['peso_real'].to_numpy(dtype='float64')
+    diferencia = real - objetivo
+
+    unidades = unidades_por_saco(sacos['lote'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        peso_base = np.where(unidades > 0, objetivo / unidades, np.nan)
+        # Unidades que faltan en cada saco (una lata de menos = 1); los sacos con sobrepeso no restan
+        faltantes = np.rint(np.clip(-diferencia / peso_base, 0, None))
+
+    zona = datetime.now().astimezone().tzinfo
+    return pd.DataFrame({
+        'dia': sacos['fecha_pesaje'].dt.tz_convert(zona).dt.tz_localize(None).dt.normalize(),
+        'fabrica_id': sacos['fabrica_id'],
+        'lote': sacos['lote'].astype('string').fillna('SIN-LOTE'),
+        'diferencia': diferencia,
+        'fuera_rango': (sacos['estado'] == 'FUERA_RANGO').to_numpy(dtype=bool, na_value=False),
+        'kg_faltantes': np.clip(-diferencia, 0, None),
+        'unidades_esperadas': unidades,
+        'unidades_faltantes': np.nan_to_num(faltantes),
+    })
+
+
+def resumir(base: pd.DataFrame, claves: list) -> pd.DataFrame:
+    """Agregados por grupo (una sola pasada de groupby)"""
+    grupos = base.groupby(claves, dropna=False, sort=True, observed=True)
+    resumen = grupos.agg(
+        sacos=('diferencia', 'size'),
+        fuera_rango=('fuera_rango', 'sum'),
+        kg_faltantes=('kg_faltantes', 'sum'),
+        unidades_esperadas=('unidades_esperadas', 'sum'),
+        unidades_faltantes=('unidades_faltantes', 'sum'),
+        diferencia_media=('diferencia', 'mean'),
+    )
+    percentiles = grupos['diferencia'].quantile([0.05, 0.5, 0.95]).unstack()
+    resumen[['diferencia_p05', 'diferencia_p50', 'diferencia_p95']] = percentiles.to_numpy()
+    resumen['tasa_fuera_rango'] = resumen['fuera_rango'] / resumen['sacos']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resumen['porcentaje_perdida'] = np.where(
+            resumen['unidades_esperadas'] > 0,
+            resumen['unidades_faltantes'] / resumen['unidades_esperadas'] * 100, 0.0)
+    return resumen.reset_index()
+
+
+def analizar(sacos: pd.DataFrame) -> dict:
+    """{'dia_fabrica': DataFrame, 'dia_fabrica_lote': DataFrame}"""
+    base = preparar(sacos)
+    return {
+        'dia_fabrica': resumir(base, ['dia', 'fabrica_id']),
+        'dia_fabrica_lote': resumir(base, ['dia', 'fabrica_id', 'lote']),
+    }
+
+
+def filas_perdidas(resumen: pd.DataFrame, valor_unidad: float = None) -> list:
+    """Convierte el resumen por día/fábrica en filas de la tabla perdidas"""
+    fabricas = resumen['fabrica_id'].astype('Int64')
+    valores = (resumen['unidades_faltantes'] * valor_unidad).round(2) if valor_unidad else None
+    return [
+        {
+            'fecha': dia.date().isoformat(),
+            'fabrica_id': None if pd.isna(fabrica) else int(fabrica),
+            'cantidad_perdida': int(faltantes),
+            'porcentaje_perdida': round(float(porcentaje), 4),
+            'valor_estimado': None if valores is None else float(valores.iat[i]),
+            'tipo': TIPO_PERDIDA,
+        }
+        for i, (dia, fabrica, faltantes, porcentaje) in enumerate(zip(
+            resumen['dia'], fabricas, resumen['unidades_faltantes'], resumen['porcentaje_perdida']))
+    ]
+
+
+def subir_perdidas(supabase, filas: list, tamano=TAMANO_UPSERT) -> int:
+    """Upsert en lotes; volver a correr un día reemplaza sus filas en vez de duplicarlas"""
+    for i in range(0, len(filas), tamano):
+        (supabase.table('perdidas')
+         .upsert(filas[i:i + tamano], on_conflict='fecha,fabrica_id,tipo')
+         .execute())
+    return len(filas)
+
+
+def dias_a_recalcular(directorio=DIRECTORIO_EXPORTES, todo=False):
+    """Días con sacos nuevos desde la última corrida (None = todos) y el id hasta el que se llegó"""
+    marca = {} if todo else leer_marca_analisis(directorio)
+    ids = cargar('sacos', directorio, columnas=['id', 'fecha_pesaje'])
+    if ids.empty:
+        return [], marca.get('id', 0)
+    ultimo_id = int(ids['id'].max())
+    if not marca:
+        return None, ultimo_id
+    nuevos = ids[ids['id'] > marca.get('id', 0)]
+    zona = datetime.now().astimezone().tzinfo
+    dias = nuevos['fecha_pesaje'].dt.tz_convert(zona).dt.date.unique()
+    return sorted(dias), ultimo_id
+
+
+def leer_marca_analisis(directorio=DIRECTORIO_EXPORTES) -> dict:
+    try:
+        with open(os.path.join(directorio, MARCA_ANALISIS), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def guardar_marca_analisis(directorio: str, ultimo_id: int):
+    ruta = os.path.join(directorio, MARCA_ANALISIS)
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'id': ultimo_id, 'actualizado': datetime.now().astimezone().isoformat()}, f, indent=2)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description="Pérdidas por día/fábrica/lote a partir de los sacos pesados")
+    args.add_argument("--directorio", default=DIRECTORIO_EXPORTES, help="Carpeta de exportar.py")
+    args.add_argument("--exportar", action="store_true", help="Exportar antes los sacos nuevos desde Supabase")
+    args.add_argument("--todo", action="store_true", help="Recalcular todo el historial")
+    args.add_argument("--valor-unidad", type=float, help="Valor de una unidad para perdidas.valor_estimado")
+    args.add_argument("--reporte", metavar="CSV", help="Guardar el detalle por día/fábrica/lote")
+    args.add_argument("--sin-subir", action="store_true", help="No escribir en la tabla perdidas")
+    args = args.parse_args(argv)
+
+    supabase = None
+    if args.exportar or not args.sin_subir:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    if args.exportar:
+        exportar_tabla(supabase, 'sacos', args.directorio)
+
+    inicio = time.monotonic()
+    dias, ultimo_id = dias_a_recalcular(args.directorio, args.todo)
+    if dias == []:
+        print("✅ Sin sacos nuevos desde el último análisis")
+        return
+
+    if dias is None:
+        sacos = cargar('sacos', args.directorio)
+    else:
+        sacos = cargar('sacos', args.directorio, desde=dias[0], hasta=dias[-1])
+        sacos = sacos[sacos['dia'].dt.date.isin(dias)]
+    resultados = analizar(sacos)
+    duracion = time.monotonic() - inicio
+    resumen = resultados['dia_fabrica']
+    print(f"📊 {len(sacos)} sacos → {len(resumen)} filas día/fábrica en {duracion:.2f} s "
+          f"({resumen['dia'].nunique()} días)")
+
+    if args.reporte:
+        resultados['dia_fabrica_lote'].to_csv(args.reporte, index=False, float_format='%.4f')
+        print(f"💾 Detalle por lote en {args.reporte}")
+    if not args.sin_subir:
+        n = subir_perdidas(supabase, filas_perdidas(resumen, args.valor_unidad))
+        print(f"☁️ {n} filas actualizadas en perdidas")
+        # Con --sin-subir la marca no avanza: la próxima corrida vuelve a subir esos días
+        guardar_marca_analisis(args.directorio, ultimo_id)
+
+
+if __name__ == "__main__":
+    main()
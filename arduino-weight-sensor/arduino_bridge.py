@@ -4,24 +4,87 @@ Autor: Dashboard Comercial Marisol
 Fecha: Noviembre 2025
 """
 
+import argparse
+import asyncio
+import multiprocessing
 import serial
-import json
+import serial.tools.list_ports
+import queue
 import time
 from datetime import datetime
 import os
 from supabase import create_client, Client
+from dotenv import load_dotenv
+
+from filtros import FiltroEstaciones, METODOS as METODOS_FILTRO
+from metricas import Metricas
+from reduccion import ReductorPesajes
+from resumenes import AcumuladorResumenes, crear_cliente_resumenes
+from protocolo import ParserTramas, TRAMA_JSON, TRAMA_ESTADO
+from spool import SpoolLocal, ReplayerSpool, SPOOL_DB
+from supervisor import SupervisorConexion
+from uploader import UploaderPorLotes
 
 # ==================== CONFIGURACIÓN ====================
 
+# Los valores de .env (o del entorno) tienen prioridad sobre los de este archivo
+load_dotenv()
+
 # Puerto serial del Arduino (cambiar según tu sistema)
 # Windows: 'COM3', 'COM4', etc.
 # Mac/Linux: '/dev/ttyUSB0', '/dev/cu.usbserial', etc.
-ARDUINO_PORT = 'COM3'  # ⚠️ CAMBIAR ESTO
+ARDUINO_PORT = os.getenv('ARDUINO_PORT', 'COM3')  # ⚠️ CAMBIAR ESTO
 BAUD_RATE = 9600
 
 # Credenciales de Supabase (obtener del dashboard)
-SUPABASE_URL = "https://tu-proyecto.supabase.co"  # ⚠️ CAMBIAR ESTO
-SUPABASE_KEY = "tu-anon-key-aqui"  # ⚠️ CAMBIAR ESTO
+SUPABASE_URL = os.getenv('SUPABASE_URL', "https://tu-proyecto.supabase.co")  # ⚠️ CAMBIAR ESTO
+SUPABASE_KEY = os.getenv('SUPABASE_KEY', "tu-anon-key-aqui")  # ⚠️ CAMBIAR ESTO
+# sumar_resumen no acepta la clave anon: clave de servicio o usuario operador para los resúmenes
+SUPABASE_RESUMENES_KEY = os.getenv('SUPABASE_RESUMENES_KEY')
+SUPABASE_RESUMENES_EMAIL = os.getenv('SUPABASE_RESUMENES_EMAIL')
+SUPABASE_RESUMENES_PASSWORD = os.getenv('SUPABASE_RESUMENES_PASSWORD')
+
+# Subida por lotes (el hilo serial nunca espera la red)
+TAMANO_LOTE = 50        # Filas por insert
+INTERVALO_LOTE = 1.0    # Segundos máximos antes de enviar un lote incompleto
+CAPACIDAD_COLA = 10000  # Registros en memoria antes de descartar
+
+# Varias balanzas en un mismo PC (--puertos auto | COM3=Linea-1,COM4=Linea-2)
+CAPACIDAD_TRAMAS = 5000  # Tramas leídas y aún no procesadas (entre todas las balanzas)
+VIDS_ARDUINO = {0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4}  # Arduino, CH340, FTDI, CP210x
+TEXTOS_ARDUINO = ('arduino', 'ch340', 'usb-serial', 'usb serial')
+
+# Supervisión de la conexión (el sketch manda HEARTBEAT cada 2 s y una lectura cada 500 ms)
+PLAZO_SILENCIO = float(os.getenv('PLAZO_SILENCIO', '6'))  # Segundos sin tramas para dar la balanza por caída
+ESPERA_RECONEXION_MAX = 30.0                              # Tope del backoff entre intentos de reabrir
+
+# Reducción antes de subir (evita llenar pesajes_tiempo_real con lecturas repetidas)
+REDUCCION_BANDA_KG = 0.005       # Cambio mínimo de peso para emitir una fila
+REDUCCION_INTERVALO_MIN = 0.5    # Segundos mínimos entre filas de una misma balanza
+REDUCCION_INTERVALO_MAX = 60.0   # Una fila cada tantos segundos aunque nada cambie
+REDUCCION_VENTANA_S = 0.0        # > 0: una fila agregada (media/mín/máx/cantidad) por ventana
+REDUCCION_AL_ESTABILIZAR = True  # Emitir siempre la lectura en que el peso se asienta
+
+# Filtrado en el PC antes de reducir y subir (filtros.py): mediana + EMA/Kalman y seguimiento de cero
+FILTRO_METODO = os.getenv('FILTRO', 'ninguno')  # ninguno | mediana | ema | kalman
+FILTRO_MEDIANA = 3                              # Muestras de la mediana (el sketch JSON manda 2 por segundo)
+FILTRO_LOTE = 256                               # Tramas que se filtran juntas como máximo
+
+# Resúmenes por fábrica/hora/día/estado para el dashboard (tabla resumen_pesajes)
+INTERVALO_RESUMENES = 30.0  # Segundos entre envíos de los totales acumulados
+
+# Modo --procesos: un proceso por balanza; la última lectura de cada una va al tablero compartido
+TABLERO_NOMBRE = os.getenv('TABLERO_NOMBRE', 'pesos_bridge')  # python tablero.py --nombre ... para verlo
+
+# Modo --async: todas las balanzas en un event loop y varios inserts en paralelo
+EN_VUELO_ASYNC = 8  # Lotes enviados a Supabase sin esperar respuesta
+
+# Spool local: las lecturas se guardan primero en SQLite y se suben en segundo plano
+SPOOL_RUTA = os.getenv('SPOOL_RUTA', SPOOL_DB)
+
+# Métricas por etapa (lectura, parseo, colas, insert HTTP): http://127.0.0.1:<puerto>/metrics
+METRICAS_PUERTO = int(os.getenv('METRICAS_PUERTO', '0'))  # 0 = sin endpoint
+METRICAS_JSON = os.getenv('METRICAS_JSON')                  # Ruta de un JSON reescrito cada 10 s
 
 # ========================================================
 
@@ -35,93 +98,496 @@ def inicializar_supabase() -> Client:
         print(f"❌ Error conectando a Supabase: {e}")
         return None
 
-def inicializar_arduino() -> serial.Serial:
+def inicializar_arduino(puerto: str = ARDUINO_PORT, esperar: bool = True) -> serial.Serial:
     """Inicializa la conexión serial con Arduino"""
     try:
-        ser = serial.Serial(ARDUINO_PORT, BAUD_RATE, timeout=1)
-        time.sleep(2)  # Esperar a que Arduino se inicialice
-        print(f"✅ Conectado a Arduino en {ARDUINO_PORT}")
+        ser = serial.Serial(puerto, BAUD_RATE, timeout=1)
+        if esperar:
+            time.sleep(2)  # Esperar a que Arduino se inicialice
+        print(f"✅ Conectado a Arduino en {puerto}")
         return ser
     except Exception as e:
-        print(f"❌ Error conectando a Arduino: {e}")
-        print("Puertos disponibles:")
-        import serial.tools.list_ports
-        for port in serial.tools.list_ports.comports():
-            print(f"  - {port.device}: {port.description}")
+        print(f"❌ Error conectando a Arduino en {puerto}: {e}")
+        listar_puertos()
         return None
 
-def enviar_a_supabase(supabase: Client, datos: dict):
-    """Envía los datos del peso a Supabase"""
-    try:
-        # Preparar datos para insertar
-        registro = {
-            'peso_actual': datos['peso'],
-            'peso_objetivo': datos['objetivo'],
-            'diferencia': datos['diferencia'],
-            'codigo_saco': datos['codigo_saco'],
-            'fabrica': datos['fabrica'],
-            'timestamp': datetime.now().isoformat(),
-            'estado': 'OK' if abs(datos['diferencia']) <= 0.005 else 'FUERA_RANGO'
-        }
-        
-        # Insertar en la tabla
-        response = supabase.table('pesajes_tiempo_real').insert(registro).execute()
-        
-        print(f"📊 Peso registrado: {datos['peso']:.3f} kg | Dif: {datos['diferencia']:+.3f} kg | {datos['codigo_saco']}")
-        return True
-        
-    except Exception as e:
-        print(f"⚠️ Error enviando a Supabase: {e}")
+def listar_puertos():
+    print("Puertos disponibles:")
+    for port in serial.tools.list_ports.comports():
+        print(f"  - {port.device}: {port.description}")
+
+def descubrir_puertos() -> list:
+    """Devuelve los puertos que parecen ser un Arduino (por VID o descripción)"""
+    puertos = []
+    for port in serial.tools.list_ports.comports():
+        descripcion = (port.description or "").lower()
+        if port.vid in VIDS_ARDUINO or any(t in descripcion for t in TEXTOS_ARDUINO):
+            puertos.append(port.device)
+    return sorted(puertos)
+
+def parsear_puertos(texto: str) -> list:
+    """'auto' o 'COM3=Linea-1,COM4' → [(puerto, estacion)]"""
+    if texto.strip().lower() == 'auto':
+        return [(p, p) for p in descubrir_puertos()]
+
+    puertos = []
+    for item in texto.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        puerto, _, estacion = item.partition('=')
+        puertos.append((puerto.strip(), estacion.strip() or puerto.strip()))
+    return puertos
+
+def etiquetar(estacion: str, parser: ParserTramas):
+    """Envuelve el parser para que cada trama lleve la estación que la leyó"""
+    def parsear(linea: bytes):
+        trama = parser.parsear(linea)
+        return (estacion, trama) if trama is not None else None
+    return parsear
+
+def armar_registro(datos: dict, estacion: str = None) -> dict:
+    """Fila de pesajes_tiempo_real a partir de una trama JSON"""
+    return {
+        'peso_actual': datos['peso'],
+        'peso_objetivo': datos['objetivo'],
+        'diferencia': datos['diferencia'],
+        'codigo_saco': datos.get('codigo_saco', 'SIN-CODIGO'),
+        'fabrica': datos.get('fabrica', 'SIN-FABRICA'),
+        'timestamp': datetime.now().isoformat(),
+        'estado': 'OK' if abs(datos['diferencia']) <= 0.005 else 'FUERA_RANGO',
+        'estacion': estacion
+    }
+
+def enviar_a_supabase(uploader: UploaderPorLotes, reductor: ReductorPesajes, datos: dict,
+                      estacion: str = None, instante: float = 0.0, verboso: bool = True):
+    """Arma el registro, lo pasa por el reductor y encola las filas resultantes"""
+    for fila in reductor.procesar(armar_registro(datos, estacion), estacion, instante):
+        encolar_fila(uploader, fila, verboso)
+
+def encolar_fila(uploader: UploaderPorLotes, fila: dict, verboso: bool = True):
+    if not uploader.encolar(fila):
+        print("⚠️ Cola de subida llena, lectura descartada")
         return False
 
-def main():
+    if verboso:
+        imprimir_fila(fila)
+    return True
+
+def imprimir_fila(fila: dict):
+    print(f"📊 [{fila['estacion']}] Peso registrado: {fila['peso_actual']:.3f} kg | "
+          f"Dif: {fila['diferencia']:+.3f} kg | {fila['codigo_saco']}")
+
+def crear_reductor(args) -> ReductorPesajes:
+    if args.sin_reduccion:
+        return ReductorPesajes(banda_muerta_kg=0.0, intervalo_min=0.0)
+    return ReductorPesajes(
+        banda_muerta_kg=REDUCCION_BANDA_KG,
+        intervalo_min=REDUCCION_INTERVALO_MIN,
+        intervalo_max=REDUCCION_INTERVALO_MAX,
+        ventana_s=args.ventana,
+        emitir_al_estabilizar=REDUCCION_AL_ESTABILIZAR,
+    )
+
+def iniciar_metricas(args) -> Metricas:
+    metricas = Metricas()
+    if args.metricas_puerto:
+        puerto = metricas.servir(args.metricas_puerto)
+        print(f"📊 Métricas en http://127.0.0.1:{puerto}/metrics (y /metrics.json)")
+    if args.metricas_json:
+        metricas.volcar_periodicamente(args.metricas_json)
+    return metricas
+
+def registrar_indicadores(metricas: Metricas, lectores: dict, parsers: dict, reductor: ReductorPesajes, cola):
+    """Los contadores que ya llevan lectores, parsers y reductor se leen al exponer (costo cero por trama)"""
+    lectores = list(lectores.values())
+    metricas.indicador('tramas_leidas', lambda: sum(l.lineas for l in lectores), 'Líneas recibidas')
+    metricas.indicador('tramas_descartadas', lambda: sum(l.descartadas for l in lectores),
+                       'Tramas perdidas por cola de tramas llena')
+    metricas.indicador('tramas_malformadas', lambda: sum(p.contadores['malformadas'] for p in parsers.values()),
+                       'Errores de parseo')
+    metricas.indicador('profundidad_cola_tramas', cola.qsize, 'Tramas leídas sin procesar')
+    metricas.indicador('lecturas_reductor', lambda: reductor.entrada, 'Lecturas que entraron al reductor')
+    metricas.indicador('filas_reductor', lambda: reductor.salida, 'Filas que emitió el reductor')
+    return metricas.histograma('espera_cola_tramas', 'Trama leída → procesada por el bucle principal')
+
+def imprimir_latencias(metricas: Metricas):
+    for etapa, l in metricas.resumen()['latencias_ms'].items():
+        if l['cuenta']:
+            print(f"⏱️ {etapa}: p50 {l['p50']:.2f} ms | p95 {l['p95']:.2f} ms | p99 {l['p99']:.2f} ms ({l['cuenta']})")
+
+def supervisar_puertos(puertos: list, cola, parsers: dict, args, metricas: Metricas, clase=SupervisorConexion) -> dict:
+    """{estacion: supervisor}: cada uno abre su puerto y lo reabre si se cae o deja de mandar tramas"""
+    return {
+        estacion: clase(puerto, BAUD_RATE, cola, etiquetar(estacion, parsers[estacion]), nombre=estacion,
+                        plazo=args.plazo, espera_max=ESPERA_RECONEXION_MAX, metricas=metricas).iniciar()
+        for puerto, estacion in puertos
+    }
+
+def crear_filtro(args, puertos: list):
+    if args.filtro == 'ninguno':
+        return None
+    return FiltroEstaciones([estacion for _, estacion in puertos], metodo=args.filtro, mediana=FILTRO_MEDIANA)
+
+def drenar_cola(cola, maximo: int) -> list:
+    """Lo que ya esté en la cola (hasta `maximo`), sin esperar; sirve para queue.Queue y asyncio.Queue"""
+    items = []
+    while len(items) < maximo:
+        try:
+            items.append(cola.get_nowait())
+        except (queue.Empty, asyncio.QueueEmpty):
+            break
+    return items
+
+def filtrar_lote(filtro: FiltroEstaciones, items: list) -> list:
+    """Separa las lecturas JSON de un lote y las filtra todas juntas; devuelve [(instante, estacion, tipo, datos)]"""
+    tramas = [(instante, estacion, tipo, datos) for instante, (estacion, (tipo, datos)) in items]
+    if filtro:
+        lecturas = [(instante, estacion, datos) for instante, estacion, tipo, datos in tramas if tipo == TRAMA_JSON]
+        if lecturas:
+            filtro.aplicar(lecturas)
+    return tramas
+
+def imprimir_filtro(filtro: FiltroEstaciones):
+    if filtro:
+        for estacion, e in filtro.estadisticas().items():
+            print(f"🎚️ [{estacion}] Cero: {e['cero_kg']:+.4f} kg | Deriva: {e['deriva_kg_h']:+.5f} kg/h | "
+                  f"Escalones: {e['saltos']}")
+
+def crear_resumenes(args, metricas: Metricas):
+    if args.sin_resumenes:
+        return None
+    cliente = crear_cliente_resumenes(SUPABASE_URL, SUPABASE_KEY, SUPABASE_RESUMENES_KEY,
+                                      SUPABASE_RESUMENES_EMAIL, SUPABASE_RESUMENES_PASSWORD)
+    if cliente is None:
+        print("⚠️ Resúmenes desactivados: sumar_resumen no acepta la clave anon. Configura "
+              "SUPABASE_RESUMENES_KEY o SUPABASE_RESUMENES_EMAIL/PASSWORD, o usa --sin-resumenes")
+        return None
+    return AcumuladorResumenes(cliente, INTERVALO_RESUMENES, metricas=metricas).iniciar()
+
+def detener_resumenes(resumenes: AcumuladorResumenes):
+    if resumenes is None:
+        return
+    resumenes.detener()
+    print(f"🧮 Resúmenes: {resumenes.filas} filas → {resumenes.enviadas} celdas enviadas | "
+          f"Pendientes: {resumenes.pendientes}")
+
+def imprimir_conexiones(supervisores: dict):
+    for estacion, s in supervisores.items():
+        e = s.estadisticas()
+        print(f"🔌 [{estacion}] Caídas: {e['caidas']} | Reconexiones: {e['reconexiones']} | "
+              f"Sin conexión: {e['segundos_caido']:.1f} s | Disponibilidad: {e['disponibilidad']:.2%}")
+
+def main(argv=None):
     """Función principal"""
+    args = argparse.ArgumentParser(description="Bridge Arduino → Supabase")
+    args.add_argument("--puertos", help="'auto' o lista 'COM3=Linea-1,COM4=Linea-2' (varias balanzas)")
+    args.add_argument("--sin-reduccion", action="store_true", help="Subir todas las lecturas, sin filtrar")
+    args.add_argument("--ventana", type=float, default=REDUCCION_VENTANA_S,
+                      help="Segundos por fila agregada (media/mín/máx); 0 = banda muerta")
+    args.add_argument("--metricas-puerto", type=int, default=METRICAS_PUERTO,
+                      help="Puerto local del endpoint de métricas (Prometheus / JSON)")
+    args.add_argument("--metricas-json", default=METRICAS_JSON, help="Volcar las métricas a este JSON cada 10 s")
+    args.add_argument("--async", dest="modo_async", action="store_true",
+                      help="Un solo event loop para todas las balanzas y varios inserts en paralelo")
+    args.add_argument("--procesos", action="store_true",
+                      help="Un proceso por balanza (lectura, filtro y reducción en paralelo en varios núcleos)")
+    args.add_argument("--en-vuelo", type=int, default=EN_VUELO_ASYNC, help="Lotes simultáneos en modo --async")
+    args.add_argument("--plazo", type=float, default=PLAZO_SILENCIO,
+                      help="Segundos sin tramas (ni HEARTBEAT) para reabrir el puerto")
+    args.add_argument("--filtro", choices=METODOS_FILTRO, default=FILTRO_METODO,
+                      help="Filtrado de las lecturas y seguimiento de cero antes de subirlas")
+    args.add_argument("--sin-resumenes", action="store_true",
+                      help="No mantener los totales por fábrica/hora/día en resumen_pesajes")
+    args = args.parse_args(argv)
+
     print("\n" + "="*60)
     print("🔗 ARDUINO → DASHBOARD BRIDGE")
     print("="*60 + "\n")
-    
+
+    puertos = parsear_puertos(args.puertos) if args.puertos else [(ARDUINO_PORT, ARDUINO_PORT)]
+    if not puertos:
+        print("❌ No se encontraron balanzas conectadas.")
+        return
+
+    if args.modo_async:
+        try:
+            asyncio.run(main_async(args, puertos))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.procesos:
+        main_procesos(args, puertos)
+        return
+
     # Inicializar conexiones
     supabase = inicializar_supabase()
-    arduino = inicializar_arduino()
-    
-    if not arduino or not supabase:
+    if not supabase:
         print("\n❌ No se pudo inicializar. Verifica la configuración.")
         return
-    
-    print("\n✅ Sistema listo. Esperando datos del Arduino...")
+
+    metricas = iniciar_metricas(args)
+
+    spool = SpoolLocal(SPOOL_RUTA)
+    replayer = ReplayerSpool(spool, supabase, metricas=metricas)
+    replayer.iniciar()
+    pendientes = spool.contar()
+    if pendientes:
+        print(f"📦 {pendientes} lecturas pendientes en el spool, se enviarán en segundo plano")
+
+    resumenes = crear_resumenes(args, metricas)
+
+    def guardar_lote(filas):
+        spool.agregar_lote('pesajes_tiempo_real', filas)
+        replayer.despertar()  # Subir ya, sin esperar al próximo ciclo del replayer
+        if resumenes:
+            resumenes.agregar_lote('pesajes_tiempo_real', filas)
+
+    uploader = UploaderPorLotes(
+        guardar_lote,
+        tamano_lote=TAMANO_LOTE,
+        intervalo_max=INTERVALO_LOTE,
+        capacidad=CAPACIDAD_COLA,
+        metricas=metricas,
+    )
+    uploader.iniciar()
+    reductor = crear_reductor(args)
+
+    # Un supervisor (y su lector) por balanza, todos publican en la misma cola acotada
+    cola = queue.Queue(maxsize=CAPACIDAD_TRAMAS)
+    parsers = {estacion: ParserTramas() for _, estacion in puertos}
+    lectores = supervisar_puertos(puertos, cola, parsers, args, metricas)
+    if not any(s.esperar_conexion(3.0) for s in lectores.values()):
+        listar_puertos()
+        print("⏳ Ninguna balanza respondió todavía; se sigue reintentando en segundo plano")
+    verboso = len(lectores) == 1
+    h_espera_tramas = registrar_indicadores(metricas, lectores, parsers, reductor, cola)
+    filtro = crear_filtro(args, puertos)
+
+    print(f"\n✅ Sistema listo. Esperando datos de {len(lectores)} balanza(s)...")
     print("Presiona Ctrl+C para detener.\n")
-    
+
     try:
         while True:
-            if arduino.in_waiting > 0:
-                linea = arduino.readline().decode('utf-8', errors='ignore').strip()
-                
-                # Buscar líneas que contengan JSON
-                if linea.startswith('{') and linea.endswith('}'):
-                    try:
-                        datos = json.loads(linea)
-                        
-                        # Validar que tenga los campos necesarios
-                        if all(k in datos for k in ['peso', 'objetivo', 'diferencia']):
-                            enviar_a_supabase(supabase, datos)
-                        
-                    except json.JSONDecodeError:
-                        pass  # Ignorar líneas que no sean JSON válido
-                else:
+            try:
+                primero = cola.get(timeout=1.0)
+            except queue.Empty:
+                # Sin tramas: los supervisores se ocupan de reabrir los puertos
+                for fila in reductor.vencidas(time.monotonic()):
+                    encolar_fila(uploader, fila, verboso)
+                continue
+
+            # Con filtro, todo lo que ya llegó se procesa como un bloque
+            items = [primero] + (drenar_cola(cola, FILTRO_LOTE - 1) if filtro else [])
+            for instante, estacion, tipo, datos in filtrar_lote(filtro, items):
+                h_espera_tramas.observar(time.monotonic() - instante)
+                if tipo == TRAMA_JSON:
+                    enviar_a_supabase(uploader, reductor, datos, estacion, instante, verboso)
+                elif tipo == TRAMA_ESTADO and not datos.startswith("Peso:"):
                     # Mostrar otros mensajes del Arduino
-                    if linea and not linea.startswith("Peso:"):
-                        print(f"[Arduino] {linea}")
-            
-            time.sleep(0.1)  # Pequeña pausa para no saturar CPU
-            
+                    print(f"[{estacion}] {datos}")
+
     except KeyboardInterrupt:
         print("\n\n⏹️  Bridge detenido por el usuario")
     except Exception as e:
         print(f"\n❌ Error: {e}")
     finally:
-        if arduino:
-            arduino.close()
-            print("🔌 Puerto serial cerrado")
+        for estacion, lector in lectores.items():
+            lector.detener()
+            print(f"📟 [{estacion}] Tramas: {parsers[estacion].contadores} | Descartadas: {lector.descartadas}")
+        imprimir_conexiones(lectores)
+        imprimir_filtro(filtro)
+        for fila in reductor.vaciar():
+            encolar_fila(uploader, fila, verboso)
+        print(f"🗜️ Reducción: {reductor.entrada} lecturas → {reductor.salida} filas ({reductor.compresion:.1f}:1)")
+        print("⏳ Guardando lecturas pendientes...")
+        uploader.detener()
+        e = uploader.estadisticas()
+        print(f"📈 Guardadas: {e['enviados']} | Descartadas: {e['descartados']} | Pendientes: {e['profundidad_cola']}")
+        detener_resumenes(resumenes)
+        replayer.detener()
+        print(f"📦 Filas en el spool sin subir: {spool.contar()}")
+        imprimir_latencias(metricas)
+        if args.metricas_json:
+            metricas.volcar(args.metricas_json)
+        metricas.detener()
+        spool.cerrar()
+        print("🔌 Puertos seriales cerrados")
+
+async def main_async(args, puertos: list):
+    """Modo --async: un event loop lee todas las balanzas y sube con un pool de conexiones"""
+    from bridge_async import SupervisorAsync, SubidorAsync
+
+    metricas = iniciar_metricas(args)
+    spool = SpoolLocal(SPOOL_RUTA)
+    pendientes = spool.contar()
+    if pendientes:
+        print(f"📦 {pendientes} lecturas pendientes en el spool, se enviarán en segundo plano")
+    subidor = await SubidorAsync(
+        SUPABASE_URL, SUPABASE_KEY,
+        tamano_lote=TAMANO_LOTE,
+        intervalo_max=INTERVALO_LOTE,
+        capacidad=CAPACIDAD_COLA,
+        en_vuelo=args.en_vuelo,
+        spool=spool,
+        metricas=metricas,
+    ).iniciar()
+    print(f"✅ Conectado a Supabase (pool de {args.en_vuelo} conexiones)")
+    # Los resúmenes se envían desde su propio hilo con su propio cliente
+    resumenes = crear_resumenes(args, metricas)
+    reductor = crear_reductor(args)
+
+    cola = asyncio.Queue(maxsize=CAPACIDAD_TRAMAS)
+    parsers = {estacion: ParserTramas() for _, estacion in puertos}
+    lectores = supervisar_puertos(puertos, cola, parsers, args, metricas, clase=SupervisorAsync)
+    for _ in range(60):  # Hasta 3 s para que abra al menos un puerto
+        if any(s.conectado for s in lectores.values()):
+            break
+        await asyncio.sleep(0.05)
+    else:
+        listar_puertos()
+        print("⏳ Ninguna balanza respondió todavía; se sigue reintentando en segundo plano")
+    verboso = len(lectores) == 1
+    h_espera_tramas = registrar_indicadores(metricas, lectores, parsers, reductor, cola)
+    filtro = crear_filtro(args, puertos)
+
+    print(f"\n✅ Sistema listo (modo async). Esperando datos de {len(lectores)} balanza(s)...")
+    print("Presiona Ctrl+C para detener.\n")
+
+    async def subir(filas):
+        for fila in filas:
+            await subidor.poner(fila)  # Espera si la subida va atrasada
+            if verboso:
+                imprimir_fila(fila)
+        if resumenes and filas:
+            resumenes.agregar_lote('pesajes_tiempo_real', filas)
+
+    try:
+        while True:
+            try:
+                primero = await asyncio.wait_for(cola.get(), 1.0)
+            except asyncio.TimeoutError:
+                await subir(reductor.vencidas(time.monotonic()))
+                continue
+
+            items = [primero] + (drenar_cola(cola, FILTRO_LOTE - 1) if filtro else [])
+            for lector in lectores.values():
+                lector.reanudar_si_hay_espacio()
+            for instante, estacion, tipo, datos in filtrar_lote(filtro, items):
+                h_espera_tramas.observar(time.monotonic() - instante)
+                if tipo == TRAMA_JSON:
+                    await subir(reductor.procesar(armar_registro(datos, estacion), estacion, instante))
+                elif tipo == TRAMA_ESTADO and not datos.startswith("Peso:"):
+                    print(f"[{estacion}] {datos}")
+
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n\n⏹️  Bridge detenido por el usuario")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+    finally:
+        for estacion, lector in lectores.items():
+            lector.detener()
+            print(f"📟 [{estacion}] Tramas: {parsers[estacion].contadores} | "
+                  f"Descartadas: {lector.descartadas} | Pausas de lectura: {lector.pausas}")
+        imprimir_conexiones(lectores)
+        imprimir_filtro(filtro)
+        await subir(reductor.vaciar())
+        print(f"🗜️ Reducción: {reductor.entrada} lecturas → {reductor.salida} filas ({reductor.compresion:.1f}:1)")
+        print("⏳ Guardando lecturas pendientes...")
+        await subidor.detener()
+        e = subidor.estadisticas()
+        print(f"📈 Guardadas: {e['enviados'] + e['del_spool']} | Al spool: {e['al_spool']} | "
+              f"Errores: {e['errores']}")
+        detener_resumenes(resumenes)
+        print(f"📦 Filas en el spool sin subir: {spool.contar()}")
+        imprimir_latencias(metricas)
+        if args.metricas_json:
+            metricas.volcar(args.metricas_json)
+        metricas.detener()
+        spool.cerrar()
+        print("🔌 Puertos seriales cerrados")
+
+def main_procesos(args, puertos: list):
+    """Modo --procesos: cada balanza en su proceso; aquí solo se leen el tablero y se sube el spool"""
+    from bridge_procesos import trabajar_estacion
+    from tablero import TableroPesos
+
+    supabase = inicializar_supabase()
+    if not supabase:
+        print("\n❌ No se pudo inicializar. Verifica la configuración.")
+        return
+    metricas = iniciar_metricas(args)
+    spool = SpoolLocal(SPOOL_RUTA)
+    replayer = ReplayerSpool(spool, supabase, metricas=metricas)
+    replayer.iniciar()
+    pendientes = spool.contar()
+    if pendientes:
+        print(f"📦 {pendientes} lecturas pendientes en el spool, se enviarán en segundo plano")
+
+    estaciones = [estacion for _, estacion in puertos]
+    tablero = TableroPesos.crear(estaciones, TABLERO_NOMBRE)
+    contexto = multiprocessing.get_context('spawn')  # Igual en Windows y Linux; sin heredar hilos
+    detener = contexto.Event()
+    procesos = [
+        contexto.Process(target=trabajar_estacion, args=(i, puerto, estacion, tablero.nombre, detener, args),
+                         name=f"balanza-{estacion}")
+        for i, (puerto, estacion) in enumerate(puertos)
+    ]
+    for proceso in procesos:
+        proceso.start()
+
+    metricas.indicador('tramas_leidas', lambda: int(tablero.leer_todo()['lineas'].sum()), 'Líneas recibidas')
+    metricas.indicador('filas_reductor', lambda: int(tablero.leer_todo()['filas'].sum()),
+                       'Filas guardadas en el spool por los procesos de balanza')
+    for i, estacion in enumerate(estaciones):
+        metricas.indicador(f'peso_{i}', lambda i=i: float(tablero.leer(i)['peso']), f'{estacion}: último peso (kg)')
+
+    limite = time.monotonic() + 10.0  # Cada proceso importa sus módulos y abre su puerto
+    while not tablero.leer_todo()['conectado'].all() and time.monotonic() < limite:
+        time.sleep(0.05)
+    if not tablero.leer_todo()['conectado'].any():
+        listar_puertos()
+        print("⏳ Ninguna balanza respondió todavía; se sigue reintentando en segundo plano")
+
+    print(f"\n✅ Sistema listo (modo procesos). {len(procesos)} balanza(s) en procesos separados; "
+          f"tablero '{tablero.nombre}'")
+    print("Presiona Ctrl+C para detener.\n")
+
+    filas_vistas = 0
+    try:
+        while any(p.is_alive() for p in procesos):
+            time.sleep(0.2)
+            filas = int(tablero.leer_todo()['filas'].sum())
+            if filas != filas_vistas:
+                filas_vistas = filas
+                replayer.despertar()  # Subir ya lo que los procesos dejaron en el spool
+    except KeyboardInterrupt:
+        print("\n\n⏹️  Bridge detenido por el usuario")
+    finally:
+        print("⏳ Deteniendo los procesos de balanza...")
+        detener.set()
+        for proceso in procesos:
+            proceso.join(15)
+            if proceso.is_alive():
+                print(f"⚠️ {proceso.name} no terminó a tiempo, se fuerza")
+                proceso.terminate()
+        for r in tablero.leer_todo():
+            estacion = r['estacion'].decode()
+            print(f"📟 [{estacion}] Tramas: {r['lineas']} | JSON: {r['lecturas']} | "
+                  f"Malformadas: {r['malformadas']} | Descartadas: {r['descartadas']}")
+            print(f"🔌 [{estacion}] Caídas: {r['caidas']} | Reconexiones: {r['reconexiones']}")
+            if args.filtro != 'ninguno':
+                print(f"🎚️ [{estacion}] Cero: {r['cero']:+.4f} kg | Deriva: {r['deriva']:+.5f} kg/h")
+        print(f"📈 Guardadas en el spool: {int(tablero.leer_todo()['filas'].sum())}")
+        replayer.detener()
+        print(f"📦 Filas en el spool sin subir: {spool.contar()}")
+        imprimir_latencias(metricas)
+        if args.metricas_json:
+            metricas.volcar(args.metricas_json)
+        metricas.detener()
+        spool.cerrar()
+        tablero.cerrar()
+        print("🔌 Puertos seriales cerrados")
 
 if __name__ == "__main__":
     main()
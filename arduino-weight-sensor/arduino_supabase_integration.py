@@ -1,30 +1,150 @@
+import time
+ARRANQUE = time.perf_counter()  # Referencia para medir el arranque (antes de los imports)
+
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import serial, threading, csv
+import threading, queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
-from supabase import create_client, Client
+import socket
+import numpy as np
 from dotenv import load_dotenv
 
+from bomba_ui import BombaUI
+from cache_fabricas import CacheFabricas
+from cliente_diferido import ClienteDiferido
+from escaner import AcumuladorTeclado, CicloSacos, cargar_prefijos, decodificar_linea, interpretar
+from estabilidad import DetectorEstabilidad
+from filtros import FiltroBalanzas
+from metricas import Metricas
+from recetas import RegistroRecetas, RECETAS_DB
+from protocolo import BAUD_BINARIO, ParserBinario, ParserTramas, TRAMA_MUESTRA, TRAMA_PESO
+from registro_local import RegistroRotativo, DIRECTORIO_REGISTROS
+from resumenes import AcumuladorResumenes, crear_cliente_resumenes
+from spool import SpoolLocal, ReplayerSpool, SPOOL_DB
+from supervisor import SupervisorConexion
+
 # Cargar variables de entorno
 load_dotenv()
 
 # --- Configuración Supabase ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# sumar_resumen y la escritura de recetas no aceptan la clave anon: usuario operador
+# (usuarios.estacion = ESTACION) o clave de servicio para los resúmenes y las recetas
+SUPABASE_RESUMENES_KEY = os.getenv("SUPABASE_RESUMENES_KEY")
+SUPABASE_RESUMENES_EMAIL = os.getenv("SUPABASE_RESUMENES_EMAIL")
+SUPABASE_RESUMENES_PASSWORD = os.getenv("SUPABASE_RESUMENES_PASSWORD")
+
+def crear_cliente_supabase():
+    # Importar supabase toma ~0.4 s: se hace en el hilo del cliente, no antes de la ventana
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def calentar_supabase(_cliente):
+    """Primera consulta: abre la conexión y deja lista la caché de fábricas"""
+    try:
+        cache_fabricas.precargar()
+    except Exception:
+        cache_fabricas.posponer_refresco()
+        raise
+    marcar_arranque('supabase')
+
+# Se crea en segundo plano al abrir la ventana; se usa igual que el cliente real
+supabase = ClienteDiferido(crear_cliente_supabase, calentar=calentar_supabase)
+
+# --- Métricas por etapa (lectura, guardado, CSV, insert HTTP) ---
+metricas = Metricas(prefijo='estacion')
+METRICAS_PUERTO = int(os.getenv("METRICAS_PUERTO", "0"))  # 0 = sin endpoint
+if METRICAS_PUERTO:
+    metricas.servir(METRICAS_PUERTO)
+h_guardado = metricas.histograma('guardado_saco', 'Spool + CSV de un saco en el hilo de guardado')
+
+# --- Tiempos de arranque (segundos desde que se lanzó el programa) ---
+tiempos_arranque = {}
+
+def marcar_arranque(etapa):
+    """Anota la primera vez que se alcanza una etapa: ventana, supabase, balanza"""
+    if etapa in tiempos_arranque:
+        return
+    tiempos_arranque[etapa] = time.perf_counter() - ARRANQUE
+    metricas.indicador(f'arranque_{etapa}_segundos', lambda: tiempos_arranque[etapa],
+                       f'Segundos desde el inicio hasta {etapa}')
+    print(f"⏱️ Arranque: {etapa} lista en {tiempos_arranque[etapa] * 1000:.0f} ms")
+
+# --- Spool local: los sacos se guardan primero en SQLite y se suben en segundo plano ---
+spool = SpoolLocal(SPOOL_DB)
+replayer = ReplayerSpool(spool, supabase, metricas=metricas)
+
+# --- Guardado en segundo plano (un solo hilo: conserva el orden de los sacos) ---
+ejecutor_guardado = ThreadPoolExecutor(max_workers=1, thread_name_prefix="guardado")
+REINTENTOS_GUARDADO = 3
+
+# --- Totales por fábrica/hora/día/estado de los sacos guardados (tabla resumen_pesajes) ---
+cliente_resumenes = crear_cliente_resumenes(SUPABASE_URL, SUPABASE_KEY, SUPABASE_RESUMENES_KEY,
+                                            SUPABASE_RESUMENES_EMAIL, SUPABASE_RESUMENES_PASSWORD)
+resumenes = AcumuladorResumenes(cliente_resumenes, metricas=metricas) if cliente_resumenes else None
+if resumenes is None:
+    print("⚠️ Resúmenes desactivados: configura SUPABASE_RESUMENES_EMAIL/PASSWORD (usuario operador) "
+          "o SUPABASE_RESUMENES_KEY")
+
+# --- Caché de fábricas (evita una consulta a Supabase por saco) ---
+cache_fabricas = CacheFabricas(supabase)
+
+# --- Backup CSV: un archivo por día en registros/, abierto mientras corre la aplicación ---
+registro_csv = RegistroRotativo([
+    "Fecha",
+    "Código Saco",
+    "Saco Identificado",
+    "Peso Base (kg)",
+    "Peso Objetivo (kg)",
+    "Peso Actual (kg)",
+    "Diferencia (kg)",
+    "Unidades Faltantes/Sobrantes",
+    "Tolerancia",
+    "Resultado"
+], metricas=metricas)
 
 # --- Configuración de conexión Arduino ---
 PORT = 'COM6'
-BAUD = 9600
-arduino = None
+MODO_BINARIO = False  # Debe coincidir con MODO_BINARIO en sketch_pesa_intnuev.ino
+BAUD = BAUD_BINARIO if MODO_BINARIO else 9600
+PLAZO_SILENCIO = 6.0  # Segundos sin tramas (ni HEARTBEAT) para dar la balanza por desconectada
+cola_serial = queue.Queue(maxsize=1000)
+parser = ParserBinario() if MODO_BINARIO else ParserTramas()
+# Abre el puerto en segundo plano y lo reabre si se cae o deja de mandar tramas
+supervisor = SupervisorConexion(PORT, BAUD, cola_serial, parser, plazo=PLAZO_SILENCIO,
+                                separar=parser.separar if MODO_BINARIO else None,
+                                al_conectar=lambda _: marcar_arranque('balanza'), metricas=metricas)
 running = True
-
-# --- Datos de producto ---
-PRODUCTOS = {
-    "ATUN": {"nombre": "Saco de 5 latas de Atún", "unidades": 5, "codigo": "ATUN-5"},
-    "PALMITO": {"nombre": "Saco de 3 latas de Palmitos", "unidades": 3, "codigo": "PALM-3"}
-}
+REFRESCO_UI_MS = 100  # Refresco de las etiquetas de peso (10 Hz)
+
+# --- Detección de peso estable ---
+# Lecturas: el sketch envía una cada 500 ms en modo texto y ~10 por segundo en modo binario
+VENTANA_ESTABILIDAD = 20 if MODO_BINARIO else 4
+TOLERANCIA_ESTABILIDAD = 0.002  # Desviación estándar máxima en kg para considerar estable
+eventos_estables = queue.SimpleQueue()
+# Modo binario: las lecturas crudas se filtran aquí (Kalman + seguimiento de cero y deriva)
+FILTRO_METODO = 'kalman'  # ninguno | mediana | ema | kalman
+filtro = FiltroBalanzas(1, metodo=FILTRO_METODO) if MODO_BINARIO else None
+detector = DetectorEstabilidad(VENTANA_ESTABILIDAD, TOLERANCIA_ESTABILIDAD, al_estabilizar=eventos_estables.put)
+
+# --- Productos y peso unitario aprendido de los sacos aceptados (recetas.db + Supabase) ---
+ESTACION = os.getenv("ESTACION") or socket.gethostname()
+recetas = RegistroRecetas(RECETAS_DB, estacion=ESTACION)
+PRODUCTOS = recetas.productos()
+
+# --- Modo continuo: el código escaneado elige producto y fábrica, el peso estable se guarda solo ---
+MODO_CONTINUO = os.getenv("MODO_CONTINUO") == "1"  # Arrancar ya en modo continuo
+PREFIJOS_ESCANER = cargar_prefijos()  # prefijos_escaner.csv: prefijo;producto;fabrica
+PUERTO_ESCANER = os.getenv("PUERTO_ESCANER")  # Escáner serial; sin él, se usa como teclado
+cola_escaneos = queue.Queue(maxsize=100)
+# El escáner no manda nada mientras no se usa: solo se reabre si el puerto da error
+escaner_serial = SupervisorConexion(PUERTO_ESCANER, 9600, cola_escaneos, decodificar_linea, nombre="escaner",
+                                    plazo=float('inf')) if PUERTO_ESCANER else None
+teclado = AcumuladorTeclado()
+ciclo = CicloSacos(metricas=metricas)
 
 # Variables globales
 producto_actual = None
@@ -34,68 +154,131 @@ peso_objetivo = 0.0
 tolerancia = 0.03  # por defecto 3%
 codigo_saco = ""
 fabrica_id = None
+fabrica_nombre = None  # Última fábrica ingresada: se propone para el siguiente saco
+origen_base = None     # 'receta' (aprendido) o 'muestra' (2 unidades pesadas a mano)
+pantalla_actual = None
 
 # --- Funciones seriales ---
 def conectar_serial():
-    global arduino
-    try:
-        if arduino and arduino.is_open:
-            arduino.close()
-        arduino = serial.Serial(PORT, BAUD, timeout=1)
-        arduino.reset_input_buffer()
-        lbl_status.config(text=f"✅ Conectado a {PORT}", foreground="green")
-    except Exception as e:
-        lbl_status.config(text=f"❌ Error al conectar: {e}", foreground="red")
+    """Botón "Conectar": cierra y reabre el puerto sin esperar al plazo de silencio"""
+    supervisor.reconectar()
+
+def mostrar_estado_serial():
+    """Refleja en la ventana el estado del supervisor (hilo de Tk)"""
+    if supervisor.conectado:
+        texto, color = f"✅ Conectado a {PORT}", "green"
+        if supervisor.reconexiones:
+            texto += f" ({supervisor.reconexiones} reconexiones, {supervisor.segundos_caido:.0f} s sin balanza)"
+    else:
+        texto, color = f"❌ Sin balanza en {PORT}, reintentando... {supervisor.error or ''}", "red"
+    lbl_status.config(text=texto, foreground=color)
+    root.after(500, mostrar_estado_serial)
 
 def enviar_cmd(cmd):
-    if arduino and arduino.is_open:
-        arduino.write((cmd + '\n').encode())
+    supervisor.enviar(cmd)
 
 def leer_serial():
+    """Consume las tramas ya parseadas que publica el LectorSerial (bloquea sin gastar CPU)"""
     global ultimo_peso, peso_objetivo
     while running:
-        if arduino and arduino.in_waiting:
-            try:
-                data = arduino.readline().decode().strip()
-                if data.startswith("OBJ:"):
-                    partes = data.split(";")
-                    obj = float(partes[0].split(":")[1])
-                    act = float(partes[1].split(":")[1])
-                    dif = float(partes[2].split(":")[1])
-                    ultimo_peso = act
-                    actualizar_pesos(obj, act, dif)
-            except:
-                pass
+        try:
+            _, trama = cola_serial.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        tipo, datos = trama
+        if tipo == TRAMA_MUESTRA and filtro and parser.escala is not None:
+            # Todo lo que ya llegó se filtra como un bloque; la pantalla muestra la última lectura
+            muestras = [datos] + [d for _, (t, d) in drenar_cola_serial() if t == TRAMA_MUESTRA]
+            for act in filtrar_muestras(muestras):
+                detector.agregar(act)
+            obj = muestras[-1].objetivo
+            dif = act - obj
+        elif tipo == TRAMA_MUESTRA:
+            obj, act, dif = datos.objetivo, datos.peso, datos.diferencia
+            detector.agregar(act)
+        elif tipo == TRAMA_PESO:
+            obj, act, dif = datos
+            detector.agregar(act)
+        else:
+            continue
+        ultimo_peso = act
+        # Solo se publica; la interfaz se actualiza en el hilo de Tk
+        bomba_pesos.publicar((round(obj, 3), round(act, 3), round(dif, 3), detector.estable))
+
+def drenar_cola_serial():
+    items = []
+    while True:
+        try:
+            items.append(cola_serial.get_nowait())
+        except queue.Empty:
+            return items
+
+def filtrar_muestras(muestras):
+    """Peso neto filtrado de cada muestra: cuentas crudas → kg con la calibración que manda el sketch"""
+    crudos = np.fromiter((m.crudo for m in muestras), np.float64, len(muestras))
+    instantes = np.fromiter((m.ms for m in muestras), np.float64, len(muestras)) / 1000.0
+    return filtro.procesar(parser.a_kg(crudos), instantes)[0]
 
 # --- Funciones GUI ---
 def mostrar_pantalla(frame):
+    global pantalla_actual
+    pantalla_actual = frame
     for f in [frame_menu, frame_muestra, frame_codigo, frame_pesaje]:
         f.pack_forget()
     frame.pack(fill="both", expand=True)
 
 def seleccionar_producto(key):
-    global producto_actual, peso_base
+    global producto_actual, peso_base, origen_base
     producto_actual = key
-    peso_base = None
     lbl_muestra_info.config(text=f"Seleccionado: {PRODUCTOS[key]['nombre']}")
-    mostrar_pantalla(frame_muestra)
+    aprendido = recetas.peso_unitario(key, fabrica_id)
+    if aprendido is None:
+        peso_base = origen_base = None
+        lbl_base.config(text="Peso base: --")
+        btn_continuar_codigo.config(state="disabled")
+        mostrar_pantalla(frame_muestra)
+        return
+
+    # Objetivo ya calculado: se envía a la balanza de inmediato, sin muestra manual
+    peso_base, sacos = aprendido
+    origen_base = 'receta'
+    enviar_objetivo()
+    lbl_base.config(text=f"Peso base por unidad: {peso_base:.3f} kg")
+    btn_continuar_codigo.config(state="normal")
+    lbl_receta.config(text=f"{PRODUCTOS[key]['nombre']}\n{peso_base:.3f} kg/unidad (aprendido de {sacos} sacos)\n"
+                           f"OBJ: {peso_objetivo:.3f} kg")
+    mostrar_pantalla(frame_codigo)
+
+def enviar_objetivo():
+    global peso_objetivo
+    peso_objetivo = peso_base * PRODUCTOS[producto_actual]["unidades"]
+    supervisor.enviar_objetivo(peso_objetivo)  # Se repite solo si la balanza se reconecta
+    lbl_peso_obj.config(text=f"OBJ: {peso_objetivo:.3f} kg")
 
 def tomar_muestra():
-    global peso_base
+    global peso_base, origen_base
     if ultimo_peso <= 0:
         messagebox.showerror("Error", "No hay peso detectado. Coloca la muestra primero.")
         return
-    
-    peso_base = ultimo_peso / 2  # promedio de 2 unidades
+
+    peso_estable = detector.peso_estable
+    if peso_estable is None:
+        messagebox.showwarning("Peso inestable", "La balanza aún no se estabiliza. Espera un momento.")
+        return
+
+    peso_base = peso_estable / 2  # promedio de 2 unidades
+    origen_base = 'muestra'
     lbl_base.config(text=f"Peso base por unidad: {peso_base:.3f} kg")
     messagebox.showinfo("Muestra tomada", f"Peso base registrado: {peso_base:.3f} kg/unidad")
     btn_continuar_codigo.config(state="normal")
 
 def continuar_a_codigo():
+    if origen_base == 'muestra':
+        lbl_receta.config(text=f"{PRODUCTOS[producto_actual]['nombre']}\n{peso_base:.3f} kg/unidad (muestra manual)")
     mostrar_pantalla(frame_codigo)
 
 def ingresar_codigo():
-    global codigo_saco, fabrica_id
+    global codigo_saco, fabrica_id, fabrica_nombre
     codigo = entry_codigo.get().strip()
     
     if not codigo:
@@ -103,43 +286,40 @@ def ingresar_codigo():
         return
     
     # Buscar o crear fábrica (por ahora genérica)
-    fabrica_nombre = simpledialog.askstring("Fábrica", "Ingresa el nombre de la fábrica:", parent=root)
-    if not fabrica_nombre:
-        fabrica_nombre = "Fábrica Genérica"
+    nombre = simpledialog.askstring("Fábrica", "Ingresa el nombre de la fábrica:", parent=root,
+                                    initialvalue=fabrica_nombre or "")
+    if not nombre:
+        nombre = "Fábrica Genérica"
     
     try:
-        # Buscar fábrica existente
-        response = supabase.table("fabricas").select("*").eq("nombre", fabrica_nombre).execute()
-        
-        if response.data and len(response.data) > 0:
-            fabrica_id = response.data[0]['id']
-        else:
-            # Crear nueva fábrica
-            nueva_fabrica = supabase.table("fabricas").insert({
-                "nombre": fabrica_nombre,
-                "codigo": fabrica_nombre[:10].upper(),
-                "tipo": "Otros",
-                "activa": True
-            }).execute()
-            fabrica_id = nueva_fabrica.data[0]['id']
-        
+        # Resolver fábrica desde la caché (crea la fábrica solo si es nueva)
+        fabrica_id = cache_fabricas.resolver(nombre)
+        fabrica_nombre = nombre
+
         codigo_saco = codigo
         continuar_a_pesaje()
-        
+
     except Exception as e:
         messagebox.showerror("Error", f"Error al procesar fábrica: {e}")
 
 def continuar_a_pesaje():
-    global peso_objetivo
-    unidades = PRODUCTOS[producto_actual]["unidades"]
-    peso_objetivo = peso_base * unidades
-    enviar_cmd(f"OBJ:{peso_objetivo:.3f}")
-    lbl_peso_obj.config(text=f"OBJ: {peso_objetivo:.3f} kg")
+    global peso_base
+    if origen_base == 'muestra':
+        enviar_objetivo()
+    else:
+        # Con la fábrica ya conocida puede haber un peso unitario más específico
+        aprendido = recetas.peso_unitario(producto_actual, fabrica_id)
+        if aprendido and abs(aprendido[0] - peso_base) > 1e-6:
+            peso_base = aprendido[0]
+            enviar_objetivo()
     lbl_codigo_pesaje.config(text=f"Código: {codigo_saco}")
     mostrar_pantalla(frame_pesaje)
 
-def actualizar_pesos(obj, act, dif):
+def actualizar_pesos(obj, act, dif, estable=False):
+    """Se ejecuta en el hilo de Tk (vía BombaUI), nunca en el hilo serial"""
     lbl_peso_act.config(text=f"ACT: {act:.3f} kg")
+    ciclo.peso(act)
+    lbl_estable.config(text="⚖️ Estable" if estable else "〰️ Estabilizando...", foreground="green" if estable else "gray")
     lbl_peso_dif.config(text=f"DIF: {dif:.3f} kg")
     try:
         porc = abs(dif) / obj if obj > 0 else 0
@@ -153,92 +333,238 @@ def actualizar_pesos(obj, act, dif):
     except:
         lbl_estado.config(text="...", foreground="black")
 
-def guardar_datos():
+def guardar_datos(peso_medido=None):
+    """Toma una foto de los datos y los guarda en segundo plano (no bloquea la ventana)"""
     if not producto_actual or peso_base is None or not codigo_saco:
         messagebox.showerror("Error", "Faltan datos para guardar.")
         return
 
-    diferencia = ultimo_peso - peso_objetivo
+    # Se registra el peso estable, no la lectura del instante del clic
+    if peso_medido is None:
+        peso_medido = detector.peso_estable
+    if peso_medido is None:
+        messagebox.showwarning("Peso inestable", "El saco aún se está moviendo. Espera a que se estabilice.")
+        return
+
+    diferencia = peso_medido - peso_objetivo
     porcentaje_diferencia = (abs(diferencia) / peso_objetivo) * 100 if peso_objetivo > 0 else 0
     estado = "OK" if porcentaje_diferencia <= (tolerancia * 100) else "FUERA_RANGO"
+    ahora = datetime.now()
+
+    saco_data = {
+        "codigo": codigo_saco,
+        "fabrica_id": fabrica_id,
+        "peso_objetivo": round(peso_objetivo, 3),
+        "peso_real": round(peso_medido, 3),
+        "diferencia": round(diferencia, 3),
+        "estado": estado,
+        "lote": PRODUCTOS[producto_actual]["codigo"],
+        "fecha_pesaje": ahora.astimezone().isoformat()
+    }
+    fila_csv = {
+        "fecha": ahora.strftime("%Y-%m-%d %H:%M:%S"),
+        "codigo_saco": codigo_saco,
+        "nombre": PRODUCTOS[producto_actual]['nombre'],
+        "peso_base": peso_base,
+        "peso_objetivo": peso_objetivo,
+        "peso_actual": peso_medido,
+        "tolerancia": tolerancia,
+    }
+
+    # Solo los sacos aceptados enseñan el peso unitario del producto en esa fábrica
+    aprendizaje = (producto_actual, fabrica_id, peso_medido) if estado == "OK" else None
+    futuro = ejecutor_guardado.submit(persistir_saco, saco_data, fila_csv, aprendizaje)
+    lbl_guardado.config(text=f"⏳ Guardando {codigo_saco}...", foreground="blue")
+    root.after(100, vigilar_guardado, futuro, codigo_saco, estado, diferencia, porcentaje_diferencia)
+
+    # El operador puede seguir con el siguiente saco de inmediato
+    if modo_continuo.get():
+        ciclo.guardado()
+        lbl_ciclo.config(text=ciclo.resumen())
+        esperar_escaneo()
+    else:
+        volver_menu()
 
-    try:
-        # Guardar en Supabase
-        saco_data = {
-            "codigo": codigo_saco,
-            "fabrica_id": fabrica_id,
-            "peso_objetivo": round(peso_objetivo, 3),
-            "peso_real": round(ultimo_peso, 3),
-            "diferencia": round(diferencia, 3),
-            "estado": estado,
-            "lote": PRODUCTOS[producto_actual]["codigo"]
-        }
-        
-        response = supabase.table("sacos").insert(saco_data).execute()
-        
-        # Guardar también en CSV (backup)
-        guardar_csv()
-        
-        messagebox.showinfo(
-            "✅ Guardado", 
-            f"Saco registrado en Supabase\n"
-            f"Código: {codigo_saco}\n"
-            f"Estado: {estado}\n"
-            f"Diferencia: {diferencia:.3f} kg ({porcentaje_diferencia:.2f}%)"
-        )
-        
+def persistir_saco(saco_data, fila_csv, aprendizaje=None):
+    """Se ejecuta en el hilo de guardado: spool local + CSV, con reintentos"""
+    inicio = time.perf_counter()
+    espera = 0.5
+    for intento in range(REINTENTOS_GUARDADO):
+        try:
+            # Guardar primero en el spool local (no depende de la red)
+            spool.agregar("sacos", saco_data)
+            break
+        except Exception:
+            if intento == REINTENTOS_GUARDADO - 1:
+                raise
+            time.sleep(espera)
+            espera *= 2
+
+    if resumenes:
+        resumenes.agregar("sacos", saco_data)
+
+    # Guardar también en CSV (backup)
+    guardar_csv(fila_csv)
+    if aprendizaje:
+        try:
+            recetas.registrar(*aprendizaje)
+        except Exception as e:
+            # El saco ya está guardado: perder una muestra de aprendizaje no es un error de guardado
+            print(f"⚠️ No se pudo actualizar la receta: {e}")
+    h_guardado.observar(time.perf_counter() - inicio)
+
+    # Subir a Supabase en segundo plano
+    replayer.despertar()
+
+def vigilar_guardado(futuro, codigo, estado, diferencia, porcentaje_diferencia):
+    """Revisa el futuro desde el hilo de Tk y muestra el resultado sin ventanas modales"""
+    if not futuro.done():
+        root.after(100, vigilar_guardado, futuro, codigo, estado, diferencia, porcentaje_diferencia)
+        return
+
+    error = futuro.exception()
+    if error:
+        lbl_guardado.config(text=f"❌ No se pudo guardar {codigo}: {error}", foreground="red")
+        if not modo_continuo.get():
+            messagebox.showerror("Error", f"Error al guardar el saco {codigo}: {error}")
+        return
+
+    color = "green" if estado == "OK" else "red"
+    lbl_guardado.config(
+        text=f"✅ {codigo}: {estado} | Dif: {diferencia:.3f} kg ({porcentaje_diferencia:.2f}%)",
+        foreground=color
+    )
+
+def procesar_estables():
+    """Atiende en el hilo de Tk los eventos de peso estable (captura automática)"""
+    peso = None
+    while not eventos_estables.empty():
+        peso = eventos_estables.get()
+    if peso is not None and pantalla_actual is frame_pesaje and codigo_saco:
+        if modo_continuo.get():
+            if ciclo.puede_guardar(peso, peso_objetivo):
+                guardar_datos(peso)
+        elif captura_auto.get():
+            guardar_datos(peso)
+    root.after(REFRESCO_UI_MS, procesar_estables)
+
+# --- Modo continuo (escáner) ---
+def activar_modo_continuo():
+    """Checkbutton del menú: a partir de aquí el escáner maneja la estación, sin diálogos"""
+    ciclo.reiniciar()
+    if modo_continuo.get():
+        lbl_ciclo.config(text=ciclo.resumen())
+        esperar_escaneo()
+        root.focus_set()  # Que el Enter del escáner no quede en un botón
+    else:
         volver_menu()
-        
+
+def esperar_escaneo():
+    global codigo_saco
+    codigo_saco = ""
+    lbl_codigo_pesaje.config(text="🔫 Escanee el siguiente saco...")
+    mostrar_pantalla(frame_pesaje)
+
+def tecla_escaner(evento):
+    """Escáner tipo teclado: junta las teclas que llegan a la ventana hasta el Enter"""
+    if not modo_continuo.get() or isinstance(evento.widget, (tk.Entry, ttk.Entry)):
+        return
+    codigo = teclado.tecla('\n' if evento.keysym in ('Return', 'KP_Enter') else evento.char)
+    if codigo:
+        procesar_escaneo(codigo)
+
+def atender_escaner_serial():
+    while True:
+        try:
+            _, codigo = cola_escaneos.get_nowait()
+        except queue.Empty:
+            break
+        if modo_continuo.get():
+            procesar_escaneo(codigo)
+    root.after(REFRESCO_UI_MS, atender_escaner_serial)
+
+def procesar_escaneo(codigo):
+    """Un código escaneado empieza un saco: producto y fábrica salen del prefijo, el objetivo de la receta"""
+    global producto_actual, peso_base, origen_base, codigo_saco, fabrica_id, fabrica_nombre
+    escaneo = interpretar(codigo, PREFIJOS_ESCANER)
+    if escaneo is None or escaneo.producto not in PRODUCTOS:
+        lbl_guardado.config(text=f"❌ {codigo}: prefijo desconocido (ver prefijos_escaner.csv)", foreground="red")
+        return
+
+    nombre = escaneo.fabrica or fabrica_nombre or "Fábrica Genérica"
+    try:
+        id_fabrica = cache_fabricas.resolver(nombre)
     except Exception as e:
-        messagebox.showerror("Error", f"Error al guardar en Supabase: {e}")
+        lbl_guardado.config(text=f"❌ {codigo}: error al procesar fábrica: {e}", foreground="red")
+        return
+
+    aprendido = recetas.peso_unitario(escaneo.producto, id_fabrica)
+    if aprendido is None:
+        lbl_guardado.config(text=f"⚠️ {PRODUCTOS[escaneo.producto]['nombre']}: sin peso aprendido, "
+                                 f"toma una muestra manual primero", foreground="red")
+        return
 
-def guardar_csv():
+    producto_actual = escaneo.producto
+    fabrica_id, fabrica_nombre = id_fabrica, nombre
+    peso_base, origen_base = aprendido[0], 'receta'
+    codigo_saco = escaneo.codigo
+    enviar_objetivo()
+    ciclo.escaneo()
+    detector.reiniciar()  # El peso estable tiene que ser de después del escaneo
+    lbl_codigo_pesaje.config(text=f"Código: {codigo_saco} | {PRODUCTOS[producto_actual]['nombre']} | {nombre}")
+    mostrar_pantalla(frame_pesaje)
+
+def actualizar_estado_sync():
+    """Muestra cuántos sacos quedan por subir a Supabase"""
+    try:
+        pendientes = spool.contar()
+    except Exception:
+        pendientes = None
+    if pendientes:
+        lbl_sync.config(text=f"☁️ {pendientes} registros pendientes de sincronizar", foreground="orange")
+    elif pendientes == 0:
+        lbl_sync.config(text="☁️ Sincronizado con Supabase", foreground="green")
+    root.after(2000, actualizar_estado_sync)
+
+def guardar_csv(fila):
     """Guardar backup en CSV"""
-    diferencia = ultimo_peso - peso_objetivo
+    peso_base = fila["peso_base"]
+    peso_objetivo = fila["peso_objetivo"]
+    peso_actual = fila["peso_actual"]
+    tolerancia = fila["tolerancia"]
+
+    diferencia = peso_actual - peso_objetivo
     unidades_faltantes = diferencia / peso_base if peso_base > 0 else 0
     porcentaje_diferencia = (abs(diferencia) / peso_objetivo) * 100 if peso_objetivo > 0 else 0
     resultado = "ACEPTADO" if porcentaje_diferencia <= (tolerancia * 100) else "RECHAZADO"
 
-    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    nombre = PRODUCTOS[producto_actual]['nombre']
-
-    with open("registro_inventario.csv", "a", newline='') as f:
-        writer = csv.writer(f)
-        if f.tell() == 0:
-            writer.writerow([
-                "Fecha",
-                "Código Saco",
-                "Saco Identificado",
-                "Peso Base (kg)",
-                "Peso Objetivo (kg)",
-                "Peso Actual (kg)",
-                "Diferencia (kg)",
-                "Unidades Faltantes/Sobrantes",
-                "Tolerancia",
-                "Resultado"
-            ])
-        writer.writerow([
-            fecha,
-            codigo_saco,
-            nombre,
-            f"{peso_base:.3f}",
-            f"{peso_objetivo:.3f}",
-            f"{ultimo_peso:.3f}",
-            f"{diferencia:.3f}",
-            f"{unidades_faltantes:.2f}",
-            f"±{tolerancia*100:.1f}%",
-            resultado
-        ])
+    registro_csv.escribir([
+        fila["fecha"],
+        fila["codigo_saco"],
+        fila["nombre"],
+        f"{peso_base:.3f}",
+        f"{peso_objetivo:.3f}",
+        f"{peso_actual:.3f}",
+        f"{diferencia:.3f}",
+        f"{unidades_faltantes:.2f}",
+        f"±{tolerancia*100:.1f}%",
+        resultado
+    ])
 
 def volver_menu():
     global codigo_saco
+    if modo_continuo.get():
+        modo_continuo.set(False)
+        ciclo.reiniciar()
     codigo_saco = ""
     entry_codigo.delete(0, tk.END)
     enviar_cmd("TARE")
+    detector.reiniciar()
     mostrar_pantalla(frame_menu)
 
 def tare():
     enviar_cmd("TARE")
+    detector.reiniciar()
     messagebox.showinfo("Tara", "Balanza puesta a cero.")
 
 def cambiar_tolerancia():
@@ -252,6 +578,7 @@ def cambiar_tolerancia():
     def set_tol(valor, txt):
         global tolerancia
         tolerancia = valor
+        bomba_pesos.refrescar()
         messagebox.showinfo("Tolerancia cambiada", f"Tolerancia ajustada a {txt}")
         win.destroy()
 
@@ -276,6 +603,10 @@ root.geometry("450x580")
 
 lbl_status = ttk.Label(root, text="Conectando...", foreground="blue")
 lbl_status.pack(pady=5)
+lbl_guardado = ttk.Label(root, text="", font=("Arial", 10))
+lbl_guardado.pack()
+lbl_sync = ttk.Label(root, text="", font=("Arial", 9))
+lbl_sync.pack()
 ttk.Button(root, text="🔌 Conectar Arduino", command=conectar_serial).pack()
 
 # --- Frame: Menú Principal ---
@@ -285,9 +616,12 @@ ttk.Label(frame_menu, text="Menú Principal", font=("Arial", 14, "bold")).pack(p
 for key, val in PRODUCTOS.items():
     ttk.Button(frame_menu, text=val['nombre'], command=lambda k=key: seleccionar_producto(k)).pack(fill="x", pady=5)
 
+modo_continuo = tk.BooleanVar(value=MODO_CONTINUO)
+ttk.Checkbutton(frame_menu, text="🔫 Modo continuo (escáner)", variable=modo_continuo,
+                command=activar_modo_continuo).pack(pady=5)
 ttk.Button(frame_menu, text="↩️ Tare / Cero", command=tare).pack(fill="x", pady=5)
 ttk.Button(frame_menu, text="⚙️ Cambiar tolerancia", command=cambiar_tolerancia).pack(fill="x", pady=5)
-ttk.Button(frame_menu, text="💾 Ver CSV Backup", command=lambda: messagebox.showinfo("CSV", "El archivo se guarda como 'registro_inventario.csv'")).pack(fill="x", pady=5)
+ttk.Button(frame_menu, text="💾 Ver CSV Backup", command=lambda: messagebox.showinfo("CSV", f"Un archivo por día en '{DIRECTORIO_REGISTROS}/' (registro_inventario_AAAA-MM-DD.csv)")).pack(fill="x", pady=5)
 
 # --- Frame: Tomar muestra ---
 frame_muestra = ttk.Frame(root, padding=15)
@@ -304,39 +638,81 @@ btn_continuar_codigo.pack(pady=10)
 # --- Frame: Ingresar código de saco ---
 frame_codigo = ttk.Frame(root, padding=15)
 ttk.Label(frame_codigo, text="Ingresa el código del saco", font=("Arial", 14, "bold")).pack(pady=10)
+lbl_receta = ttk.Label(frame_codigo, text="", justify="center", foreground="blue")
+lbl_receta.pack(pady=5)
 ttk.Label(frame_codigo, text="Escanea o ingresa manualmente:").pack(pady=5)
 entry_codigo = ttk.Entry(frame_codigo, font=("Arial", 14), width=20)
 entry_codigo.pack(pady=10)
 ttk.Button(frame_codigo, text="✅ Confirmar y continuar", command=ingresar_codigo).pack(pady=10)
-ttk.Button(frame_codigo, text="↩️ Volver", command=lambda: mostrar_pantalla(frame_muestra)).pack(fill="x", pady=5)
+ttk.Button(frame_codigo, text="📏 Tomar muestra manual", command=lambda: mostrar_pantalla(frame_muestra)).pack(fill="x", pady=5)
 
 # --- Frame: Pesaje total ---
 frame_pesaje = ttk.Frame(root, padding=15)
 ttk.Label(frame_pesaje, text="Pesaje total", font=("Arial", 14, "bold")).pack(pady=10)
 lbl_codigo_pesaje = ttk.Label(frame_pesaje, text="Código: --", font=("Arial", 10), foreground="blue")
 lbl_codigo_pesaje.pack(pady=2)
+lbl_ciclo = ttk.Label(frame_pesaje, text="", font=("Arial", 10))
+lbl_ciclo.pack(pady=2)
 lbl_peso_obj = ttk.Label(frame_pesaje, text="OBJ: -- kg", font=("Arial", 12))
 lbl_peso_act = ttk.Label(frame_pesaje, text="ACT: -- kg", font=("Arial", 16, "bold"), foreground="#6A0DAD")
 lbl_peso_dif = ttk.Label(frame_pesaje, text="DIF: -- kg", font=("Arial", 12))
 lbl_estado = ttk.Label(frame_pesaje, text="...", font=("Arial", 11))
+lbl_estable = ttk.Label(frame_pesaje, text="", font=("Arial", 10))
 lbl_peso_obj.pack()
 lbl_peso_act.pack()
+lbl_estable.pack()
 lbl_peso_dif.pack()
 lbl_estado.pack(pady=5)
 ttk.Button(frame_pesaje, text="↩️ Tare / Cero", command=tare).pack(fill="x", pady=5)
 ttk.Button(frame_pesaje, text="💾 Guardar en Supabase", command=guardar_datos).pack(fill="x", pady=5)
+captura_auto = tk.BooleanVar(value=False)
+ttk.Checkbutton(frame_pesaje, text="Guardar automáticamente al estabilizar", variable=captura_auto).pack(pady=5)
 ttk.Button(frame_pesaje, text="🏠 Volver al menú", command=volver_menu).pack(fill="x", pady=5)
 
 mostrar_pantalla(frame_menu)
+root.bind('<Key>', tecla_escaner)
+if MODO_CONTINUO:
+    activar_modo_continuo()
+
+# --- Actualización de pesos en el hilo de Tk ---
+bomba_pesos = BombaUI(root, lambda valores: actualizar_pesos(*valores), REFRESCO_UI_MS)
+bomba_pesos.iniciar()
+procesar_estables()
+atender_escaner_serial()
 
 # --- Hilo serial ---
 threading.Thread(target=leer_serial, daemon=True).start()
 
+# --- Arranque en segundo plano: la ventana aparece sin esperar a la red ni al puerto ---
+supabase.iniciar()       # Cliente + primera consulta (precarga de fábricas)
+replayer.iniciar()       # Sincronización del spool; espera al cliente por su cuenta
+recetas.iniciar(cliente_resumenes or supabase)  # Sube lo aprendido y baja lo de las demás estaciones
+if resumenes:
+    resumenes.iniciar()  # Envía los totales acumulados cada 30 s
+supervisor.iniciar()     # Conexión automática al puerto y reconexión
+if escaner_serial:
+    escaner_serial.iniciar()
+mostrar_estado_serial()
+root.after_idle(marcar_arranque, 'ventana')
+
+actualizar_estado_sync()
+
 def on_close():
     global running
     running = False
-    if arduino:
-        arduino.close()
+    bomba_pesos.detener()
+    supabase.detener()
+    supervisor.detener()
+    if escaner_serial:
+        escaner_serial.detener()
+    ejecutor_guardado.shutdown(wait=True)
+    if resumenes:
+        resumenes.detener()
+        cliente_resumenes.detener()
+    registro_csv.cerrar()
+    replayer.detener(timeout=3)
+    recetas.detener()
+    metricas.detener()
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_close)
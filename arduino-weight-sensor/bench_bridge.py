@@ -0,0 +1,167 @@
+"""
+Benchmark extremo a extremo del bridge (balanza simulada → bridge → Supabase falso)
+Uso: python bench_bridge.py [--tasa 200] [--duracion 10] [--balanzas 1]
+                            [--latencia-ms 0] [--reproducir sesion.log] [--async | --procesos]
+
+Levanta un Supabase falso local, una o varias balanzas simuladas en
+ptys y lanza `arduino_bridge.py` como proceso aparte apuntando a ambos.
+Cada trama JSON lleva su número en `codigo_saco` (SIM-<n>), así que al
+final se puede medir tramas/s, latencia (envío → fila recibida por el
+servidor) y tramas perdidas. Requiere Linux/Mac (ptys).
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from simulador import BalanzaSimulada, abrir_pty, reproducir
+from supabase_falso import SupabaseFalso, CLAVE_FALSA
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    indice = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[indice]
+
+
+def esperar_listo(proceso, salida, timeout=30):
+    """Lee la salida del bridge hasta 'Sistema listo' y luego la sigue drenando en un hilo"""
+    limite = time.monotonic() + timeout
+    for linea in proceso.stdout:
+        salida.append(linea)
+        if "Sistema listo" in linea:
+            break
+        if time.monotonic() > limite:
+            raise TimeoutError("El bridge no arrancó a tiempo")
+    else:
+        raise RuntimeError("El bridge terminó antes de arrancar:\n" + "".join(salida))
+
+    def drenar():
+        for linea in proceso.stdout:
+            salida.append(linea)
+    threading.Thread(target=drenar, daemon=True).start()
+
+
+def main():
+    args = argparse.ArgumentParser(description="Benchmark extremo a extremo del bridge")
+    args.add_argument("--tasa", type=float, default=200.0, help="Tramas por segundo por balanza")
+    args.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga")
+    args.add_argument("--balanzas", type=int, default=1, help="Balanzas simuladas en paralelo")
+    args.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia artificial del servidor")
+    args.add_argument("--reproducir", metavar="ARCHIVO", help="Reproducir una sesión grabada en vez de generar tramas")
+    args.add_argument("--velocidad", type=float, default=0.0, help="Velocidad de reproducción (0 = máxima)")
+    args.add_argument("--con-reduccion", action="store_true",
+                      help="Dejar activo el reductor del bridge (las filas 'perdidas' pasan a ser filas filtradas)")
+    args.add_argument("--async", dest="modo_async", action="store_true", help="Probar el bridge en modo --async")
+    args.add_argument("--procesos", action="store_true", help="Probar el bridge en modo --procesos")
+    args.add_argument("--filtro", help="Filtro del bridge (ninguno | mediana | ema | kalman)")
+    args.add_argument("--drenado", type=float, default=15.0, help="Segundos máximos de espera al final")
+    args = args.parse_args()
+
+    servidor = SupabaseFalso(latencia_ms=args.latencia_ms).iniciar()
+    ptys = [abrir_pty() for _ in range(args.balanzas)]
+    puertos = ",".join(f"{nombre}=SIM-{i}" for i, (_, nombre) in enumerate(ptys))
+
+    directorio = tempfile.mkdtemp(prefix="bench_bridge_")
+    entorno = dict(
+        os.environ,
+        SUPABASE_URL=servidor.url,
+        SUPABASE_KEY=CLAVE_FALSA,
+        SUPABASE_RESUMENES_KEY=CLAVE_FALSA,
+        SPOOL_RUTA=os.path.join(directorio, "spool.db"),
+        PYTHONUNBUFFERED="1",
+    )
+    comando = [sys.executable, os.path.join(DIRECTORIO, "arduino_bridge.py"), "--puertos", puertos]
+    if not args.con_reduccion:
+        comando.append("--sin-reduccion")
+    if args.modo_async:
+        comando.append("--async")
+    if args.procesos:
+        comando.append("--procesos")
+    if args.filtro:
+        comando += ["--filtro", args.filtro]
+    proceso = subprocess.Popen(
+        comando,
+        cwd=directorio, env=entorno, text=True, encoding="utf-8", errors="replace",
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    salida = []
+    esperar_listo(proceso, salida)
+
+    # Instante de envío por código de saco (SIM-<n>) para medir latencia
+    enviados = {}
+    hilos = []
+    for i, (maestro, _) in enumerate(ptys):
+        escribir = lambda datos, fd=maestro: os.write(fd, datos)
+        marcar = lambda seq, t, i=i: enviados.__setitem__(f"{i}:SIM-{seq}", t)
+        if args.reproducir:
+            objetivo = lambda e=escribir, m=marcar: reproducir(args.reproducir, e, args.velocidad, m)
+        else:
+            balanza = BalanzaSimulada(escribir, formato="json", tasa_hz=args.tasa)
+            objetivo = lambda b=balanza, m=marcar: b.correr(args.duracion, al_enviar=m)
+        hilos.append(threading.Thread(target=objetivo, daemon=True))
+
+    print(f"🚀 {args.balanzas} balanza(s) × {args.tasa:.0f} tramas/s durante {args.duracion:.0f} s → {servidor.url}")
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    fin_envio = time.monotonic()
+    total_enviado = len(enviados)
+
+    # Esperar a que lleguen las filas pendientes
+    limite = time.monotonic() + args.drenado
+    if args.con_reduccion:
+        time.sleep(3)
+    else:
+        while servidor.total("pesajes_tiempo_real") < total_enviado and time.monotonic() < limite:
+            time.sleep(0.1)
+
+    proceso.send_signal(signal.SIGINT)
+    try:
+        proceso.wait(timeout=20)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+
+    # Latencias: envío de la trama → llegada de la fila al servidor
+    latencias = []
+    filas = servidor.filas.get("pesajes_tiempo_real", [])
+    llegadas = servidor.llegadas.get("pesajes_tiempo_real", [])
+    estaciones = {f"SIM-{i}": i for i in range(args.balanzas)}
+    for fila, llegada in zip(filas, llegadas):
+        clave = f"{estaciones.get(fila.get('estacion'), 0)}:{fila.get('codigo_saco')}"
+        enviado = enviados.get(clave)
+        if enviado is not None:
+            latencias.append(llegada - enviado)
+    latencias.sort()
+
+    recibidas = len(filas)
+    duracion_envio = fin_envio - inicio
+    print(f"\n📤 Enviadas: {total_enviado} tramas en {duracion_envio:.1f} s ({total_enviado / duracion_envio:,.0f} tramas/s)")
+    print(f"📥 Recibidas por Supabase: {recibidas} en {servidor.requests} requests "
+          f"({recibidas / max(servidor.requests, 1):.1f} filas/request)")
+    etiqueta = "Filtradas por el reductor" if args.con_reduccion else "Perdidas"
+    print(f"🕳️ {etiqueta}: {total_enviado - recibidas} ({(total_enviado - recibidas) / max(total_enviado, 1):.2%})")
+    if latencias:
+        print(f"⏱️ Latencia extremo a extremo: p50 {percentil(latencias, 50) * 1000:.0f} ms | "
+              f"p95 {percentil(latencias, 95) * 1000:.0f} ms | p99 {percentil(latencias, 99) * 1000:.0f} ms | "
+              f"máx {latencias[-1] * 1000:.0f} ms")
+    contadas = sum(f["cantidad"] for f in servidor.filas.get("resumen_pesajes", []) if f["periodo"] == "dia")
+    print(f"🧮 Filas contadas en resumen_pesajes (por día): {contadas}")
+    print("\n--- Resumen del bridge ---")
+    print("".join(l for l in salida if l.startswith(("📟", "🗜️", "📈", "📦", "⏱️", "🔌", "🎚️", "🧮"))), end="")
+
+    servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
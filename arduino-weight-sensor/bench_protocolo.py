@@ -0,0 +1,96 @@
+"""
+Microbenchmark del parser de tramas (protocolo.py)
+Uso: python bench_protocolo.py [n_tramas]
+
+Compara el parser compartido con el parseo anterior de leer_serial()
+(decode/strip/split) y del bridge (startswith + json.loads), y el modo
+binario (separar + parsear) con cortar y parsear las líneas OBJ.
+"""
+
+import json
+import sys
+import time
+
+from protocolo import ParserBinario, ParserTramas, TIPO_MUESTRA, empaquetar_binaria
+
+MEZCLA = [
+    b'OBJ:1.200;ACT:1.195;DIF:-0.005\r\n',
+    b'OBJ:0.000;ACT:5.380;DIF:5.380\r\n',
+    b'{"peso":1.195,"objetivo":1.200,"diferencia":-0.005,"codigo_saco":"SAC001","fabrica":"Balanza-1","timestamp":12345}\r\n',
+    b'HEARTBEAT\r\n',
+    b'OBJ:1.200;ACT:1.201;DIF:0.001\r\n',
+    b'Tara realizada\r\n',
+    b'OBJ:1.2;ACT:nan\r\n',
+]
+
+
+def parseo_anterior(linea: bytes):
+    try:
+        data = linea.decode().strip()
+        if data.startswith("OBJ:"):
+            partes = data.split(";")
+            return (float(partes[0].split(":")[1]),
+                    float(partes[1].split(":")[1]),
+                    float(partes[2].split(":")[1]))
+        if data.startswith('{') and data.endswith('}'):
+            return json.loads(data)
+    except:
+        pass
+    return None
+
+
+def medir(nombre, funcion, lineas):
+    inicio = time.perf_counter()
+    for linea in lineas:
+        funcion(linea)
+    transcurrido = time.perf_counter() - inicio
+    print(f"{nombre:<22} {len(lineas) / transcurrido:>12,.0f} tramas/s  ({transcurrido * 1e9 / len(lineas):.0f} ns/trama)")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    lineas = [MEZCLA[i % len(MEZCLA)] for i in range(n)]
+
+    parser = ParserTramas()
+    print(f"Parseando {n:,} tramas ({len(MEZCLA)} tipos mezclados)\n")
+    medir("protocolo.py", parser.parsear, lineas)
+    medir("parseo anterior", parseo_anterior, lineas)
+
+    solo_peso = [MEZCLA[0]] * n
+    print()
+    medir("protocolo.py (OBJ)", ParserTramas().parsear, solo_peso)
+    medir("parseo anterior (OBJ)", parseo_anterior, solo_peso)
+
+    print(f"\nContadores: {parser.contadores}")
+
+    # Flujo completo: bloques de bytes como los entrega read() → tramas parseadas
+    texto = b''.join(solo_peso)
+    binario = b''.join(empaquetar_binaria(TIPO_MUESTRA, i, i * 12, 21000 + i % 50, 21000, 1.195, 1.2)
+                       for i in range(n))
+    print(f"\nFlujo de {n:,} lecturas en bloques de 4 KB: texto {len(texto):,} bytes, binario {len(binario):,} bytes")
+    medir_flujo("texto (split + OBJ)", separar_lineas, ParserTramas().parsear, texto, n)
+    binario_parser = ParserBinario()
+    medir_flujo("binario (struct)", binario_parser.separar, binario_parser.parsear, binario, n)
+    print(f"Contadores binario: {binario_parser.contadores}")
+
+
+def separar_lineas(pendiente: bytes):
+    *lineas, resto = pendiente.split(b'\n')
+    return lineas, resto
+
+
+def medir_flujo(nombre, separar, parsear, flujo: bytes, n: int):
+    """Como LectorSerial._leer: acumula bloques, separa tramas y parsea cada una"""
+    inicio = time.perf_counter()
+    pendiente = b''
+    for i in range(0, len(flujo), 4096):
+        pendiente += flujo[i:i + 4096]
+        tramas, pendiente = separar(pendiente)
+        for trama in tramas:
+            parsear(trama)
+    transcurrido = time.perf_counter() - inicio
+    print(f"{nombre:<22} {n / transcurrido:>12,.0f} tramas/s  ({transcurrido * 1e9 / n:.0f} ns/trama)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Bomba de actualizaciones de Tk - Último valor + refresco a tasa fija
+
+Tkinter no es thread-safe: los widgets solo se deben tocar desde el hilo
+del mainloop. El hilo serial publica la última lectura en un único
+casillero (las lecturas intermedias se sobrescriben) y el mainloop la
+aplica con `root.after` a una tasa fija, saltándose el redibujado si el
+valor no cambió desde la última vez.
+"""
+
+import threading
+
+
+class BombaUI:
+    """Publica valores desde cualquier hilo y los aplica en el mainloop de Tk"""
+
+    def __init__(self, root, aplicar, intervalo_ms=100):
+        # aplicar(valor) se ejecuta siempre en el hilo de Tk
+        self.root = root
+        self.aplicar = aplicar
+        self.intervalo_ms = intervalo_ms
+
+        self._lock = threading.Lock()
+        self._valor = None
+        self._nuevo = False
+        self._aplicado = None
+        self._activa = False
+
+        self.publicados = 0
+        self.aplicados = 0
+
+    def publicar(self, valor):
+        """Llamable desde cualquier hilo; nunca toca widgets"""
+        with self._lock:
+            self._valor = valor
+            self._nuevo = True
+            self.publicados += 1
+
+    def refrescar(self):
+        """Fuerza a reaplicar el último valor (ej. cambió la tolerancia)"""
+        with self._lock:
+            self._aplicado = None
+            self._nuevo = self._valor is not None
+
+    def iniciar(self):
+        if not self._activa:
+            self._activa = True
+            self.root.after(self.intervalo_ms, self._tick)
+
+    def detener(self):
+        self._activa = False
+
+    def _tick(self):
+        if not self._activa:
+            return
+
+        with self._lock:
+            valor = self._valor if self._nuevo else None
+            self._nuevo = False
+
+        if valor is not None and valor != self._aplicado:
+            self._aplicado = valor
+            try:
+                self.aplicar(valor)
+                self.aplicados += 1
+            except Exception as e:
+                print(f"⚠️ Error actualizando la interfaz: {e}")
+
+        self.root.after(self.intervalo_ms, self._tick)
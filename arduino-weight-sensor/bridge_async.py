@@ -0,0 +1,429 @@
+"""
+Bridge asyncio - Varias balanzas y muchos inserts en vuelo desde un solo hilo
+
+Modo alternativo de arduino_bridge.py (`--async`):
+
+- Cada puerto se lee desde el event loop (`loop.add_reader`, sin un hilo
+  por balanza). En Windows, donde el loop no puede esperar puertos serie,
+  se usa un `LectorSerial` por puerto que entrega al loop.
+- Las filas se suben con el cliente async de PostgREST sobre un pool
+  httpx keep-alive, con hasta `en_vuelo` requests simultáneos.
+- Contrapresión de punta a punta: si la subida se atrasa, el bucle de
+  tramas espera (`await poner()`); si la cola de tramas se llena, se deja
+  de leer el puerto hasta que haya espacio.
+
+Las filas se suben directamente con `clave_idempotencia` (reintentar un
+lote no duplica filas). Si Supabase no responde después de los
+reintentos, el lote va al spool local y una tarea lo reintenta con el
+mismo pool. A diferencia del modo normal, las filas que todavía están en
+memoria se pierden si el proceso muere de golpe.
+"""
+
+import asyncio
+import queue
+import time
+import uuid
+
+import httpx
+import serial
+from postgrest import AsyncPostgrestClient
+from postgrest.types import ReturnMethod
+
+from lector_serial import LectorSerial, SeparadorLineas
+from spool import SpoolLocal, aislar_rechazo, es_rechazo
+from supervisor import SupervisorConexion
+
+
+class LectorSerialAsync:
+    """Publica (instante, trama) en una asyncio.Queue leyendo el puerto desde el event loop"""
+
+    def __init__(self, ser: serial.Serial, cola: asyncio.Queue, parsear, metricas=None, separar=None):
+        self.ser = ser
+        self.cola = cola
+        self.parsear = parsear
+        self.separar = separar or SeparadorLineas()  # Como en LectorSerial
+        self.metricas = metricas
+
+        self._loop = None
+        self._fd = None
+        self._hilo = None        # LectorSerial de respaldo (Windows)
+        self._atrasadas = []     # Tramas leídas que no entraron en la cola
+        self._pendiente = b''
+        self.pausado = False
+        self.terminado = asyncio.Event()
+
+        self.lineas = 0
+        self.descartadas = 0
+        self.pausas = 0
+        self.error = None
+
+    def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._fd = self.ser.fileno()
+            self.ser.timeout = 0  # read() devuelve lo que haya, sin bloquear el loop
+            self._loop.add_reader(self._fd, self._leer)
+        except (AttributeError, NotImplementedError, OSError, serial.SerialException):
+            # ProactorEventLoop (Windows) no espera descriptores de puertos serie
+            self._fd = None
+            self._hilo = LectorSerial(self.ser, _PuenteCola(self), self.parsear, metricas=self.metricas,
+                                      separar=self.separar).iniciar()
+        return self
+
+    def detener(self):
+        if self._fd is not None and not self.pausado:
+            self._loop.remove_reader(self._fd)
+        self._fd = None
+        if self._hilo:
+            self._hilo.detener()
+            self.lineas = self._hilo.lineas
+
+    @property
+    def vivo(self) -> bool:
+        if self._hilo:
+            return self._hilo.vivo
+        return not self.terminado.is_set()
+
+    def _leer(self):
+        try:
+            datos = self.ser.read(self.ser.in_waiting or 1)
+        except (serial.SerialException, OSError, TypeError) as e:
+            self.error = e
+            self._loop.remove_reader(self._fd)
+            self.terminado.set()
+            return
+        if not datos:
+            return
+
+        lineas, self._pendiente = self.separar(self._pendiente + datos)
+
+        ahora = time.monotonic()
+        for linea in lineas:
+            self.lineas += 1
+            item = self.parsear(linea)
+            if item is None:
+                continue
+            if self._atrasadas:
+                self._atrasadas.append((ahora, item))
+                continue
+            try:
+                self.cola.put_nowait((ahora, item))
+            except asyncio.QueueFull:
+                self._atrasadas.append((ahora, item))
+        if self._atrasadas:
+            self._pausar()
+
+    def _pausar(self):
+        """Deja de leer el puerto: los bytes esperan en el buffer del sistema operativo"""
+        if not self.pausado and self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self.pausado = True
+            self.pausas += 1
+
+    def reanudar_si_hay_espacio(self):
+        if not self.pausado:
+            return
+        while self._atrasadas and not self.cola.full():
+            self.cola.put_nowait(self._atrasadas.pop(0))
+        if not self._atrasadas and self.cola.qsize() < self.cola.maxsize // 2 and self._fd is not None:
+            self._loop.add_reader(self._fd, self._leer)
+            self.pausado = False
+
+    def _entregar(self, item):
+        # Llamado en el loop por el LectorSerial de respaldo
+        try:
+            self.cola.put_nowait(item)
+        except asyncio.QueueFull:
+            self.descartadas += 1
+
+
+class _PuenteCola:
+    """Cola falsa para LectorSerial: pasa cada trama al event loop"""
+
+    def __init__(self, lector: LectorSerialAsync):
+        self.lector = lector
+
+    def put_nowait(self, item):
+        try:
+            self.lector._loop.call_soon_threadsafe(self.lector._entregar, item)
+        except RuntimeError:
+            raise queue.Full  # Loop cerrado: LectorSerial lo cuenta como descartada
+
+
+class SupervisorAsync(SupervisorConexion):
+    """SupervisorConexion sin hilo propio: la vigilancia es una tarea del event loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tarea = None
+        self.pausas_previas = 0
+
+    def iniciar(self):
+        self._tarea = asyncio.get_running_loop().create_task(self._supervisar_async(), name=f'supervisor-{self.nombre}')
+        return self
+
+    def detener(self, timeout=None):
+        if self._tarea:
+            self._tarea.cancel()
+        self._cerrar()
+
+    @property
+    def vivo(self) -> bool:
+        return bool(self._tarea and not self._tarea.done())
+
+    @property
+    def pausas(self) -> int:
+        return self.pausas_previas + (self.lector.pausas if self.lector else 0)
+
+    def reanudar_si_hay_espacio(self):
+        if self.lector:
+            self.lector.reanudar_si_hay_espacio()
+
+    def _crear_lector(self, ser):
+        return LectorSerialAsync(ser, self.cola, self._parsear, self.metricas, self.separar).iniciar()
+
+    def _motivo_caida(self, ahora: float):
+        if self.lector and self.lector.pausado:
+            # Pausado por contrapresión: el silencio es nuestro, los bytes esperan en el buffer
+            self.ultima_trama = ahora
+        return super()._motivo_caida(ahora)
+
+    def _cerrar(self):
+        if self.lector:
+            self.pausas_previas += self.lector.pausas
+        super()._cerrar()
+
+    async def _supervisar_async(self):
+        while True:
+            if not self.conectado:
+                ser = await asyncio.to_thread(self._intentar_abrir)  # Abrir un COM puede tardar
+                if ser is None:
+                    await asyncio.sleep(self._espera)
+                    self._espera = min(self._espera * 2, self.espera_max)
+                    continue
+                self._establecer(ser)
+            self._revisar(time.monotonic())
+            await asyncio.sleep(self.revision)
+
+
+class SubidorAsync:
+    """Junta filas en lotes y las sube con un pool HTTP keep-alive, varios lotes en vuelo"""
+
+    def __init__(self, url: str, clave: str, tabla='pesajes_tiempo_real', tamano_lote=50,
+                 intervalo_max=1.0, capacidad=10000, en_vuelo=8, reintentos=3,
+                 spool: SpoolLocal = None, intervalo_spool=5.0, metricas=None):
+        self.url = url
+        self.clave = clave
+        self.tabla = tabla
+        self.tamano_lote = tamano_lote
+        self.intervalo_max = intervalo_max
+        self.en_vuelo = en_vuelo
+        self.reintentos = reintentos
+        self.spool = spool
+        self.intervalo_spool = intervalo_spool
+
+        self._cola = asyncio.Queue(maxsize=capacidad)
+        self._cupos = asyncio.Semaphore(en_vuelo)
+        self._envios = set()
+        self._tareas = []
+        self._cliente = None
+        self._juntando = []  # Lote que _juntar está armando (se rescata si se cancela a mitad)
+
+        self.encolados = 0
+        self.enviados = 0
+        self.al_spool = 0
+        self.del_spool = 0
+        self.errores = 0
+
+        self._h_espera = self._h_insert = None
+        if metricas:
+            self._h_espera = metricas.histograma('espera_uploader', 'Registro encolado → envío de su lote')
+            self._h_insert = metricas.histograma('insert_http', 'Upsert de un lote en Supabase')
+            metricas.indicador('profundidad_cola_uploader', self._cola.qsize, 'Registros esperando lote')
+            metricas.indicador('requests_en_vuelo', lambda: len(self._envios), 'Upserts sin respuesta')
+            metricas.indicador('filas_subidas', lambda: self.enviados + self.del_spool, 'Filas confirmadas por Supabase')
+            metricas.indicador('errores_supabase', lambda: self.errores, 'Intentos de upsert fallidos')
+
+    def _crear_cliente(self) -> AsyncPostgrestClient:
+        limites = httpx.Limits(max_connections=self.en_vuelo, max_keepalive_connections=self.en_vuelo,
+                               keepalive_expiry=60)
+
+        class ClienteConPool(AsyncPostgrestClient):
+            def create_session(self, base_url, headers, timeout):
+                return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=limites)
+
+        cliente = ClienteConPool(f"{self.url}/rest/v1", timeout=30)
+        cliente.auth(self.clave)
+        cliente.session.headers['apikey'] = self.clave
+        return cliente
+
+    # -------------------- Productor --------------------
+
+    async def poner(self, registro: dict):
+        """Encola una fila; si la cola está llena espera (contrapresión hacia el bucle de tramas)"""
+        await self._cola.put((time.monotonic(), registro))
+        self.encolados += 1
+
+    # -------------------- Ciclo de vida --------------------
+
+    async def iniciar(self):
+        self._cliente = self._crear_cliente()
+        self._tareas = [asyncio.create_task(self._juntar(), name='subidor-lotes')]
+        if self.spool:
+            self._tareas.append(asyncio.create_task(self._drenar_spool(), name='subidor-spool'))
+        return self
+
+    async def detener(self, timeout=10.0):
+        """Sube lo encolado, espera los requests en vuelo y cierra el pool"""
+        try:
+            await asyncio.wait_for(self._cola.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        if self._envios:
+            await asyncio.wait(self._envios, timeout=timeout)
+        # Los que siguen reintentando se cancelan: _enviar deja sus filas en el spool
+        envios = list(self._envios)
+        for envio in envios:
+            envio.cancel()
+        await asyncio.gather(*envios, return_exceptions=True)
+        # Lo que no alcanzó a salir queda en el spool para la próxima vez
+        resto = [registro for _, registro in self._juntando]
+        self._juntando = []
+        while not self._cola.empty():
+            resto.append(self._cola.get_nowait()[1])
+        if resto and self.spool:
+            self.spool.agregar_lote(self.tabla, resto)
+            self.al_spool += len(resto)
+        await self._cliente.aclose()
+
+    def estadisticas(self) -> dict:
+        return {
+            'profundidad_cola': self._cola.qsize(),
+            'en_vuelo': len(self._envios),
+            'encolados': self.encolados,
+            'enviados': self.enviados,
+            'al_spool': self.al_spool,
+            'del_spool': self.del_spool,
+            'errores': self.errores,
+        }
+
+    # -------------------- Envío --------------------
+
+    async def _juntar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = self._juntando = [await self._cola.get()]
+            limite = loop.time() + self.intervalo_max
+            while len(lote) < self.tamano_lote:
+                if not self._cola.empty():
+                    lote.append(self._cola.get_nowait())
+                    continue
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._cupos.acquire()  # Como mucho `en_vuelo` lotes sin respuesta
+            envio = asyncio.create_task(self._enviar(lote))
+            self._juntando = []
+            self._envios.add(envio)
+            envio.add_done_callback(self._envios.discard)
+
+    async def _upsert(self, filas: list):
+        inicio = time.perf_counter()
+        await (self._cliente.table(self.tabla)
+               .upsert(filas, on_conflict='clave_idempotencia', ignore_duplicates=True,
+                       returning=ReturnMethod.minimal)
+               .execute())
+        if self._h_insert:
+            self._h_insert.observar(time.perf_counter() - inicio)
+
+    async def _enviar(self, lote: list):
+        filas = [dict(registro, clave_idempotencia=registro.get('clave_idempotencia') or str(uuid.uuid4()))
+                 for _, registro in lote]
+        try:
+            if self._h_espera:
+                ahora = time.monotonic()
+                self._h_espera.observar_varios([ahora - instante for instante, _ in lote])
+            espera = 0.5
+            for intento in range(self.reintentos + 1):
+                try:
+                    await self._upsert(filas)
+                    self.enviados += len(filas)
+                    return
+                except Exception as e:
+                    self.errores += 1
+                    print(f"⚠️ Error enviando lote de {len(filas)} filas (intento {intento + 1}): {e}")
+                    if intento < self.reintentos:
+                        await asyncio.sleep(espera)
+                        espera = min(espera * 2, 10.0)
+            if self.spool:
+                await asyncio.to_thread(self.spool.agregar_lote, self.tabla, filas)
+                self.al_spool += len(filas)
+        except asyncio.CancelledError:
+            # Cancelado al detener: puede que el upsert haya llegado, pero con la misma
+            # clave_idempotencia reenviarlo desde el spool no duplica nada
+            if self.spool:
+                self.spool.agregar_lote(self.tabla, filas)
+                self.al_spool += len(filas)
+            raise
+        finally:
+            for _ in lote:
+                self._cola.task_done()
+            self._cupos.release()
+
+    async def _upsert_spool(self, tabla: str, filas: list):
+        async with self._cupos:
+            await (self._cliente.table(tabla)
+                   .upsert(filas, on_conflict='clave_idempotencia', ignore_duplicates=True,
+                           returning=ReturnMethod.minimal)
+                   .execute())
+
+    async def _aislar(self, tabla: str, pendientes: list, error: Exception) -> int:
+        """Como ReplayerSpool._aislar: aparta la fila rechazada para que no bloquee el spool"""
+        pasos = aislar_rechazo(self.spool, tabla, pendientes, error)
+        fallo = None
+        try:
+            while True:
+                filas = pasos.send(fallo)
+                try:
+                    await self._upsert_spool(tabla, filas)
+                    fallo = None
+                except Exception as e:
+                    fallo = e
+        except StopIteration as fin:
+            return fin.value
+
+    async def _drenar_spool(self):
+        """Reintenta lo que quedó en el spool (de este modo o del modo normal) con el mismo pool"""
+        espera = self.intervalo_spool
+        while True:
+            await asyncio.sleep(espera)
+            try:
+                for tabla in await asyncio.to_thread(self.spool.tablas_pendientes):
+                    while True:
+                        pendientes = await asyncio.to_thread(self.spool.leer_pendientes, tabla, 200)
+                        if not pendientes:
+                            break
+                        try:
+                            await self._upsert_spool(tabla, [registro for _, registro in pendientes])
+                        except Exception as e:
+                            if not es_rechazo(e):
+                                raise
+                            self.del_spool += await self._aislar(tabla, pendientes, e)
+                            continue
+                        await asyncio.to_thread(self.spool.confirmar, [id_ for id_, _ in pendientes])
+                        self.del_spool += len(pendientes)
+                espera = self.intervalo_spool
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errores += 1
+                espera = min(espera * 2, 60.0)
+                print(f"⚠️ Supabase no disponible, el spool se reintenta en {espera:.0f} s: {e}")
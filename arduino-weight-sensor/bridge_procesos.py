@@ -0,0 +1,110 @@
+"""
+Modo procesos del bridge - Un proceso por balanza, tablero de pesos en memoria compartida
+
+Con muchas balanzas y filtrado en el PC, el modo normal y el `--async`
+comparten un solo GIL para parsear, filtrar y reducir todas las lecturas.
+Con `--procesos`, cada balanza tiene su propio proceso. Ese proceso tiene
+su propio supervisor, filtro, reductor y uploader, y guarda sus filas
+directo en el spool SQLite (WAL admite varios procesos escribiendo).
+
+Cada proceso publica su última lectura y sus contadores en el
+`TableroPesos` (memoria compartida, sin pickle). El proceso principal solo
+lee el tablero: despierta al replayer cuando aparecen filas nuevas en el
+spool y muestra el resumen al final.
+"""
+
+import os
+import queue
+import signal
+import time
+
+from protocolo import ParserTramas, TRAMA_JSON, TRAMA_ESTADO
+from spool import SpoolLocal
+from supervisor import SupervisorConexion
+from tablero import TableroPesos
+from uploader import UploaderPorLotes
+
+
+def trabajar_estacion(indice: int, puerto: str, estacion: str, nombre_tablero: str, detener, args):
+    """Cuerpo del proceso de una balanza: lee, filtra, reduce y guarda en el spool hasta `detener`"""
+    import arduino_bridge as bridge
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C lo atiende el proceso principal
+    tablero = TableroPesos.adjuntar(nombre_tablero)
+    tablero.publicar(indice, pid=os.getpid())
+
+    spool = SpoolLocal(bridge.SPOOL_RUTA)
+    resumenes = bridge.crear_resumenes(args, None)
+    filas_guardadas = 0
+
+    def guardar_lote(filas):
+        # Corre en el hilo del uploader: el tablero admite un solo escritor por registro,
+        # así que `filas` lo publica el bucle principal junto con los contadores
+        nonlocal filas_guardadas
+        spool.agregar_lote('pesajes_tiempo_real', filas)
+        filas_guardadas += len(filas)
+        if resumenes:
+            resumenes.agregar_lote('pesajes_tiempo_real', filas)
+
+    uploader = UploaderPorLotes(guardar_lote, tamano_lote=bridge.TAMANO_LOTE, intervalo_max=bridge.INTERVALO_LOTE,
+                                capacidad=bridge.CAPACIDAD_COLA)
+    uploader.iniciar()
+    reductor = bridge.crear_reductor(args)
+    filtro = bridge.crear_filtro(args, [(puerto, estacion)])
+
+    parser = ParserTramas()
+    cola = queue.Queue(maxsize=bridge.CAPACIDAD_TRAMAS)
+    supervisor = SupervisorConexion(puerto, bridge.BAUD_RATE, cola, bridge.etiquetar(estacion, parser),
+                                    nombre=estacion, plazo=args.plazo,
+                                    espera_max=bridge.ESPERA_RECONEXION_MAX).iniciar()
+
+    def publicar_contadores():
+        # filas nuevas en el tablero: el proceso principal despierta al replayer
+        tablero.publicar(indice, filas=filas_guardadas, conectado=supervisor.conectado, lineas=supervisor.lineas,
+                         descartadas=supervisor.descartadas, malformadas=parser.contadores['malformadas'],
+                         caidas=supervisor.caidas, reconexiones=supervisor.reconexiones)
+
+    lecturas = 0
+    try:
+        while not detener.is_set():
+            try:
+                primero = cola.get(timeout=0.5)
+            except queue.Empty:
+                for fila in reductor.vencidas(time.monotonic()):
+                    uploader.encolar(fila)
+                publicar_contadores()
+                continue
+
+            items = [primero] + (bridge.drenar_cola(cola, bridge.FILTRO_LOTE - 1) if filtro else [])
+            ultima = None
+            for instante, _, tipo, datos in bridge.filtrar_lote(filtro, items):
+                if tipo == TRAMA_JSON:
+                    lecturas += 1
+                    ultima = datos
+                    for fila in reductor.procesar(bridge.armar_registro(datos, estacion), estacion, instante):
+                        if not uploader.encolar(fila):
+                            print(f"⚠️ [{estacion}] Cola de subida llena, lectura descartada")
+                elif tipo == TRAMA_ESTADO and not datos.startswith("Peso:"):
+                    print(f"[{estacion}] {datos}")
+            if ultima is not None:
+                # Una publicación por bloque: el tablero solo guarda la última lectura
+                tablero.publicar(indice, instante=time.time(), peso=ultima['peso'], objetivo=ultima['objetivo'],
+                                 diferencia=ultima['diferencia'], lecturas=lecturas, filas=filas_guardadas)
+            if cola.empty():
+                publicar_contadores()
+    finally:
+        supervisor.detener()
+        for fila in reductor.vaciar():
+            uploader.encolar(fila)
+        uploader.detener()
+        if resumenes:
+            resumenes.detener()
+        publicar_contadores()
+        if filtro:
+            e = filtro.estadisticas()[estacion]
+            tablero.publicar(indice, cero=e['cero_kg'], deriva=e['deriva_kg_h'])
+        tablero.publicar(indice, conectado=False, terminado=True)
+        print(f"🗜️ [{estacion}] Reducción: {reductor.entrada} lecturas → {reductor.salida} filas "
+              f"({reductor.compresion:.1f}:1) | Al spool: {filas_guardadas}")
+        spool.cerrar()
+        tablero.cerrar()
@@ -0,0 +1,101 @@
+"""
+Caché de fábricas - Resuelve nombre → id sin un viaje a Supabase por saco
+
+Se precargan las fábricas activas al iniciar y se refrescan cuando vence
+el TTL. El refresco corre en un hilo aparte y mientras tanto se responde
+con lo que ya está en memoria: escanear o ingresar un código no espera
+por él. Solo se espera a la red cuando aparece un nombre nuevo; en ese
+caso se hace un upsert sobre `nombre` (índice único) para que dos
+estaciones que crean la misma fábrica a la vez no generen duplicados.
+"""
+
+import threading
+import time
+
+
+def _normalizar(nombre: str) -> str:
+    return " ".join(nombre.split()).casefold()
+
+
+class CacheFabricas:
+    """Mapa nombre de fábrica → id con refresco por TTL"""
+
+    def __init__(self, supabase, ttl=300.0, reintento=30.0):
+        self.supabase = supabase
+        self.ttl = ttl
+        self.reintento = reintento  # Segundos antes de reintentar un refresco fallido
+
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._cargado = 0.0
+        self._refrescando = False
+
+        self.aciertos = 0
+        self.fallos = 0
+
+    def precargar(self):
+        """Carga todas las fábricas activas (id, nombre) en un solo request"""
+        response = self.supabase.table("fabricas").select("id, nombre").eq("activa", True).execute()
+        ids = {_normalizar(f["nombre"]): f["id"] for f in response.data or []}
+        with self._lock:
+            self._ids = ids
+            self._cargado = time.monotonic()
+        return len(ids)
+
+    def posponer_refresco(self):
+        """Tras un fallo de red, no reintentar en cada saco sino en `reintento` segundos"""
+        with self._lock:
+            self._cargado = time.monotonic() - self.ttl + self.reintento
+
+    def _vencida(self) -> bool:
+        return time.monotonic() - self._cargado > self.ttl
+
+    def _refrescar_en_segundo_plano(self):
+        with self._lock:
+            if self._refrescando:
+                return
+            self._refrescando = True
+        threading.Thread(target=self._refrescar, name="cache-fabricas", daemon=True).start()
+
+    def _refrescar(self):
+        try:
+            self.precargar()
+        except Exception as e:
+            # Sin red se sigue usando lo que ya está en memoria
+            print(f"⚠️ No se pudo refrescar la caché de fábricas: {e}")
+            self.posponer_refresco()
+        finally:
+            with self._lock:
+                self._refrescando = False
+
+    def resolver(self, nombre: str) -> int:
+        """Devuelve el id de la fábrica, creándola si no existe (solo eso bloquea en la red)"""
+        if self._vencida():
+            self._refrescar_en_segundo_plano()
+
+        clave = _normalizar(nombre)
+        with self._lock:
+            fabrica_id = self._ids.get(clave)
+        if fabrica_id is not None:
+            self.aciertos += 1
+            return fabrica_id
+
+        self.fallos += 1
+        fabrica_id = self._obtener_o_crear(nombre.strip())
+        with self._lock:
+            self._ids[clave] = fabrica_id
+        return fabrica_id
+
+    def _obtener_o_crear(self, nombre: str) -> int:
+        response = self.supabase.table("fabricas").upsert({
+            "nombre": nombre,
+            "codigo": nombre[:10].upper(),
+            "tipo": "Otros",
+            "activa": True
+        }, on_conflict="nombre", ignore_duplicates=True).execute()
+        if response.data:
+            return response.data[0]["id"]
+
+        # Ya existía (la creó otra estación): el upsert no devuelve filas
+        response = self.supabase.table("fabricas").select("id").eq("nombre", nombre).limit(1).execute()
+        return response.data[0]["id"]
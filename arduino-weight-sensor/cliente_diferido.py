@@ -0,0 +1,89 @@
+"""
+Cliente diferido - Crea el cliente de Supabase en segundo plano
+
+Importar `supabase` y crear el cliente toma casi medio segundo, y sin
+red o sin `.env` el programa se caía antes de mostrar la ventana. Este
+envoltorio hace ese trabajo en un hilo (reintentando si falla) y después
+"calienta" la conexión con una primera consulta.
+
+Se usa como el cliente real (`supabase.table(...)`): quien lo necesite
+antes de que esté listo espera como mucho `espera` segundos y, si sigue
+sin estar, recibe un `ConnectionError` que el spool y la caché de
+fábricas ya saben reintentar.
+"""
+
+import threading
+import time
+
+
+class ClienteDiferido:
+    """Cliente creado en un hilo; los atributos se delegan al cliente real cuando existe"""
+
+    def __init__(self, crear, calentar=None, espera=5.0, reintento=5.0, reintento_max=60.0):
+        # crear() -> cliente; calentar(cliente) hace la primera consulta (DNS + TLS + keep-alive)
+        self._crear = crear
+        self._calentar = calentar
+        self.espera = espera
+        self.reintento = reintento
+        self.reintento_max = reintento_max
+
+        self._cliente = None
+        self._listo = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._inicio = None
+
+        self.error = None
+        self.segundos_crear = None      # Hasta tener el cliente
+        self.segundos_calentar = None   # Hasta completar la primera consulta
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._inicio = time.perf_counter()
+            self._hilo = threading.Thread(target=self._preparar, name="cliente-supabase", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+
+    @property
+    def listo(self) -> bool:
+        return self._listo.is_set()
+
+    def obtener(self, timeout: float = None):
+        """El cliente real; espera hasta `timeout` (por defecto `espera`) si todavía se está creando"""
+        if not self._listo.wait(self.espera if timeout is None else timeout):
+            motivo = f": {self.error}" if self.error else ""
+            raise ConnectionError(f"El cliente de Supabase aún no está disponible{motivo}")
+        return self._cliente
+
+    def __getattr__(self, nombre):
+        # Solo se llama para lo que no es atributo propio (table, rpc, auth...)
+        return getattr(self.obtener(), nombre)
+
+    def _preparar(self):
+        espera = self.reintento
+        while not self._detener.is_set():
+            try:
+                self._cliente = self._crear()
+                break
+            except Exception as e:
+                self.error = e
+                print(f"⚠️ No se pudo crear el cliente de Supabase, se reintenta en {espera:.0f} s: {e}")
+                if self._detener.wait(espera):
+                    return
+                espera = min(espera * 2, self.reintento_max)
+        else:
+            return
+        self.error = None
+        self.segundos_crear = time.perf_counter() - self._inicio
+        self._listo.set()
+
+        if self._calentar:
+            try:
+                self._calentar(self._cliente)
+                self.segundos_calentar = time.perf_counter() - self._inicio
+            except Exception as e:
+                # El cliente sirve igual: las consultas reintentan por su cuenta
+                print(f"⚠️ Primera consulta a Supabase fallida: {e}")
@@ -0,0 +1,170 @@
+"""
+Escáner de códigos - Flujo continuo de la estación de pesaje
+
+En modo continuo el operador no toca la pantalla: escanea la etiqueta del
+saco, lo deja en la balanza y el peso estable se guarda solo. El siguiente
+escaneo empieza el siguiente saco.
+
+El código dice el producto y la fábrica por su prefijo (ej. `AT-NOR-000123`
+→ Atún de Planta Norte). Los prefijos están en `prefijos_escaner.csv`
+(`prefijo;producto;fabrica`); gana el prefijo más largo que coincida.
+
+Sirven los lectores que escriben como teclado (`AcumuladorTeclado` junta
+las teclas hasta el Enter) y los que van por puerto serial (una línea por
+código). `CicloSacos` mide cuánto tarda cada saco y cuántos sacos por hora
+salen.
+"""
+
+import csv
+import os
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+PREFIJOS_CSV = 'prefijos_escaner.csv'
+
+# Si no hay archivo de prefijos: solo producto, la fábrica se toma de la última usada
+PREFIJOS_INICIALES = {
+    "AT": ("ATUN", None),
+    "PA": ("PALMITO", None),
+}
+
+
+class Escaneo(NamedTuple):
+    codigo: str
+    producto: str
+    fabrica: Optional[str]  # Nombre de la fábrica; None = la última usada en la estación
+
+
+def cargar_prefijos(ruta=PREFIJOS_CSV, por_defecto=PREFIJOS_INICIALES) -> dict:
+    """{prefijo: (producto, fabrica | None)} desde el CSV, o los de por defecto si no existe"""
+    if not os.path.exists(ruta):
+        return dict(por_defecto)
+    prefijos = {}
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        for fila in csv.DictReader(f, delimiter=';'):
+            prefijo = (fila.get('prefijo') or '').strip().upper()
+            producto = (fila.get('producto') or '').strip().upper()
+            if prefijo and producto:
+                prefijos[prefijo] = (producto, (fila.get('fabrica') or '').strip() or None)
+    return prefijos
+
+
+def interpretar(codigo: str, prefijos: dict) -> Optional[Escaneo]:
+    """Escaneo del código, o None si ningún prefijo coincide"""
+    codigo = codigo.strip()
+    normalizado = codigo.upper()
+    for prefijo in sorted(prefijos, key=len, reverse=True):
+        if normalizado.startswith(prefijo):
+            producto, fabrica = prefijos[prefijo]
+            return Escaneo(codigo, producto, fabrica)
+    return None
+
+
+def decodificar_linea(linea: bytes):
+    """parsear para el LectorSerial de un escáner serial: el código sin el fin de línea"""
+    codigo = linea.decode('ascii', errors='ignore').strip()
+    return codigo or None
+
+
+class AcumuladorTeclado:
+    """Junta las teclas de un escáner tipo teclado hasta el Enter.
+
+    El escáner escribe cada código en pocos milisegundos; si entre dos teclas
+    pasan más de `pausa_max` s, lo anterior se descarta (fue alguien tocando
+    el teclado, no el escáner).
+    """
+
+    def __init__(self, pausa_max=0.3, largo_min=4):
+        self.pausa_max = pausa_max
+        self.largo_min = largo_min
+        self._teclas = []
+        self._ultima = 0.0
+
+    def tecla(self, caracter: str, instante: float = None) -> Optional[str]:
+        """Agrega una tecla; devuelve el código completo al llegar el Enter"""
+        instante = time.monotonic() if instante is None else instante
+        if instante - self._ultima > self.pausa_max:
+            self._teclas.clear()
+        self._ultima = instante
+
+        if caracter in ('\r', '\n'):
+            codigo = ''.join(self._teclas).strip()
+            self._teclas.clear()
+            return codigo if len(codigo) >= self.largo_min else None
+        if caracter.isprintable() and caracter:
+            self._teclas.append(caracter)
+        return None
+
+
+class CicloSacos:
+    """Tiempo por saco y sacos por hora en el flujo continuo.
+
+    El ciclo de un saco va de un guardado al siguiente (escaneo, colocar,
+    asentarse, guardar, retirar). Después de guardar no se vuelve a guardar
+    hasta que la balanza baje de `umbral_vacio` kg: así el saco anterior no
+    se registra con el código del siguiente si se escanea antes de retirarlo.
+    """
+
+    def __init__(self, umbral_vacio=0.05, fraccion_minima=0.5, historial=20, metricas=None):
+        self.umbral_vacio = umbral_vacio
+        self.fraccion_minima = fraccion_minima  # Del objetivo: menos que esto no es un saco completo
+        self._ciclos = deque(maxlen=historial)
+        self._guardados = deque(maxlen=historial + 1)
+        self._h_ciclo = metricas.histograma('ciclo_saco', 'Guardado → guardado en modo continuo') if metricas else None
+
+        self.escaneado = None      # Instante del escaneo del saco en curso
+        self.armado = True         # False desde que se guarda hasta que se retira el saco
+        self.total = 0
+        self.descartados = 0       # Escaneados que no llegaron a guardarse
+        self.ultimo_ciclo = None
+        self.ultima_espera = None  # Escaneo → guardado del último saco
+
+    def escaneo(self, instante: float = None):
+        instante = time.monotonic() if instante is None else instante
+        if self.escaneado is not None:
+            self.descartados += 1
+        self.escaneado = instante
+
+    def peso(self, kg: float):
+        """Cada lectura de la balanza (hilo de la interfaz)"""
+        if kg < self.umbral_vacio:
+            self.armado = True
+
+    def puede_guardar(self, kg: float, objetivo: float) -> bool:
+        return self.escaneado is not None and self.armado and kg >= objetivo * self.fraccion_minima
+
+    def guardado(self, instante: float = None):
+        instante = time.monotonic() if instante is None else instante
+        if self._guardados:
+            self.ultimo_ciclo = instante - self._guardados[-1]
+            self._ciclos.append(self.ultimo_ciclo)
+            if self._h_ciclo:
+                self._h_ciclo.observar(self.ultimo_ciclo)
+        self.ultima_espera = instante - self.escaneado if self.escaneado is not None else None
+        self._guardados.append(instante)
+        self.escaneado = None
+        self.armado = False
+        self.total += 1
+
+    def reiniciar(self):
+        """Al salir del modo continuo: una pausa no cuenta como ciclo"""
+        self._guardados.clear()
+        self.escaneado = None
+        self.armado = True
+
+    @property
+    def ciclo_medio(self) -> Optional[float]:
+        return sum(self._ciclos) / len(self._ciclos) if self._ciclos else None
+
+    @property
+    def sacos_hora(self) -> Optional[float]:
+        if len(self._guardados) < 2:
+            return None
+        return (len(self._guardados) - 1) * 3600.0 / (self._guardados[-1] - self._guardados[0])
+
+    def resumen(self) -> str:
+        if self.ultimo_ciclo is None:
+            return f"⏱️ Sacos: {self.total}"
+        return (f"⏱️ Ciclo: {self.ultimo_ciclo:.1f} s | Media: {self.ciclo_medio:.1f} s | "
+                f"{self.sacos_hora:.0f} sacos/h | Sacos: {self.total}")
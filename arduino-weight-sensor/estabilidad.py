@@ -0,0 +1,94 @@
+"""
+Detector de peso estable - Ventana deslizante con media/varianza en O(1)
+
+Cada lectura entra en un buffer circular de `ventana` muestras y se
+actualizan la media y la suma de cuadrados de los desvíos (Welford, con la
+muestra que sale reemplazada por la que entra), sin recorrer la ventana.
+Restar Σx² sobre pesos de kilos acumulaba error de redondeo en turnos
+largos; con los desvíos el error queda en la escala del ruido, y además
+cada vuelta del buffer se recalculan exactos.
+
+El peso se considera estable cuando la ventana está llena y su desviación
+estándar es menor a `tolerancia_kg`. Se emite un evento de "peso estable"
+una vez por asentamiento: no se repite mientras el saco siga quieto, y se
+rearma cuando el peso cambia o se retira el saco.
+"""
+
+import math
+import threading
+
+
+class DetectorEstabilidad:
+    """Detecta cuándo la balanza se asienta y entrega el peso estable"""
+
+    def __init__(self, ventana=4, tolerancia_kg=0.002, peso_minimo=0.02, al_estabilizar=None):
+        # al_estabilizar(peso) se llama desde el hilo que invoca agregar()
+        self.ventana = ventana
+        self.tolerancia_kg = tolerancia_kg
+        self.peso_minimo = peso_minimo
+        self.al_estabilizar = al_estabilizar
+
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Vacía la ventana (ej. después de una tara)"""
+        with self._lock:
+            self._buffer = [0.0] * self.ventana
+            self._indice = 0
+            self._cuenta = 0
+            self._media = 0.0
+            self._m2 = 0.0  # Σ (x - media)² de la ventana
+            self._emitido = None
+            self.peso_estable = None
+
+    def agregar(self, peso: float):
+        """Agrega una lectura; devuelve el peso estable si esta muestra completó un asentamiento"""
+        with self._lock:
+            saliente = self._buffer[self._indice]
+            self._buffer[self._indice] = peso
+            self._indice = (self._indice + 1) % self.ventana
+
+            if self._cuenta < self.ventana:
+                self._cuenta += 1
+                delta = peso - self._media
+                self._media += delta / self._cuenta
+                self._m2 += delta * (peso - self._media)
+            elif self._indice == 0:
+                self._recalcular()
+            else:
+                media = self._media + (peso - saliente) / self._cuenta
+                self._m2 += (peso - saliente) * (peso - media + saliente - self._media)
+                self._media = media
+
+            media = self._media
+            estable = self._cuenta == self.ventana and self._desviacion(media) <= self.tolerancia_kg
+            self.peso_estable = media if estable else None
+
+            if media < self.peso_minimo:
+                # Balanza vacía: el próximo saco vuelve a generar evento
+                self._emitido = None
+                return None
+
+            if not estable:
+                return None
+            if self._emitido is not None and abs(media - self._emitido) <= 3 * self.tolerancia_kg:
+                return None
+            self._emitido = media
+
+        if self.al_estabilizar:
+            self.al_estabilizar(media)
+        return media
+
+    def _recalcular(self):
+        """Media y Σ desvíos² exactos desde el buffer (una vez por vuelta: O(1) amortizado)"""
+        self._media = sum(self._buffer) / self._cuenta
+        self._m2 = sum((x - self._media) ** 2 for x in self._buffer)
+
+    def _desviacion(self, media: float) -> float:
+        varianza = self._m2 / self._cuenta
+        return math.sqrt(varianza) if varianza > 0 else 0.0
+
+    @property
+    def estable(self) -> bool:
+        return self.peso_estable is not None
@@ -0,0 +1,337 @@
+"""
+Exportación columnar del historial de pesajes (Parquet / Arrow IPC)
+
+Recorre `sacos` y `pesajes_tiempo_real` por páginas (o el backup CSV de
+las estaciones) y escribe archivos columnares particionados por día y
+fábrica, con tipos fijos (float64, int64, fechas UTC, categorías):
+
+    exportes/sacos/dia=2025-11-20/fabrica_id=3/parte-20251120T180501-1f3a9c2e-0.parquet
+    exportes/pesajes_tiempo_real/dia=2025-11-20/fabrica=Planta%20Norte/parte-...parquet
+    exportes/sacos/_marca.json        ← último id exportado
+
+Cada corrida continúa desde `_marca.json`, así que exportar todos los
+días solo baja las filas nuevas. `--desde-cero` borra antes las
+particiones que reescribe (todas para Supabase, los días leídos para el
+CSV), así que no deja filas repetidas. Las columnas de partición (`dia` y
+la fábrica) van en la ruta, no dentro de los archivos; `cargar()` las
+devuelve como columnas normales.
+
+Uso:
+    python exportar.py                          # sacos + pesajes_tiempo_real desde Supabase
+    python exportar.py --tabla sacos --formato arrow
+    python exportar.py --origen csv             # backup CSV de registros/
+    python exportar.py --desde-cero             # ignora la marca y reexporta todo
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import date, datetime
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from registro_local import leer_rango, segmentos, DIRECTORIO_REGISTROS
+
+# ==================== CONFIGURACIÓN ====================
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY') or os.getenv('SUPABASE_ANON_KEY')
+
+DIRECTORIO_EXPORTES = 'exportes'
+TAMANO_PAGINA = 1000           # Filas por request (límite por defecto de PostgREST)
+FILAS_POR_ESCRITURA = 200_000  # Filas acumuladas antes de escribir archivos y avanzar la marca
+
+# Columnas de cada tabla: fecha que define el día, columna de fábrica y tipos
+TABLAS = {
+    'sacos': {
+        'fecha': 'fecha_pesaje',
+        'fabrica': 'fabrica_id',
+        'tipos': {
+            'id': 'int64', 'codigo': 'string', 'pedido_id': 'Int64', 'fabrica_id': 'Int64',
+            'peso_objetivo': 'float64', 'peso_real': 'float64', 'diferencia': 'float64',
+            'estado': 'category', 'lote': 'category', 'clave_idempotencia': 'string',
+        },
+        'fechas': ['fecha_pesaje', 'created_at'],
+    },
+    'pesajes_tiempo_real': {
+        'fecha': 'timestamp',
+        'fabrica': 'fabrica',
+        'tipos': {
+            'id': 'int64', 'peso_actual': 'float64', 'peso_objetivo': 'float64', 'diferencia': 'float64',
+            'codigo_saco': 'string', 'fabrica': 'string', 'estado': 'category', 'estacion': 'category',
+            'clave_idempotencia': 'string', 'peso_min': 'float64', 'peso_max': 'float64', 'muestras': 'Int32',
+        },
+        'fechas': ['timestamp', 'created_at'],
+    },
+}
+
+# Backup CSV de las estaciones (layouts de 10 y de 8 columnas)
+COLUMNAS_CSV = {
+    'Fecha': 'fecha',
+    'Código Saco': 'codigo_saco',
+    'Saco Identificado': 'producto',
+    'Peso Base (kg)': 'peso_base',
+    'Peso Objetivo (kg)': 'peso_objetivo',
+    'Peso Actual (kg)': 'peso_actual',
+    'Diferencia (kg)': 'diferencia',
+    'Unidades Faltantes/Sobrantes': 'unidades',
+    'Tolerancia': 'tolerancia',
+    'Resultado': 'resultado',
+}
+TABLA_CSV = 'registro_inventario'
+
+# ========================================================
+
+
+def tipar(df: pd.DataFrame, tabla: str) -> pd.DataFrame:
+    """Convierte las columnas a tipos fijos para que todos los archivos tengan el mismo esquema"""
+    config = TABLAS[tabla]
+    for columna in config['fechas']:
+        if columna in df:
+            df[columna] = pd.to_datetime(df[columna], utc=True, format='ISO8601')
+    for columna, tipo in config['tipos'].items():
+        if columna in df:
+            df[columna] = pd.to_numeric(df[columna]) if tipo == 'float64' else df[columna]
+            df[columna] = df[columna].astype(tipo)
+    return df
+
+
+def borrar_particiones(destino: str):
+    """Borra las particiones `dia=...` y la marca de una exportación (para reexportar desde cero)"""
+    if not os.path.isdir(destino):
+        return
+    for nombre in os.listdir(destino):
+        if nombre.startswith('dia='):
+            shutil.rmtree(os.path.join(destino, nombre))
+    try:
+        os.remove(os.path.join(destino, '_marca.json'))
+    except FileNotFoundError:
+        pass
+
+
+def escribir_particiones(df: pd.DataFrame, destino: str, columna_fecha: str,
+                         columna_fabrica: str = None, formato='parquet', reemplazar=False) -> int:
+    """Escribe un archivo por (día, fábrica); devuelve cuántos archivos creó.
+
+    Con `reemplazar`, antes de escribir un día se borra lo que ya había en su partición.
+    """
+    if df.empty:
+        return 0
+    # El día se toma en la hora local de la planta, no en UTC
+    zona = datetime.now().astimezone().tzinfo
+    dias = df[columna_fecha].dt.tz_convert(zona).dt.strftime('%Y-%m-%d')
+
+    claves = [dias]
+    if columna_fabrica:
+        claves.append(df[columna_fabrica].astype('string').fillna('__HIVE_DEFAULT_PARTITION__'))
+    # Nombre único por escritura: dos corridas en el mismo segundo no se pisan
+    sello = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    archivos = 0
+    reemplazados = set()
+    for clave, grupo in df.groupby(claves, sort=False, observed=True):
+        clave = clave if isinstance(clave, tuple) else (clave,)
+        ruta = os.path.join(destino, f"dia={clave[0]}")
+        if reemplazar and clave[0] not in reemplazados:
+            shutil.rmtree(ruta, ignore_errors=True)
+            reemplazados.add(clave[0])
+        if columna_fabrica:
+            ruta = os.path.join(ruta, f"{columna_fabrica}={quote(str(clave[1]), safe='')}")
+            grupo = grupo.drop(columns=[columna_fabrica])
+        os.makedirs(ruta, exist_ok=True)
+
+        tabla = pa.Table.from_pandas(grupo, preserve_index=False)
+        extension = 'parquet' if formato == 'parquet' else 'arrow'
+        archivo = os.path.join(ruta, f"parte-{sello}-{archivos}.{extension}")
+        temporal = archivo + '.tmp'
+        if formato == 'parquet':
+            pq.write_table(tabla, temporal, compression='zstd')
+        else:
+            feather.write_feather(tabla, temporal, compression='zstd')
+        os.replace(temporal, archivo)  # Un lector nunca ve un archivo a medio escribir
+        archivos += 1
+    return archivos
+
+
+def leer_marca(destino: str) -> dict:
+    try:
+        with open(os.path.join(destino, '_marca.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def guardar_marca(destino: str, marca: dict):
+    os.makedirs(destino, exist_ok=True)
+    ruta = os.path.join(destino, '_marca.json')
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(marca, f, indent=2)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def paginar(supabase, tabla: str, desde_id: int, tamano=TAMANO_PAGINA):
+    """Páginas de filas con id > desde_id, por keyset (no se degrada con OFFSET grandes)"""
+    while True:
+        filas = (supabase.table(tabla).select('*')
+                 .gt('id', desde_id).order('id').limit(tamano)
+                 .execute().data)
+        if not filas:
+            return
+        yield filas
+        desde_id = filas[-1]['id']
+        if len(filas) < tamano:
+            return
+
+
+def exportar_tabla(supabase, tabla: str, directorio=DIRECTORIO_EXPORTES, formato='parquet',
+                   desde_cero=False) -> int:
+    """Exporta las filas nuevas de una tabla de Supabase; devuelve cuántas exportó"""
+    config = TABLAS[tabla]
+    destino = os.path.join(directorio, tabla)
+    if desde_cero:
+        borrar_particiones(destino)  # Se vuelve a bajar la tabla entera
+    marca = leer_marca(destino)
+    ultimo_id = marca.get('id', 0)
+
+    total = 0
+    acumuladas = []
+    inicio = time.monotonic()
+
+    def volcar():
+        nonlocal acumuladas, total
+        df = tipar(pd.DataFrame.from_records(acumuladas), tabla)
+        escribir_particiones(df, destino, config['fecha'], config['fabrica'], formato)
+        total += len(df)
+        # La marca avanza solo después de escribir: un corte a mitad no pierde filas
+        guardar_marca(destino, {
+            'id': int(df['id'].max()),
+            'created_at': df['created_at'].max().isoformat() if 'created_at' in df else None,
+            'filas': marca.get('filas', 0) + total,
+            'actualizado': datetime.now().astimezone().isoformat(),
+        })
+        acumuladas = []
+
+    for pagina in paginar(supabase, tabla, ultimo_id):
+        acumuladas.extend(pagina)
+        if len(acumuladas) >= FILAS_POR_ESCRITURA:
+            volcar()
+    if acumuladas:
+        volcar()
+
+    duracion = time.monotonic() - inicio
+    print(f"📦 {tabla}: {total} filas nuevas en {duracion:.1f} s → {destino}")
+    return total
+
+
+def exportar_csv(directorio_registros=DIRECTORIO_REGISTROS, directorio=DIRECTORIO_EXPORTES,
+                 formato='parquet', desde_cero=False) -> int:
+    """Exporta el backup CSV rotativo de las estaciones (sin columna de fábrica)"""
+    destino = os.path.join(directorio, TABLA_CSV)
+    marca = {} if desde_cero else leer_marca(destino)
+    disponibles = segmentos(directorio_registros)
+    if not disponibles:
+        print(f"⚠️ No hay registros en {directorio_registros}/")
+        return 0
+
+    ultima_fecha = marca.get('fecha')
+    desde = date.fromisoformat(ultima_fecha[:10]) if ultima_fecha else disponibles[0][0]
+    df = pd.DataFrame.from_records(leer_rango(desde, date.max, directorio_registros))
+    if df.empty:
+        print(f"📦 {TABLA_CSV}: sin filas nuevas")
+        return 0
+
+    df = leidas = df.rename(columns=COLUMNAS_CSV)
+    if ultima_fecha:
+        # La fecha del CSV tiene resolución de segundos: de las filas con la misma fecha
+        # que la marca, las primeras `repetidas` (en orden del archivo) ya se exportaron.
+        # Una marca sin `repetidas` (versión anterior) exportaba todo ese segundo.
+        repetidas = marca.get('repetidas', float('inf'))
+        en_marca = df['fecha'] == ultima_fecha
+        df = df[(df['fecha'] > ultima_fecha) | (en_marca & (en_marca.cumsum() > repetidas))]
+    if df.empty:
+        print(f"📦 {TABLA_CSV}: sin filas nuevas")
+        return 0
+
+    for columna in ('peso_base', 'peso_objetivo', 'peso_actual', 'diferencia', 'unidades'):
+        if columna in df:
+            df[columna] = pd.to_numeric(df[columna], errors='coerce').astype('float64')
+    if 'diferencia' not in df:  # Layout de 8 columnas
+        df['diferencia'] = df['peso_actual'] - df['peso_objetivo']
+    df['tolerancia'] = pd.to_numeric(df['tolerancia'].str.strip('±%'), errors='coerce') / 100
+    df['resultado'] = df['resultado'].astype('category')
+    df['producto'] = df['producto'].astype('category')
+    ultima = df['fecha'].max()
+    repetidas = int((leidas['fecha'] == ultima).sum())
+    # El CSV guarda la hora local sin zona
+    zona = datetime.now().astimezone().tzinfo
+    df['fecha'] = pd.to_datetime(df['fecha'], format='%Y-%m-%d %H:%M:%S').dt.tz_localize(zona).dt.tz_convert('UTC')
+
+    escribir_particiones(df, destino, 'fecha', formato=formato, reemplazar=desde_cero)
+    guardar_marca(destino, {
+        'fecha': ultima,
+        'repetidas': repetidas,
+        'filas': marca.get('filas', 0) + len(df),
+        'actualizado': datetime.now().astimezone().isoformat(),
+    })
+    print(f"📦 {TABLA_CSV}: {len(df)} filas nuevas → {destino}")
+    return len(df)
+
+
+def cargar(tabla: str, directorio=DIRECTORIO_EXPORTES, desde: date = None, hasta: date = None,
+           columnas: list = None) -> pd.DataFrame:
+    """Lee una exportación como DataFrame; el filtro por fecha solo abre las particiones necesarias"""
+    ruta = os.path.join(directorio, tabla)
+    formatos = {os.path.splitext(n)[1] for _, _, archivos in os.walk(ruta) for n in archivos}
+    formato = 'ipc' if '.arrow' in formatos else 'parquet'
+    dataset = ds.dataset(ruta, format=formato, partitioning='hive',
+                         exclude_invalid_files=True, ignore_prefixes=['_', '.'])
+
+    filtro = None
+    if desde:
+        filtro = ds.field('dia') >= desde.isoformat()
+    if hasta:
+        condicion = ds.field('dia') <= hasta.isoformat()
+        filtro = condicion if filtro is None else filtro & condicion
+    df = dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+    fabrica = TABLAS.get(tabla, {}).get('fabrica')
+    if fabrica in df:
+        # Las particiones se infieren de la ruta (un fabrica_id con nulos llegaría como float)
+        df[fabrica] = df[fabrica].astype(TABLAS[tabla]['tipos'][fabrica])
+    if 'dia' in df:
+        df['dia'] = pd.to_datetime(df['dia'].astype(str))
+    return df
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description="Exporta el historial de pesajes a Parquet/Arrow")
+    args.add_argument("--tabla", choices=[*TABLAS, 'todas'], default='todas')
+    args.add_argument("--origen", choices=['supabase', 'csv'], default='supabase')
+    args.add_argument("--formato", choices=['parquet', 'arrow'], default='parquet')
+    args.add_argument("--destino", default=DIRECTORIO_EXPORTES)
+    args.add_argument("--registros", default=DIRECTORIO_REGISTROS, help="Carpeta del backup CSV (--origen csv)")
+    args.add_argument("--desde-cero", action="store_true", help="Ignorar la marca y reexportar todo")
+    args = args.parse_args(argv)
+
+    if args.origen == 'csv':
+        exportar_csv(args.registros, args.destino, args.formato, args.desde_cero)
+        return
+
+    from supabase import create_client
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    tablas = list(TABLAS) if args.tabla == 'todas' else [args.tabla]
+    for tabla in tablas:
+        exportar_tabla(supabase, tabla, args.destino, args.formato, args.desde_cero)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Filtrado digital y compensación de deriva - Lecturas del HX711 en el PC
+
+La calibración del sketch es fija (`SCALE_VALOR`, `OFFSET_VALOR`) y el
+único filtro es el promedio de 10 lecturas del firmware, así que la deriva
+por temperatura y el "creep" del cero aparecen tal cual en `diferencia`.
+`FiltroBalanzas` procesa bloques de lecturas de N balanzas a la vez
+(arreglos NumPy de forma (N, m)) en tres etapas:
+
+1. Mediana móvil de `mediana` muestras: elimina picos sueltos (golpes,
+   lecturas erróneas del HX711). Vectorizada sobre todo el bloque.
+2. Suavizado EMA o Kalman. Son recursivos en el tiempo, así que se
+   recorren las m columnas, pero cada paso opera sobre las N balanzas a
+   la vez. El Kalman (modelo de peso constante) se reinicia cuando la
+   innovación supera `umbral_salto` desvíos: al poner o sacar un saco
+   sigue el escalón enseguida en vez de arrastrarse como una EMA.
+3. Seguimiento automático de cero: mientras la balanza está vacía y
+   quieta (todo el bloque dentro de ±`banda_cero` del cero actual), el
+   cero se corre hacia la lectura a `ritmo_cero` kg/s como máximo y sin
+   alejarse más de `cero_max` del inicial. Cada corrección alimenta una
+   regresión lineal con olvido exponencial que estima la deriva en kg/h;
+   con la balanza cargada, el cero se extrapola con esa deriva.
+
+Las posiciones sin lectura van como NaN (balanzas con distinta cantidad
+de lecturas en el bloque): el estado de esa balanza no cambia.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+METODOS = ('ninguno', 'mediana', 'ema', 'kalman')
+
+
+class FiltroBalanzas:
+    """Mediana + EMA/Kalman + seguimiento de cero y deriva para N balanzas"""
+
+    def __init__(self, n_balanzas: int, metodo='kalman', mediana=5, alfa=0.2, ruido_proceso=1e-8,
+                 ruido_medicion=4e-6, umbral_salto=4.0, seguir_cero=True, banda_cero=0.002,
+                 ritmo_cero=0.0005, cero_max=0.2, olvido_deriva_s=3600.0, horizonte_deriva_s=600.0):
+        # ruido_proceso / ruido_medicion: varianzas en kg² (por muestra) del modelo de Kalman
+        if metodo not in METODOS:
+            raise ValueError(f"Método de filtrado desconocido: {metodo} (opciones: {', '.join(METODOS)})")
+        self.n = n_balanzas
+        self.metodo = metodo
+        self.mediana = mediana if metodo != 'ninguno' else 1
+        self.alfa = alfa
+        self.ruido_proceso = ruido_proceso
+        self.ruido_medicion = ruido_medicion
+        self.umbral_salto = umbral_salto
+        self.seguir_cero = seguir_cero
+        self.banda_cero = banda_cero
+        self.ritmo_cero = ritmo_cero
+        self.cero_max = cero_max
+        self.olvido_deriva_s = olvido_deriva_s
+        self.horizonte_deriva_s = horizonte_deriva_s
+
+        n = n_balanzas
+        self._historia = np.full((n, max(self.mediana - 1, 0)), np.nan)  # Cola de la mediana
+        self._iniciada = np.zeros(n, dtype=bool)
+        self._estimado = np.full(n, np.nan)                              # Salida del suavizado
+        self._varianza = np.full(n, ruido_medicion * 1e3)                # P del Kalman
+
+        self.cero = np.zeros(n)
+        self._cero_inicial = None
+        self._instante_cero = np.full(n, np.nan)  # Última corrección de cero (segundos)
+        self._t0 = None
+        # Sumas ponderadas de la regresión cero ~ tiempo: Σw, Σw·t, Σw·c, Σw·t², Σw·t·c
+        self._sumas = np.zeros((5, n))
+
+        self.saltos = np.zeros(n, dtype=np.int64)
+        self.correcciones_cero = np.zeros(n, dtype=np.int64)
+
+    # -------------------- Entrada --------------------
+
+    def procesar(self, valores, instantes) -> np.ndarray:
+        """Filtra un bloque (N, m) en kg; `instantes` (N, m) o (m,) en segundos. NaN = sin lectura.
+
+        Las lecturas válidas de cada fila deben ir al principio (relleno NaN al final).
+        Devuelve el peso neto filtrado, con NaN donde no había lectura.
+        """
+        valores = np.asarray(valores, dtype=np.float64).reshape(self.n, -1)
+        instantes = np.broadcast_to(np.asarray(instantes, dtype=np.float64), valores.shape)
+        validos = ~np.isnan(valores)
+        if not validos.any():
+            return valores.copy()
+        if self._t0 is None:
+            self._t0 = np.nanmin(instantes)
+
+        y = self._filtrar_mediana(valores, validos)
+        if self.metodo == 'ema':
+            y = self._suavizar(y, validos, self._paso_ema)
+        elif self.metodo == 'kalman':
+            y = self._suavizar(y, validos, self._paso_kalman)
+
+        if self.seguir_cero:
+            self._seguir_cero(y, validos, instantes)
+        return y - self.cero_estimado(instantes)
+
+    # -------------------- Etapas --------------------
+
+    def _filtrar_mediana(self, x, validos):
+        k = self.mediana
+        if k <= 1:
+            return x
+        # Filas que reciben su primera lectura: la historia arranca repitiéndola
+        nuevas = ~self._iniciada & validos[:, 0]
+        if nuevas.any():
+            self._historia[nuevas] = x[nuevas, :1]
+            self._iniciada |= nuevas
+
+        extendido = np.concatenate([self._historia, x], axis=1)
+        salida = np.median(sliding_window_view(extendido, k, axis=1), axis=2)
+
+        # La nueva historia son las últimas k-1 lecturas válidas de cada fila
+        cuentas = validos.sum(axis=1)
+        indices = cuentas[:, None] + np.arange(k - 1)
+        self._historia = np.take_along_axis(extendido, indices, axis=1)
+        return np.where(validos, salida, np.nan)
+
+    def _suavizar(self, x, validos, paso):
+        salida = np.empty_like(x)
+        todas = validos.all(axis=0)
+        for j in range(x.shape[1]):
+            salida[:, j] = paso(x[:, j], None if todas[j] else validos[:, j])
+        return np.where(validos, salida, np.nan)
+
+    def _paso_ema(self, z, validas):
+        nuevo = np.where(np.isnan(self._estimado), z, self._estimado + self.alfa * (z - self._estimado))
+        self._estimado = nuevo if validas is None else np.where(validas, nuevo, self._estimado)
+        return self._estimado
+
+    def _paso_kalman(self, z, validas):
+        p = self._varianza + self.ruido_proceso
+        innovacion = z - self._estimado
+        salto = innovacion * innovacion > self.umbral_salto ** 2 * (p + self.ruido_medicion)
+        arranque = np.isnan(self._estimado)
+        reinicio = salto | arranque
+        if validas is not None:
+            reinicio &= validas
+        if reinicio.any():
+            # Escalón (saco puesto o retirado): el filtro olvida lo anterior
+            self.saltos += salto & reinicio
+            p = np.where(reinicio, self.ruido_medicion * 1e3, p)
+            innovacion = np.where(arranque, 0.0, innovacion)
+            self._estimado = np.where(arranque & reinicio, z, self._estimado)
+        ganancia = p / (p + self.ruido_medicion)
+        estimado = self._estimado + ganancia * innovacion
+        p = (1.0 - ganancia) * p
+        if validas is None:
+            self._estimado, self._varianza = estimado, p
+        else:
+            self._estimado = np.where(validas, estimado, self._estimado)
+            self._varianza = np.where(validas, p, self._varianza)
+        return self._estimado
+
+    def _seguir_cero(self, y, validos, instantes):
+        hay = validos.any(axis=1)
+        neto = np.abs(y - self.cero[:, None])
+        # Vacía y quieta: todas las lecturas del bloque cerca del cero
+        vacia = hay & np.all(~validos | (neto <= self.banda_cero), axis=1)
+        if not vacia.any():
+            return
+        if self._cero_inicial is None:
+            self._cero_inicial = self.cero.copy()
+
+        # Las filas sin lecturas en el bloque quedan en NaN y `vacia` las descarta
+        ultimos = np.where(hay, np.max(np.where(validos, instantes, -np.inf), axis=1), np.nan)
+        with np.errstate(invalid='ignore'):
+            media = np.where(validos, y, 0.0).sum(axis=1) / validos.sum(axis=1)
+        dt = np.where(np.isnan(self._instante_cero), 1.0, ultimos - self._instante_cero)
+        paso = self.ritmo_cero * np.clip(dt, 0.0, 1.0)  # Hasta ritmo_cero kg por segundo
+        correccion = np.clip(media - self.cero, -paso, paso)
+        cero = np.clip(self.cero + correccion, self._cero_inicial - self.cero_max,
+                       self._cero_inicial + self.cero_max)
+
+        self.cero = np.where(vacia, cero, self.cero)
+        self.correcciones_cero += vacia & (correccion != 0)
+        self._registrar_deriva(vacia, ultimos)
+        self._instante_cero = np.where(vacia, ultimos, self._instante_cero)
+
+    def _registrar_deriva(self, filas, instantes):
+        t = np.where(filas, instantes - self._t0, 0.0) / 3600.0  # Horas
+        previo = np.where(np.isnan(self._instante_cero), instantes, self._instante_cero)
+        olvido = np.exp(-np.clip(instantes - previo, 0.0, None) / self.olvido_deriva_s)
+        w, st, sc, stt, stc = self._sumas
+        c = self.cero
+        nuevas = np.stack([w * olvido + 1, st * olvido + t, sc * olvido + c,
+                           stt * olvido + t * t, stc * olvido + t * c])
+        self._sumas = np.where(filas, nuevas, self._sumas)
+
+    # -------------------- Estado --------------------
+
+    @property
+    def deriva_kg_h(self) -> np.ndarray:
+        """Pendiente del cero en kg/hora por balanza (NaN hasta tener con qué estimarla)"""
+        w, st, sc, stt, stc = self._sumas
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denominador = w * stt - st * st
+            pendiente = (w * stc - st * sc) / denominador
+        # Menos de un minuto de historia del cero: sin estimación
+        return np.where(denominador > (w * w) * (60.0 / 3600.0) ** 2, pendiente, np.nan)
+
+    def cero_estimado(self, instantes) -> np.ndarray:
+        """Cero por balanza en cada instante: el último medido más la deriva desde entonces"""
+        instantes = np.asarray(instantes, dtype=np.float64)
+        if instantes.ndim == 1:
+            instantes = instantes[None, :]
+        deriva = np.nan_to_num(self.deriva_kg_h)
+        transcurrido = np.clip(instantes - np.nan_to_num(self._instante_cero, nan=np.inf)[:, None],
+                               0.0, self.horizonte_deriva_s)
+        return self.cero[:, None] + deriva[:, None] * transcurrido / 3600.0
+
+    def estadisticas(self) -> dict:
+        return {
+            'cero_kg': np.round(self.cero, 4).tolist(),
+            'deriva_kg_h': np.round(self.deriva_kg_h, 5).tolist(),
+            'saltos': self.saltos.tolist(),
+            'correcciones_cero': self.correcciones_cero.tolist(),
+        }
+
+
+class FiltroEstaciones:
+    """FiltroBalanzas para las tramas del bridge: arma el bloque (N, m) de un lote mezclado"""
+
+    def __init__(self, estaciones, **opciones):
+        self.estaciones = list(estaciones)
+        self._indices = {e: i for i, e in enumerate(self.estaciones)}
+        self.filtro = FiltroBalanzas(len(self.estaciones), **opciones)
+
+    def aplicar(self, lecturas: list):
+        """lecturas = [(instante, estacion, datos)]; corrige peso y diferencia de cada `datos`"""
+        filas = [[] for _ in self.estaciones]
+        for posicion, (_, estacion, _) in enumerate(lecturas):
+            filas[self._indices[estacion]].append(posicion)
+        m = max(len(f) for f in filas)
+        valores = np.full((len(filas), m), np.nan)
+        instantes = np.full((len(filas), m), np.nan)
+        for i, posiciones in enumerate(filas):
+            for j, posicion in enumerate(posiciones):
+                instante, _, datos = lecturas[posicion]
+                valores[i, j] = datos['peso']
+                instantes[i, j] = instante
+
+        filtrado = self.filtro.procesar(valores, instantes)
+        for i, posiciones in enumerate(filas):
+            for j, posicion in enumerate(posiciones):
+                datos = lecturas[posicion][2]
+                peso = round(float(filtrado[i, j]), 3)
+                datos['peso_crudo'] = datos['peso']
+                datos['peso'] = peso
+                datos['diferencia'] = round(peso - datos['objetivo'], 3)
+
+    def estadisticas(self) -> dict:
+        e = self.filtro.estadisticas()
+        return {estacion: {clave: valores[i] for clave, valores in e.items()}
+                for i, estacion in enumerate(self.estaciones)}
@@ -0,0 +1,401 @@
+"""
+Importación del backup CSV de las estaciones a la tabla sacos
+
+Sube a `sacos` los registros que las estaciones guardaron solo en CSV
+(`registros/` y los `registro_inventario.csv` antiguos, también .gz).
+Entiende los dos formatos:
+
+- 10 columnas (arduino_supabase_integration.py), con "Código Saco".
+- 8 columnas (ejecutable ard.py), sin código: se arma uno estable a
+  partir del lote y la hora (`CSV-ATUN-5-20251120T143005`).
+
+Los archivos se leen en streaming. Los de `registros/` son UTF-8; el
+`registro_inventario.csv` antiguo quedó en la codificación de Windows
+(cp1252), que se usa si el archivo no es UTF-8 válido (`--codificacion`
+la fija a mano). Antes de subir se descartan los sacos que ya están en la
+base con el mismo `codigo` y una `fecha_pesaje` a menos de 5 s (la base
+guardaba la hora del servidor y el CSV la de después del insert; se
+consulta un día a la vez). Las filas salen en lotes grandes
+por varios hilos en paralelo, con una `clave_idempotencia` derivada del
+código y la hora: reenviar un lote no duplica nada.
+
+El avance por archivo queda en `registros/_importado.json`; si la
+importación se corta, la siguiente corrida sigue desde ahí.
+
+Uso:
+    python importar_csv.py                                  # registros/
+    python importar_csv.py viejo/registro_inventario.csv --fabrica "Planta Norte"
+    python importar_csv.py --hilos 8 --lote 2000
+"""
+
+import argparse
+import codecs
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from registro_local import segmentos, DIRECTORIO_REGISTROS, PREFIJO_REGISTRO
+
+# ==================== CONFIGURACIÓN ====================
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY') or os.getenv('SUPABASE_ANON_KEY')
+
+TAMANO_LOTE = 1000      # Filas por upsert
+CODIFICACION_ANTIGUA = 'cp1252'  # registro_inventario.csv escrito con open() sin encoding en Windows
+HILOS = 4               # Upserts en paralelo
+REINTENTOS = 3
+ARCHIVO_AVANCE = os.path.join(DIRECTORIO_REGISTROS, '_importado.json')
+GUARDAR_AVANCE_CADA = 2.0  # Segundos entre escrituras de la marca
+# fecha_pesaje en la base era NOW() del servidor al insertar; la Fecha del CSV se
+# tomaba después de que volviera el insert, así que difieren en uno o más segundos
+TOLERANCIA_DUPLICADO = 5
+
+# Nombre del producto en el CSV → lote en sacos (mismos códigos que PRODUCTOS en las estaciones)
+LOTES = {
+    'Saco de 5 latas de Atún': 'ATUN-5',
+    'Saco de 3 latas de Palmitos': 'PALM-3',
+}
+ESTADOS = {'ACEPTADO': 'OK', 'RECHAZADO': 'FUERA_RANGO'}
+
+# Espacio de nombres para las claves de idempotencia (uuid5 de código + hora)
+_ESPACIO_CLAVES = uuid.UUID('5b7f1d2e-8c0a-4e55-9a61-3d2c6f0b9e47')
+
+# ========================================================
+
+
+def detectar_codificacion(ruta: str) -> str:
+    """utf-8-sig si todo el archivo es UTF-8 válido; si no, la codificación de las estaciones Windows"""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    with (gzip.open(ruta, 'rb') if ruta.endswith('.gz') else open(ruta, 'rb')) as f:
+        try:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                decodificador.decode(bloque)
+            decodificador.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return CODIFICACION_ANTIGUA
+    return 'utf-8-sig'  # Los CSV que pasaron por Excel traen BOM
+
+
+def _abrir(ruta: str, codificacion: str = None):
+    codificacion = codificacion or detectar_codificacion(ruta)
+    if ruta.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(ruta, 'rb'), encoding=codificacion, newline='')
+    return open(ruta, encoding=codificacion, newline='')
+
+
+def archivos_a_importar(rutas: list) -> list:
+    """[(clave, ruta)]: los segmentos de cada carpeta en orden, más los archivos sueltos"""
+    encontrados = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            encontrados += [(os.path.basename(r).removesuffix('.gz'), r) for _, _, r in segmentos(ruta)]
+            antiguo = os.path.join(ruta, f'{PREFIJO_REGISTRO}.csv')
+            if os.path.exists(antiguo):
+                encontrados.append((os.path.abspath(antiguo), antiguo))
+        else:
+            # Un segmento cambia de .csv a .csv.gz al cerrarse: la clave no debe cambiar
+            clave = os.path.basename(ruta).removesuffix('.gz')
+            if not clave.startswith(f'{PREFIJO_REGISTRO}_'):
+                clave = os.path.abspath(ruta).removesuffix('.gz')
+            encontrados.append((clave, ruta))
+    return encontrados
+
+
+def _numero(texto: str) -> float:
+    return float(texto.strip().strip('±%').replace(',', '.'))
+
+
+def fila_a_saco(fila: dict, fabrica_id: int = None):
+    """(fila de sacos, código, epoch) desde una fila de cualquiera de los dos formatos; None si no sirve"""
+    try:
+        fecha = datetime.strptime(fila['Fecha'].strip(), '%Y-%m-%d %H:%M:%S').astimezone()
+        objetivo = _numero(fila['Peso Objetivo (kg)'])
+        real = _numero(fila['Peso Actual (kg)'])
+    except (KeyError, ValueError, AttributeError):
+        return None
+
+    producto = (fila.get('Saco Identificado') or '').strip()
+    lote = LOTES.get(producto, producto or None)
+    codigo = (fila.get('Código Saco') or '').strip()
+    if not codigo:  # Formato de 8 columnas
+        codigo = f"CSV-{lote or 'SACO'}-{fecha:%Y%m%dT%H%M%S}"
+
+    diferencia = real - objetivo
+    estado = ESTADOS.get((fila.get('Resultado') or '').strip())
+    if estado is None:
+        try:
+            tolerancia = _numero(fila['Tolerancia']) / 100
+        except (KeyError, ValueError, AttributeError):
+            tolerancia = 0.03
+        estado = 'OK' if objetivo > 0 and abs(diferencia) / objetivo <= tolerancia else 'FUERA_RANGO'
+
+    segundo = int(fecha.timestamp())
+    return {
+        'codigo': codigo,
+        'fabrica_id': fabrica_id,
+        'peso_objetivo': round(objetivo, 3),
+        'peso_real': round(real, 3),
+        'diferencia': round(diferencia, 3),
+        'estado': estado,
+        'lote': lote,
+        'fecha_pesaje': fecha.isoformat(),
+        'clave_idempotencia': str(uuid.uuid5(_ESPACIO_CLAVES, f'{codigo}|{segundo}')),
+    }, codigo, fecha.timestamp()
+
+
+class Existentes:
+    """Horas (epoch) de cada código que ya está en la base, cargadas un día a la vez"""
+
+    def __init__(self, supabase, tamano_pagina=1000, tolerancia=TOLERANCIA_DUPLICADO):
+        self.supabase = supabase
+        self.tamano_pagina = tamano_pagina
+        self.tolerancia = tolerancia
+        self._dias = set()
+        self._horas = {}  # codigo -> [epoch] ordenado
+
+    def contiene(self, codigo: str, instante: float) -> bool:
+        """¿Hay un saco con este código a menos de `tolerancia` s?"""
+        for borde in (instante - self.tolerancia, instante + self.tolerancia):
+            dia = datetime.fromtimestamp(borde).date()  # Cerca de medianoche se miran los dos días
+            if dia not in self._dias:
+                self._cargar(dia)
+        horas = self._horas.get(codigo)
+        if not horas:
+            return False
+        i = bisect_left(horas, instante - self.tolerancia)
+        return i < len(horas) and horas[i] <= instante + self.tolerancia
+
+    def agregar(self, codigo: str, instante: float):
+        insort(self._horas.setdefault(codigo, []), instante)
+
+    def _cargar(self, dia):
+        inicio = datetime.combine(dia, datetime.min.time()).astimezone()
+        fin = inicio + timedelta(days=1)
+        ultimo_id = 0
+        while True:
+            filas = (self.supabase.table('sacos').select('id, codigo, fecha_pesaje')
+                     .gte('fecha_pesaje', inicio.isoformat()).lt('fecha_pesaje', fin.isoformat())
+                     .gt('id', ultimo_id).order('id').limit(self.tamano_pagina)
+                     .execute().data)
+            for f in filas:
+                self.agregar(f['codigo'], datetime.fromisoformat(f['fecha_pesaje']).timestamp())
+            if len(filas) < self.tamano_pagina:
+                break
+            ultimo_id = filas[-1]['id']
+        self._dias.add(dia)
+
+
+class Avance:
+    """Filas ya confirmadas de cada archivo; solo avanza sobre lotes consecutivos terminados"""
+
+    def __init__(self, ruta=ARCHIVO_AVANCE):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._pendientes = {}  # clave -> deque([fila_fin, terminado])
+        self._guardado = 0.0
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                self.filas = json.load(f).get('archivos', {})
+        except FileNotFoundError:
+            self.filas = {}
+
+    def registrar(self, clave: str, fin: int) -> list:
+        """Anota un lote que termina en la fila `fin`; devuelve la entrada para `terminar()`"""
+        entrada = [fin, False]
+        with self._lock:
+            self._pendientes.setdefault(clave, deque()).append(entrada)
+        return entrada
+
+    def terminar(self, clave: str, entrada: list):
+        with self._lock:
+            entrada[1] = True
+            pendientes = self._pendientes[clave]
+            while pendientes and pendientes[0][1]:
+                self.filas[clave] = pendientes.popleft()[0]
+        if time.monotonic() - self._guardado > GUARDAR_AVANCE_CADA:
+            self.guardar()
+
+    def guardar(self):
+        with self._lock:
+            datos = {'archivos': dict(self.filas), 'actualizado': datetime.now().astimezone().isoformat()}
+            self._guardado = time.monotonic()
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(self.ruta + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(datos, f, indent=2)
+            os.replace(self.ruta + '.tmp', self.ruta)
+
+
+class Importador:
+    """Lee los CSV en streaming y sube los sacos nuevos con varios hilos"""
+
+    def __init__(self, crear_cliente, fabrica_id=None, tamano_lote=TAMANO_LOTE, hilos=HILOS,
+                 avance: Avance = None, reintentos=REINTENTOS, codificacion=None):
+        self.crear_cliente = crear_cliente
+        self.fabrica_id = fabrica_id
+        self.codificacion = codificacion  # None: se detecta por archivo
+        self.tamano_lote = tamano_lote
+        self.hilos = hilos
+        self.avance = avance or Avance()
+        self.reintentos = reintentos
+
+        self._local = threading.local()  # Un cliente HTTP por hilo
+        self._cupos = threading.BoundedSemaphore(hilos * 2)  # Lotes en memoria como máximo
+        self._lock = threading.Lock()
+        self._reportado = time.monotonic()
+
+        self.leidas = 0
+        self.invalidas = 0
+        self.duplicadas = 0
+        self.subidas = 0
+        self.fallidas = 0
+
+    def _cliente(self):
+        if not hasattr(self._local, 'cliente'):
+            self._local.cliente = self.crear_cliente()
+        return self._local.cliente
+
+    def _subir(self, clave: str, entrada: list, filas: list):
+        try:
+            espera = 0.5
+            for intento in range(self.reintentos + 1):
+                try:
+                    (self._cliente().table('sacos')
+                     .upsert(filas, on_conflict='clave_idempotencia', ignore_duplicates=True)
+                     .execute())
+                    break
+                except Exception as e:
+                    if intento == self.reintentos:
+                        with self._lock:
+                            self.fallidas += len(filas)
+                        print(f"❌ Lote de {len(filas)} filas de {clave} no se pudo subir: {e}")
+                        return  # La marca de este archivo no pasa de aquí
+                    time.sleep(espera)
+                    espera = min(espera * 2, 10.0)
+            with self._lock:
+                self.subidas += len(filas)
+            self.avance.terminar(clave, entrada)
+        finally:
+            self._cupos.release()
+
+    def importar(self, archivos: list) -> dict:
+        existentes = Existentes(self.crear_cliente())
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(self.hilos, thread_name_prefix='importar') as ejecutor:
+            def despachar(clave, fin, lote):
+                self._cupos.acquire()  # Contrapresión: la lectura espera a los hilos
+                entrada = self.avance.registrar(clave, fin)
+                if lote:
+                    ejecutor.submit(self._subir, clave, entrada, lote)
+                else:  # Solo duplicados/inválidas: igual cuenta como avance
+                    self._cupos.release()
+                    self.avance.terminar(clave, entrada)
+
+            for clave, ruta in archivos:
+                hecho = self.avance.filas.get(clave, 0)
+                numero = 0
+                lote = []
+                with _abrir(ruta, self.codificacion) as f:
+                    for numero, fila in enumerate(csv.DictReader(f), start=1):
+                        if numero <= hecho:
+                            continue
+                        self.leidas += 1
+                        resultado = fila_a_saco(fila, self.fabrica_id)
+                        if resultado is None:
+                            self.invalidas += 1
+                        else:
+                            saco, codigo, instante = resultado
+                            if existentes.contiene(codigo, instante):
+                                self.duplicadas += 1
+                            else:
+                                existentes.agregar(codigo, instante)  # También repetidos entre archivos
+                                lote.append(saco)
+                        if len(lote) >= self.tamano_lote:
+                            despachar(clave, numero, lote)
+                            lote = []
+                if numero > hecho:
+                    despachar(clave, numero, lote)
+                if time.monotonic() - self._reportado > 5:
+                    self._reportar(inicio)
+        self.avance.guardar()
+        return self.estadisticas(time.monotonic() - inicio)
+
+    def estadisticas(self, duracion: float) -> dict:
+        return {
+            'leidas': self.leidas,
+            'subidas': self.subidas,
+            'duplicadas': self.duplicadas,
+            'invalidas': self.invalidas,
+            'fallidas': self.fallidas,
+            'segundos': round(duracion, 1),
+        }
+
+    def _reportar(self, inicio: float):
+        self._reportado = time.monotonic()
+        duracion = time.monotonic() - inicio
+        print(f"📦 Leídas: {self.leidas} | Subidas: {self.subidas} | Ya existían: {self.duplicadas} | "
+              f"{self.leidas / duracion if duracion else 0:.0f} filas/s")
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description="Importa el backup CSV de las estaciones a la tabla sacos")
+    args.add_argument("rutas", nargs="*", default=[DIRECTORIO_REGISTROS],
+                      help="Carpetas de registros o archivos CSV (.csv / .csv.gz)")
+    args.add_argument("--fabrica", help="Fábrica de las filas importadas (el CSV no la guarda)")
+    args.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por upsert")
+    args.add_argument("--hilos", type=int, default=HILOS, help="Upserts en paralelo")
+    args.add_argument("--avance", default=ARCHIVO_AVANCE, help="Archivo con el avance por archivo")
+    args.add_argument("--desde-cero", action="store_true", help="Ignorar el avance guardado")
+    args.add_argument("--codificacion", help="Codificación de los CSV (por defecto: UTF-8, o cp1252 si no lo es)")
+    args = args.parse_args(argv)
+
+    from supabase import create_client
+
+    def crear_cliente():
+        return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    fabrica_id = None
+    if args.fabrica:
+        from cache_fabricas import CacheFabricas
+        fabrica_id = CacheFabricas(crear_cliente()).resolver(args.fabrica)
+
+    archivos = archivos_a_importar(args.rutas)
+    if not archivos:
+        print(f"⚠️ No hay archivos CSV en {', '.join(args.rutas)}")
+        return
+
+    avance = Avance(args.avance)
+    if args.desde_cero:
+        avance.filas = {}
+    print(f"📥 Importando {len(archivos)} archivos con {args.hilos} hilos (lotes de {args.lote})...")
+    importador = Importador(crear_cliente, fabrica_id, args.lote, args.hilos, avance, codificacion=args.codificacion)
+    try:
+        resumen = importador.importar(archivos)
+    except KeyboardInterrupt:
+        avance.guardar()
+        print("\n⏸️ Importación interrumpida; la próxima corrida continúa desde el avance guardado")
+        return
+
+    print(f"✅ {resumen['subidas']} sacos importados en {resumen['segundos']} s "
+          f"({resumen['duplicadas']} ya existían, {resumen['invalidas']} filas inválidas)")
+    if resumen['fallidas']:
+        print(f"⚠️ {resumen['fallidas']} filas no se pudieron subir; vuelve a ejecutar para reintentarlas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Lector serial por eventos - Lecturas bloqueantes en un hilo, entrega por cola
+
+Reemplaza los bucles `if arduino.in_waiting:` (que ocupan un núcleo
+completo) y las pausas fijas `time.sleep(0.1)` (que agregan hasta 100 ms
+de latencia). `read()` queda bloqueado en el sistema operativo hasta que
+llega al menos un byte y luego toma todo lo que ya está en el buffer, así
+que el hilo no consume CPU mientras la balanza está en silencio, entrega
+cada trama apenas se completa y no lee byte a byte como `readline()`.
+
+Por defecto las tramas se cortan en '\n'; con `separar` (ej.
+`ParserBinario.separar`) se usa otro encuadre, como las tramas binarias
+de tamaño fijo.
+"""
+
+import queue
+import threading
+import time
+
+import serial
+
+
+class SeparadorLineas:
+    """`separar` por defecto: corta el buffer en '\\n' y descarta las líneas más largas que max_linea.
+
+    Una línea sin fin que supera max_linea es basura (baudios mal
+    configurados, ruido en el cable): se tira lo acumulado y se siguen
+    tirando bytes hasta el próximo '\\n', para no entregar su cola como si
+    fuera una trama. Las líneas completas que llegan en una sola lectura
+    pero superan el límite también se descartan.
+    """
+
+    def __init__(self, max_linea=4096):
+        self.max_linea = max_linea
+        self.descartando = False
+        self.bytes_descartados = 0
+
+    def __call__(self, buffer: bytes):
+        """Devuelve (líneas, resto) como ParserBinario.separar"""
+        if self.descartando:
+            fin = buffer.find(b'\n')
+            if fin < 0:
+                self.bytes_descartados += len(buffer)
+                return [], b''
+            self.bytes_descartados += fin + 1
+            self.descartando = False
+            buffer = buffer[fin + 1:]
+        if b'\n' not in buffer:
+            if len(buffer) > self.max_linea:
+                self.bytes_descartados += len(buffer)
+                self.descartando = True
+                return [], b''
+            return [], buffer
+        *lineas, resto = buffer.split(b'\n')
+        largo = self.max_linea
+        if any(len(linea) > largo for linea in lineas):
+            self.bytes_descartados += sum(len(linea) + 1 for linea in lineas if len(linea) > largo)
+            lineas = [linea for linea in lineas if len(linea) <= largo]
+        if len(resto) > largo:
+            self.bytes_descartados += len(resto)
+            self.descartando = True
+            resto = b''
+        return lineas, resto
+
+
+class LectorSerial:
+    """Hilo que lee líneas del puerto y las publica en una cola como (instante, trama)"""
+
+    def __init__(self, ser: serial.Serial, cola: queue.Queue = None, parsear=None, capacidad=1000,
+                 metricas=None, separar=None):
+        # parsear(linea: bytes) -> trama | None; sin parser se publican los bytes crudos
+        # separar(buffer: bytes) -> (tramas, resto); sin separar se corta por líneas (SeparadorLineas)
+        self.ser = ser
+        self.cola = cola if cola is not None else queue.Queue(maxsize=capacidad)
+        self.parsear = parsear
+        self.separar = separar or SeparadorLineas()
+
+        # Por bloque leído: tiempo hasta publicar sus tramas y tiempo de parseo por trama
+        self._h_lectura = self._h_parseo = None
+        if metricas:
+            self._h_lectura = metricas.histograma('lectura_serial', 'Bloque leído → tramas en la cola')
+            self._h_parseo = metricas.histograma('parseo', 'Parseo de una trama')
+
+        self._detener = threading.Event()
+        self._hilo = None
+
+        self.lineas = 0
+        self.descartadas = 0
+        self.error = None
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return self
+        self._detener.clear()
+        self.error = None
+        nombre = f"lector-{getattr(self.ser, 'port', 'serial')}"
+        self._hilo = threading.Thread(target=self._leer, name=nombre, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self, timeout=2.0):
+        """Detiene el hilo; no cierra el puerto"""
+        self._detener.set()
+        try:
+            self.ser.cancel_read()  # Desbloquea readline() en pyserial 3.5
+        except Exception:
+            pass
+        if self._hilo and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout)
+
+    @property
+    def vivo(self) -> bool:
+        return bool(self._hilo and self._hilo.is_alive())
+
+    def _publicar(self, item):
+        try:
+            self.cola.put_nowait((time.monotonic(), item))
+        except queue.Full:
+            # Nunca bloquear la lectura: si el consumidor no da abasto se pierde la trama
+            self.descartadas += 1
+
+    def _leer(self):
+        pendiente = b''
+        while not self._detener.is_set():
+            try:
+                datos = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError) as e:
+                # TypeError: pyserial lo lanza si el puerto se cierra durante la lectura
+                if not self._detener.is_set():
+                    self.error = e
+                break
+
+            if not datos:
+                continue  # timeout del puerto, solo para revisar _detener
+
+            lineas, pendiente = self.separar(pendiente + datos)
+            if not lineas:
+                continue
+            if self._h_lectura and self.parsear:
+                self._publicar_medido(lineas)
+                continue
+            for linea in lineas:
+                self.lineas += 1
+                item = self.parsear(linea) if self.parsear else linea
+                if item is not None:
+                    self._publicar(item)
+
+    def _publicar_medido(self, lineas: list):
+        """Igual que el bucle de _leer, midiendo el parseo de cada trama y el bloque completo"""
+        reloj = time.perf_counter
+        inicio = reloj()
+        for linea in lineas:
+            self.lineas += 1
+            t = reloj()
+            item = self.parsear(linea)
+            self._h_parseo.observar(reloj() - t)
+            if item is not None:
+                self._publicar(item)
+        self._h_lectura.observar(reloj() - inicio)
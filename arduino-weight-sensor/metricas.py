@@ -0,0 +1,205 @@
+"""
+Métricas del pipeline serial → Supabase (indicadores e histogramas de latencia)
+
+Cada etapa (lectura serial, parseo, espera en cola, insert HTTP, escritura
+CSV) registra su duración en un histograma de cubetas fijas: registrar una
+medición es un `bisect` y dos sumas bajo un lock, sin listas que crezcan.
+Los percentiles p50/p95/p99 se estiman a partir de las cubetas. Los
+totales (filas subidas, descartadas, errores...) ya los lleva cada módulo
+como atributo: se registran como indicadores y se leen al exponer.
+
+Se exponen de dos formas:
+- `servir(puerto)`: endpoint local con formato de texto de Prometheus
+  (`/metrics`) y JSON (`/metrics.json`).
+- `volcar_periodicamente(ruta, intervalo)`: un JSON reescrito cada tanto.
+
+Los módulos reciben un objeto `Metricas` opcional; sin él no miden nada.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 10 µs … ~42 s, duplicando (23 cubetas + infinito)
+CUBETAS_SEGUNDOS = tuple(1e-5 * 2 ** i for i in range(23))
+
+
+class Histograma:
+    """Histograma de cubetas fijas (acumulativo al exponerlo, como Prometheus)"""
+
+    __slots__ = ('nombre', 'ayuda', 'limites', 'cuentas', 'suma', 'cuenta', '_lock')
+
+    def __init__(self, nombre: str, ayuda: str = '', limites=CUBETAS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.cuenta = 0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float):
+        i = bisect_left(self.limites, valor)
+        with self._lock:
+            self.cuentas[i] += 1
+            self.suma += valor
+            self.cuenta += 1
+
+    def observar_varios(self, valores):
+        """Varias mediciones con un solo lock (p. ej. la latencia de cada fila de un lote)"""
+        indices = [bisect_left(self.limites, v) for v in valores]
+        with self._lock:
+            for i in indices:
+                self.cuentas[i] += 1
+            self.suma += sum(valores)
+            self.cuenta += len(indices)
+
+    def percentil(self, p: float) -> float:
+        """Estimación del percentil p (0-100) interpolando dentro de la cubeta"""
+        with self._lock:
+            cuentas = list(self.cuentas)
+            total = self.cuenta
+        if not total:
+            return float('nan')
+        objetivo = p / 100 * total
+        acumulado = 0
+        for i, n in enumerate(cuentas):
+            if n and acumulado + n >= objetivo:
+                inferior = self.limites[i - 1] if i > 0 else 0.0
+                superior = self.limites[i] if i < len(self.limites) else self.limites[-1]
+                return inferior + (superior - inferior) * (objetivo - acumulado) / n
+            acumulado += n
+        return self.limites[-1]
+
+
+def _json(valor: float):
+    """NaN/inf no existen en JSON estricto: un indicador sin valor sale como null"""
+    return valor if math.isfinite(valor) else None
+
+
+class Metricas:
+    """Registro de histogramas e indicadores (valores leídos al exponer)"""
+
+    def __init__(self, prefijo='bridge'):
+        self.prefijo = prefijo
+        self._histogramas = {}
+        self._indicadores = {}
+        self._lock = threading.Lock()
+        self._inicio = time.monotonic()
+        self._servidor = None
+        self._detener = threading.Event()
+
+    def histograma(self, nombre: str, ayuda: str = '') -> Histograma:
+        with self._lock:
+            if nombre not in self._histogramas:
+                self._histogramas[nombre] = Histograma(nombre, ayuda)
+            return self._histogramas[nombre]
+
+    def indicador(self, nombre: str, leer, ayuda: str = ''):
+        """Valor calculado al momento de exponer (profundidad de una cola, filas en el spool...)"""
+        with self._lock:
+            self._indicadores[nombre] = (leer, ayuda)
+
+    def _leer_indicadores(self) -> dict:
+        valores = {}
+        for nombre, (leer, _) in list(self._indicadores.items()):
+            try:
+                valores[nombre] = float(leer())
+            except Exception:
+                valores[nombre] = float('nan')
+        return valores
+
+    # -------------------- Exposición --------------------
+
+    def resumen(self) -> dict:
+        """Indicadores y percentiles (en ms) como dict serializable (sin NaN: null)"""
+        return {
+            'segundos_activo': round(time.monotonic() - self._inicio, 1),
+            'indicadores': {nombre: _json(valor) for nombre, valor in self._leer_indicadores().items()},
+            'latencias_ms': {
+                h.nombre: {
+                    'cuenta': h.cuenta,
+                    'p50': _json(round(h.percentil(50) * 1000, 3)),
+                    'p95': _json(round(h.percentil(95) * 1000, 3)),
+                    'p99': _json(round(h.percentil(99) * 1000, 3)),
+                    'media': round(h.suma / h.cuenta * 1000, 3) if h.cuenta else None,
+                }
+                for h in list(self._histogramas.values())
+            },
+        }
+
+    def exposicion(self) -> str:
+        """Formato de texto de Prometheus"""
+        lineas = []
+        p = self.prefijo
+        ayudas = {nombre: ayuda for nombre, (_, ayuda) in list(self._indicadores.items())}
+        for nombre, valor in self._leer_indicadores().items():
+            lineas += [f"# HELP {p}_{nombre} {ayudas[nombre] or nombre}",
+                       f"# TYPE {p}_{nombre} gauge",
+                       f"{p}_{nombre} {valor}"]
+        for h in list(self._histogramas.values()):
+            with h._lock:
+                cuentas = list(h.cuentas)
+                suma, cuenta = h.suma, h.cuenta
+            nombre = f"{p}_{h.nombre}_segundos"
+            lineas += [f"# HELP {nombre} {h.ayuda or h.nombre}", f"# TYPE {nombre} histogram"]
+            acumulado = 0
+            for limite, n in zip(h.limites, cuentas):
+                acumulado += n
+                lineas.append(f'{nombre}_bucket{{le="{limite:.6g}"}} {acumulado}')
+            lineas += [f'{nombre}_bucket{{le="+Inf"}} {cuenta}',
+                       f"{nombre}_sum {suma}", f"{nombre}_count {cuenta}"]
+        return "\n".join(lineas) + "\n"
+
+    def servir(self, puerto: int, host='127.0.0.1'):
+        """Endpoint HTTP local: /metrics (Prometheus) y /metrics.json"""
+        metricas = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    cuerpo = json.dumps(metricas.resumen(), indent=2, allow_nan=False).encode()
+                    tipo = 'application/json'
+                elif self.path.startswith('/metrics'):
+                    cuerpo = metricas.exposicion().encode()
+                    tipo = 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self._servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, name='metricas-http', daemon=True).start()
+        return self._servidor.server_address[1]
+
+    def volcar(self, ruta: str):
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.resumen(), f, indent=2, allow_nan=False)
+        os.replace(ruta + '.tmp', ruta)
+
+    def volcar_periodicamente(self, ruta: str, intervalo=10.0):
+        def bucle():
+            while not self._detener.wait(intervalo):
+                try:
+                    self.volcar(ruta)
+                except OSError as e:
+                    print(f"⚠️ No se pudieron volcar las métricas en {ruta}: {e}")
+        threading.Thread(target=bucle, name='metricas-json', daemon=True).start()
+
+    def detener(self):
+        self._detener.set()
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
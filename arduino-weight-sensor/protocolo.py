@@ -0,0 +1,237 @@
+"""
+Protocolo serial Arduino → Python - Parser único de tramas
+
+Formatos que envían los sketches:
+  OBJ:1.200;ACT:1.195;DIF:-0.005      (sketch_pesa_intnuev.ino)
+  {"peso":1.195,"objetivo":1.2,...}   (arduino_code.ino)
+  HEARTBEAT                           (latido cada 2 s)
+  cualquier otra línea                (mensajes de estado: "Tara realizada", ...)
+
+Se parsea directamente sobre los bytes que entrega `readline()`: se
+despacha por el primer byte y las tramas OBJ se separan con una expresión
+regular precompilada, sin decode/strip/split por trama. `float()` y
+`json.loads()` aceptan bytes (y `float()` ignora el `\r\n` final), así
+que solo los mensajes de estado se decodifican a texto.
+
+Modo binario (`MODO_BINARIO 1` en sketch_pesa_intnuev.ino, 115200 baud):
+el sketch manda una trama de 27 bytes por cada muestra del HX711, sin
+promediar 10 lecturas ni esperar 500 ms entre envíos:
+
+  A5 5A | tipo u8 | seq u16 | ms u32 | crudo i32 | promedio i32 | peso f32 | objetivo f32 | crc u16
+
+little-endian; el CRC es CRC-16/CCITT (polinomio 0x1021, inicial 0xFFFF,
+`binascii.crc_hqx`) de los 25 bytes anteriores. `crudo` es una lectura
+del HX711 en cuentas y `promedio` la media móvil de las últimas 10, así
+que el filtrado se puede hacer en el PC. La trama de calibración (tipo 2)
+reemplaza al HEARTBEAT y trae el offset y la escala del sketch.
+
+`ParserBinario.separar()` corta las tramas sobre el buffer leído sin
+copiarlo (memoryview) y `parsear()` las desempaqueta con `struct`.
+"""
+
+import json
+import re
+import struct
+from binascii import crc_hqx
+from typing import NamedTuple
+
+TRAMA_PESO = 'PESO'
+TRAMA_JSON = 'JSON'
+TRAMA_HEARTBEAT = 'HEARTBEAT'
+TRAMA_ESTADO = 'ESTADO'
+TRAMA_MUESTRA = 'MUESTRA'
+
+CAMPOS_JSON = ('peso', 'objetivo', 'diferencia')
+
+_RE_PESO = re.compile(rb'OBJ:([^;]*);ACT:([^;]*);DIF:(.*)')
+_HEARTBEAT = b'HEARTBEAT'
+
+# Modo binario
+BAUD_BINARIO = 115200
+SINCRONIA = b'\xa5\x5a'
+FORMATO_BINARIO = struct.Struct('<2sBHIiiffH')
+TAMANO_BINARIO = FORMATO_BINARIO.size  # 27
+TIPO_MUESTRA = 1
+TIPO_CALIBRACION = 2
+_CUERPO = struct.Struct('<HIiiff')  # Los campos de Muestra, desde el byte 3
+_CRC = struct.Struct('<H')
+_FIN_CRC = TAMANO_BINARIO - 2
+
+
+class Muestra(NamedTuple):
+    """Una muestra del HX711 en modo binario"""
+    seq: int
+    ms: int          # millis() del Arduino
+    crudo: int       # Una lectura, en cuentas del HX711
+    promedio: int    # Media móvil de las últimas 10 lecturas, en cuentas
+    peso: float      # kg, calculado por el sketch a partir de `promedio`
+    objetivo: float
+
+    @property
+    def diferencia(self) -> float:
+        return self.peso - self.objetivo
+
+
+def es_latido(linea) -> bool:
+    """True para `HEARTBEAT` y para la trama binaria de calibración (acepta bytes o memoryview)"""
+    if len(linea) == TAMANO_BINARIO and linea[:2] == SINCRONIA:
+        return linea[2] == TIPO_CALIBRACION
+    return linea[:9] == _HEARTBEAT
+
+
+def empaquetar_binaria(tipo: int, seq: int, ms: int, crudo: int, promedio: int, peso: float,
+                       objetivo: float) -> bytes:
+    """Arma una trama binaria con su CRC, igual que enviarTrama() del sketch"""
+    cuerpo = FORMATO_BINARIO.pack(SINCRONIA, tipo, seq & 0xFFFF, ms & 0xFFFFFFFF, crudo, promedio,
+                                  peso, objetivo, 0)[:-2]
+    return cuerpo + crc_hqx(cuerpo, 0xFFFF).to_bytes(2, 'little')
+
+
+class ParserTramas:
+    """Convierte líneas crudas en (tipo, datos) y lleva contadores por tipo"""
+
+    def __init__(self):
+        self.contadores = {
+            TRAMA_PESO: 0,
+            TRAMA_JSON: 0,
+            TRAMA_HEARTBEAT: 0,
+            TRAMA_ESTADO: 0,
+            'malformadas': 0,
+        }
+
+    def __call__(self, linea: bytes):
+        return self.parsear(linea)
+
+    def parsear(self, linea: bytes):
+        """Devuelve (tipo, datos) o None si la línea está vacía o malformada.
+
+        - PESO: datos = (objetivo, actual, diferencia)
+        - JSON: datos = dict con al menos peso/objetivo/diferencia
+        - HEARTBEAT: datos = None
+        - ESTADO: datos = texto de la línea
+        """
+        inicial = linea[:1]
+
+        if inicial == b'O':
+            m = _RE_PESO.match(linea)
+            if m:
+                try:
+                    obj, act, dif = float(m[1]), float(m[2]), float(m[3])
+                except ValueError:
+                    obj = act = dif = None
+                # act == act descarta "nan" (el Arduino imprime nan/ovf/inf si falla la lectura)
+                if act is not None and act == act and obj == obj and dif == dif:
+                    self.contadores[TRAMA_PESO] += 1
+                    return TRAMA_PESO, (obj, act, dif)
+                self.contadores['malformadas'] += 1
+                return None
+            if linea.startswith(b'OBJ:'):
+                # Trama de peso cortada (ej. "OBJ:1.2;ACT:")
+                self.contadores['malformadas'] += 1
+                return None
+
+        elif inicial == b'{':
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                datos = None
+            if isinstance(datos, dict) and all(k in datos for k in CAMPOS_JSON):
+                self.contadores[TRAMA_JSON] += 1
+                return TRAMA_JSON, datos
+            self.contadores['malformadas'] += 1
+            return None
+
+        elif linea.startswith(_HEARTBEAT):
+            self.contadores[TRAMA_HEARTBEAT] += 1
+            return TRAMA_HEARTBEAT, None
+
+        texto = linea.decode('utf-8', errors='ignore').strip()
+        if not texto:
+            return None
+        self.contadores[TRAMA_ESTADO] += 1
+        return TRAMA_ESTADO, texto
+
+
+class ParserBinario:
+    """Separa y decodifica tramas binarias; devuelve (tipo, datos) como ParserTramas"""
+
+    def __init__(self):
+        self.contadores = {
+            TRAMA_MUESTRA: 0,
+            TRAMA_HEARTBEAT: 0,
+            'crc': 0,               # Tramas con CRC inválido (o sincronías falsas al resincronizar)
+            'perdidas': 0,          # Saltos en el número de secuencia
+            'bytes_ignorados': 0,   # Texto del sketch ("Arduino listo.", ...) y basura entre tramas
+            'malformadas': 0,
+        }
+        self.offset = None          # De la última trama de calibración
+        self.escala = None
+        self._seq = -1
+        self._ms = None
+
+    def __call__(self, trama):
+        return self.parsear(trama)
+
+    def separar(self, buffer: bytes):
+        """Devuelve (tramas, resto): memoryviews de las tramas con CRC válido y los bytes sin completar.
+
+        Se usa como `separar` del LectorSerial en lugar de cortar por '\n'.
+        """
+        tramas = []
+        agregar, buscar, crc = tramas.append, buffer.find, _CRC.unpack_from
+        vista = memoryview(buffer)
+        n = len(buffer)
+        i = 0
+        while True:
+            j = buscar(SINCRONIA, i)
+            if j < 0:
+                # Un 0xA5 al final puede ser la primera mitad de la próxima sincronía
+                fin = max(i, n - 1) if buffer.endswith(SINCRONIA[:1]) else n
+                self.contadores['bytes_ignorados'] += fin - i
+                return tramas, buffer[fin:]
+            if j != i:
+                self.contadores['bytes_ignorados'] += j - i
+            if n - j < TAMANO_BINARIO:
+                return tramas, buffer[j:]
+            fin = j + _FIN_CRC
+            if crc_hqx(vista[j:fin], 0xFFFF) == crc(buffer, fin)[0]:
+                i = j + TAMANO_BINARIO
+                agregar(vista[j:i])
+            else:
+                self.contadores['crc'] += 1
+                i = j + 1
+
+    def parsear(self, trama):
+        """Devuelve (tipo, datos) para una trama ya separada.
+
+        - MUESTRA: datos = Muestra(seq, ms, crudo, promedio, peso, objetivo)
+        - HEARTBEAT: datos = None (trama de calibración; actualiza offset/escala)
+        """
+        if len(trama) != TAMANO_BINARIO:
+            self.contadores['malformadas'] += 1
+            return None
+        tipo = trama[2]
+        campos = _CUERPO.unpack_from(trama, 3)
+        seq, ms, crudo, _, peso, objetivo = campos
+
+        # El seq es común a todos los tipos; si millis() retrocede, el Arduino se reinició
+        if seq != (self._seq + 1) & 0xFFFF and self._ms is not None and ms >= self._ms:
+            self.contadores['perdidas'] += (seq - self._seq - 1) & 0xFFFF
+        self._seq, self._ms = seq, ms
+
+        if tipo == TIPO_MUESTRA:
+            if peso == peso and objetivo == objetivo:
+                self.contadores[TRAMA_MUESTRA] += 1
+                return TRAMA_MUESTRA, tuple.__new__(Muestra, campos)  # Sin el __new__ en Python de NamedTuple
+        elif tipo == TIPO_CALIBRACION:
+            self.offset, self.escala = crudo, peso
+            self.contadores[TRAMA_HEARTBEAT] += 1
+            return TRAMA_HEARTBEAT, None
+        self.contadores['malformadas'] += 1
+        return None
+
+    def a_kg(self, cuentas):
+        """Cuentas del HX711 (número o arreglo NumPy) a kg con la última calibración recibida"""
+        if self.escala is None:
+            raise ValueError("Todavía no llegó la trama de calibración")
+        return (cuentas - self.offset) / self.escala
@@ -0,0 +1,256 @@
+"""
+Registro de recetas - Peso unitario aprendido por producto y fábrica
+
+Antes, cada saco pasaba por una muestra manual de 2 unidades para calcular
+el peso objetivo. Ahora cada saco aceptado (estado OK) actualiza una
+estadística acumulada (cantidad, media y M2 de Welford) del peso por
+unidad de su producto y fábrica. Cuando ya hay `min_muestras` sacos, el
+objetivo sale de ahí, está precalculado en memoria y se envía a la balanza
+(`OBJ:`) apenas se elige el producto.
+
+Se guarda en SQLite local (funciona sin red) y se sincroniza con las
+tablas `productos` y `recetas` de Supabase. Cada estación sube solo su
+propia fila por producto/fábrica y baja las de las demás. Las estadísticas
+se combinan con la fórmula de Chan, así que nadie pisa lo que aprendió otra
+estación.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+RECETAS_DB = 'recetas.db'
+
+# Se cargan en la base local la primera vez (antes era el dict PRODUCTOS fijo)
+PRODUCTOS_INICIALES = {
+    "ATUN": {"nombre": "Saco de 5 latas de Atún", "unidades": 5, "codigo": "ATUN-5"},
+    "PALMITO": {"nombre": "Saco de 3 latas de Palmitos", "unidades": 3, "codigo": "PALM-3"},
+}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS productos (
+    clave TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    unidades INTEGER NOT NULL,
+    lote TEXT
+);
+CREATE TABLE IF NOT EXISTS recetas (
+    producto TEXT NOT NULL,
+    fabrica_id INTEGER NOT NULL,
+    estacion TEXT NOT NULL,
+    muestras INTEGER NOT NULL,
+    media REAL NOT NULL,
+    m2 REAL NOT NULL,
+    actualizado REAL NOT NULL,
+    subido REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (producto, fabrica_id, estacion)
+);
+"""
+
+
+def combinar(a: tuple, b: tuple) -> tuple:
+    """Une dos estadísticas (muestras, media, m2) como si fueran una sola"""
+    n_a, media_a, m2_a = a
+    n_b, media_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = media_b - media_a
+    return n, media_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+class RegistroRecetas:
+    """Productos y peso unitario aprendido; objetivos precalculados por producto y fábrica"""
+
+    def __init__(self, ruta=RECETAS_DB, estacion='estacion', min_muestras=3, productos=PRODUCTOS_INICIALES):
+        self.ruta = ruta
+        self.estacion = estacion
+        self.min_muestras = min_muestras
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_ESQUEMA)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO productos (clave, nombre, unidades, lote) VALUES (?, ?, ?, ?)",
+                [(clave, p['nombre'], p['unidades'], p.get('codigo')) for clave, p in productos.items()],
+            )
+
+        self._productos = {}
+        self._estadisticas = {}  # (producto, fabrica_id, estacion) -> (muestras, media, m2)
+        self._objetivos = {}     # (producto, fabrica_id | None) -> (peso unitario, muestras)
+        self._cargar()
+
+        self._supabase = None
+        self._hilo = None
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self.ultimo_error = None
+
+    def _cargar(self):
+        with self._lock:
+            self._productos = {
+                clave: {"nombre": nombre, "unidades": unidades, "codigo": lote or clave}
+                for clave, nombre, unidades, lote in self._conn.execute(
+                    "SELECT clave, nombre, unidades, lote FROM productos ORDER BY rowid")
+            }
+            self._estadisticas = {
+                (producto, fabrica_id, estacion): (muestras, media, m2)
+                for producto, fabrica_id, estacion, muestras, media, m2 in self._conn.execute(
+                    "SELECT producto, fabrica_id, estacion, muestras, media, m2 FROM recetas")
+            }
+            for producto in self._productos:
+                self._precalcular(producto)
+
+    # -------------------- Consulta --------------------
+
+    def productos(self) -> dict:
+        """{clave: {"nombre", "unidades", "codigo"}}, en el orden en que se crearon"""
+        with self._lock:
+            return dict(self._productos)
+
+    def peso_unitario(self, producto: str, fabrica_id=None):
+        """(kg por unidad, sacos que lo respaldan) o None si aún hay que tomar muestra.
+
+        Usa lo aprendido para esa fábrica; si no alcanza, lo de todas las fábricas.
+        """
+        with self._lock:
+            return self._objetivos.get((producto, fabrica_id)) or self._objetivos.get((producto, None))
+
+    def objetivo(self, producto: str, fabrica_id=None):
+        """Peso objetivo del saco completo en kg, o None"""
+        base = self.peso_unitario(producto, fabrica_id)
+        if base is None:
+            return None
+        return base[0] * self._productos[producto]['unidades']
+
+    def desviacion(self, producto: str, fabrica_id=None) -> float:
+        """Desviación estándar del peso unitario (kg) con todo lo aprendido"""
+        with self._lock:
+            n, _, m2 = self._combinado(producto, fabrica_id)
+        return math.sqrt(m2 / (n - 1)) if n > 1 else float('nan')
+
+    def _combinado(self, producto, fabrica_id):
+        total = (0, 0.0, 0.0)
+        for (p, f, _), estadistica in self._estadisticas.items():
+            if p == producto and (fabrica_id is None or f == fabrica_id):
+                total = combinar(total, estadistica)
+        return total
+
+    def _precalcular(self, producto):
+        # Se llama con el lock tomado, cada vez que cambia una estadística del producto
+        for clave in [c for c in self._objetivos if c[0] == producto]:
+            del self._objetivos[clave]
+        fabricas = {f for (p, f, _) in self._estadisticas if p == producto}
+        for fabrica_id in list(fabricas) + [None]:
+            n, media, _ = self._combinado(producto, fabrica_id)
+            if n >= self.min_muestras:
+                self._objetivos[(producto, fabrica_id)] = (media, n)
+
+    # -------------------- Aprendizaje --------------------
+
+    def registrar(self, producto: str, fabrica_id: int, peso_saco: float):
+        """Agrega un saco aceptado a la estadística de esta estación (Welford)"""
+        unidades = self._productos[producto]['unidades']
+        x = peso_saco / unidades
+        clave = (producto, fabrica_id, self.estacion)
+        with self._lock:
+            n, media, m2 = self._estadisticas.get(clave, (0, 0.0, 0.0))
+            n += 1
+            delta = x - media
+            media += delta / n
+            m2 += delta * (x - media)
+            self._estadisticas[clave] = (n, media, m2)
+            self._precalcular(producto)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO recetas (producto, fabrica_id, estacion, muestras, media, m2, actualizado) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (producto, fabrica_id, estacion) DO UPDATE SET "
+                    "muestras = excluded.muestras, media = excluded.media, m2 = excluded.m2, "
+                    "actualizado = excluded.actualizado",
+                    (producto, fabrica_id, self.estacion, n, media, m2, time.time()),
+                )
+        self._despertar.set()
+
+    # -------------------- Sincronización con Supabase --------------------
+
+    def sincronizar(self, supabase):
+        """Sube las filas propias modificadas y baja productos y recetas de las demás estaciones"""
+        with self._lock:
+            pendientes = self._conn.execute(
+                "SELECT producto, fabrica_id, muestras, media, m2, actualizado FROM recetas "
+                "WHERE estacion = ? AND actualizado > subido", (self.estacion,)).fetchall()
+        error = None
+        if pendientes:
+            try:
+                supabase.table("recetas").upsert([
+                    {"producto": p, "fabrica_id": f, "estacion": self.estacion,
+                     "muestras": n, "media_kg": media, "m2": m2}
+                    for p, f, n, media, m2, _ in pendientes
+                ], on_conflict="producto,fabrica_id,estacion").execute()
+            except Exception as e:
+                error = e  # Sin permiso de escritura (clave anon) se bajan igual las demás estaciones
+            else:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "UPDATE recetas SET subido = ? WHERE producto = ? AND fabrica_id = ? AND estacion = ?",
+                        [(actualizado, p, f, self.estacion) for p, f, _, _, _, actualizado in pendientes],
+                    )
+
+        productos = supabase.table("productos").select("clave, nombre, unidades, lote").eq("activo", True).execute()
+        recetas = supabase.table("recetas").select("producto, fabrica_id, estacion, muestras, media_kg, m2") \
+            .neq("estacion", self.estacion).execute()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO productos (clave, nombre, unidades, lote) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (clave) DO UPDATE SET nombre = excluded.nombre, unidades = excluded.unidades, "
+                "lote = excluded.lote",
+                [(p["clave"], p["nombre"], p["unidades"], p.get("lote")) for p in productos.data or []],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO recetas (producto, fabrica_id, estacion, muestras, media, m2, actualizado, subido) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, 0)",
+                [(r["producto"], r["fabrica_id"], r["estacion"], r["muestras"], float(r["media_kg"]), r["m2"])
+                 for r in recetas.data or []],
+            )
+        self._cargar()
+        if error:
+            raise error
+
+    def iniciar(self, supabase, intervalo=60.0):
+        """Sincroniza en segundo plano cada `intervalo` s (y enseguida después de cada saco aprendido)"""
+        self._supabase = supabase
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._trabajar, args=(intervalo,), name="recetas", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+        with self._lock:
+            self._conn.close()
+
+    def _trabajar(self, intervalo):
+        while not self._detener.is_set():
+            try:
+                self.sincronizar(self._supabase)
+                self.ultimo_error = None
+            except Exception as e:
+                # Sin red se sigue con lo local; lo aprendido se sube en la próxima vuelta
+                if self.ultimo_error is None:
+                    print(f"⚠️ No se pudieron sincronizar las recetas: {e}")
+                self.ultimo_error = e
+            self._despertar.wait(intervalo)
+            self._despertar.clear()
+
+        # Último intento al cerrar: subir lo aprendido en esta sesión
+        try:
+            self.sincronizar(self._supabase)
+        except Exception:
+            pass
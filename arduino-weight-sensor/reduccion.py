@@ -0,0 +1,140 @@
+"""
+Reducción de lecturas antes de subirlas a pesajes_tiempo_real
+
+Los sketches envían una lectura cada 500 ms aunque la balanza esté vacía
+o quieta. El reductor decide, por estación, qué lecturas valen una fila:
+
+- Banda muerta: solo cuando el peso cambia más de `banda_muerta_kg`
+  (o cambia el estado OK/FUERA_RANGO), como mucho una vez cada
+  `intervalo_min` segundos.
+- `intervalo_max`: aunque nada cambie, una fila cada tantos segundos
+  para que el dashboard sepa que la balanza sigue viva.
+- Ventana (`ventana_s` > 0): en vez de lecturas sueltas, una fila por
+  ventana con media, mínimo, máximo y cantidad de muestras.
+- `emitir_al_estabilizar`: siempre se emite la lectura en que el peso se
+  asienta (detector de estabilidad), aunque esté dentro de la banda.
+"""
+
+from estabilidad import DetectorEstabilidad
+
+
+class _EstadoEstacion:
+    __slots__ = ('peso', 'estado', 'instante', 'detector',
+                 'inicio_ventana', 'plantilla', 'minimo', 'maximo', 'suma', 'cuenta')
+
+    def __init__(self):
+        self.peso = None
+        self.estado = None
+        self.instante = None
+        self.detector = None
+        self.inicio_ventana = None
+        self.plantilla = None
+        self.minimo = self.maximo = self.suma = 0.0
+        self.cuenta = 0
+
+
+class ReductorPesajes:
+    """Filtra/agrega lecturas por estación y lleva la tasa de compresión"""
+
+    def __init__(self, banda_muerta_kg=0.005, intervalo_min=0.5, intervalo_max=60.0,
+                 ventana_s=0.0, emitir_al_estabilizar=False, tolerancia_estado=0.005):
+        self.banda_muerta_kg = banda_muerta_kg
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.ventana_s = ventana_s
+        self.emitir_al_estabilizar = emitir_al_estabilizar
+        self.tolerancia_estado = tolerancia_estado  # Misma regla que enviar_a_supabase()
+
+        self._estaciones = {}
+        self.entrada = 0
+        self.salida = 0
+
+    def _estacion(self, estacion) -> _EstadoEstacion:
+        estado = self._estaciones.get(estacion)
+        if estado is None:
+            estado = self._estaciones[estacion] = _EstadoEstacion()
+            if self.emitir_al_estabilizar:
+                estado.detector = DetectorEstabilidad()
+        return estado
+
+    def procesar(self, registro: dict, estacion=None, instante=0.0) -> list:
+        """Recibe un registro listo para pesajes_tiempo_real y devuelve las filas a subir"""
+        self.entrada += 1
+        e = self._estacion(estacion)
+        peso = registro['peso_actual']
+
+        asentado = e.detector is not None and e.detector.agregar(peso) is not None
+
+        if self.ventana_s > 0:
+            filas = self._agregar_en_ventana(e, registro, peso, instante)
+            if asentado:
+                filas.append(dict(registro))
+            self.salida += len(filas)
+            return filas
+
+        emitir = (
+            e.instante is None
+            or asentado
+            or instante - e.instante >= self.intervalo_max
+            or (instante - e.instante >= self.intervalo_min and (
+                abs(peso - e.peso) >= self.banda_muerta_kg or registro.get('estado') != e.estado))
+        )
+        if not emitir:
+            return []
+
+        e.peso = peso
+        e.estado = registro.get('estado')
+        e.instante = instante
+        self.salida += 1
+        return [registro]
+
+    def _agregar_en_ventana(self, e: _EstadoEstacion, registro: dict, peso: float, instante: float) -> list:
+        filas = []
+        if e.cuenta and instante - e.inicio_ventana >= self.ventana_s:
+            filas.append(self._cerrar_ventana(e))
+
+        if not e.cuenta:
+            e.inicio_ventana = instante
+            e.minimo = e.maximo = peso
+            e.suma = 0.0
+        e.minimo = min(e.minimo, peso)
+        e.maximo = max(e.maximo, peso)
+        e.suma += peso
+        e.cuenta += 1
+        e.plantilla = registro
+        return filas
+
+    def _cerrar_ventana(self, e: _EstadoEstacion) -> dict:
+        media = e.suma / e.cuenta
+        fila = dict(e.plantilla)
+        diferencia = media - fila['peso_objetivo']
+        fila.update({
+            'peso_actual': round(media, 3),
+            'diferencia': round(diferencia, 3),
+            'estado': 'OK' if abs(diferencia) <= self.tolerancia_estado else 'FUERA_RANGO',
+            'peso_min': round(e.minimo, 3),
+            'peso_max': round(e.maximo, 3),
+            'muestras': e.cuenta,
+        })
+        e.cuenta = 0
+        return fila
+
+    def vencidas(self, instante: float) -> list:
+        """Cierra las ventanas que ya terminaron aunque no hayan llegado más lecturas"""
+        if self.ventana_s <= 0:
+            return []
+        filas = [self._cerrar_ventana(e) for e in self._estaciones.values()
+                 if e.cuenta and instante - e.inicio_ventana >= self.ventana_s]
+        self.salida += len(filas)
+        return filas
+
+    def vaciar(self) -> list:
+        """Cierra todas las ventanas abiertas (al detener el bridge)"""
+        filas = [self._cerrar_ventana(e) for e in self._estaciones.values() if e.cuenta]
+        self.salida += len(filas)
+        return filas
+
+    @property
+    def compresion(self) -> float:
+        """Lecturas recibidas por cada fila emitida"""
+        return self.entrada / self.salida if self.salida else float(self.entrada or 1)
@@ -0,0 +1,246 @@
+"""
+Registro local rotativo - Reemplaza el registro_inventario.csv único
+
+El archivo queda abierto (no se reabre por cada saco) con un buffer
+grande; cada fila se entrega al sistema operativo con `flush()` y el
+`fsync` a disco se agrupa cada `fsync_cada` filas o `fsync_intervalo`
+segundos. Se rota un archivo por día (y otro si pasa de `max_bytes`):
+
+    registros/registro_inventario_2025-11-20.csv
+    registros/registro_inventario_2025-11-20.1.csv
+    registros/registro_inventario_2025-11-19.csv.gz   ← segmentos cerrados, comprimidos
+
+Un segmento se comprime al rotarlo. Al abrir el del día también se
+comprimen los que quedaron sin comprimir de días anteriores (la estación
+se apaga cada noche y no llega a rotarlos).
+
+`leer_rango()` y `ultimas()` solo abren los segmentos que hacen falta,
+así que años de historia no hacen más lenta ninguna consulta.
+"""
+
+import csv
+import gzip
+import io
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import date, datetime
+
+DIRECTORIO_REGISTROS = 'registros'
+PREFIJO_REGISTRO = 'registro_inventario'
+
+_RE_SEGMENTO = r'^{prefijo}_(\d{{4}}-\d{{2}}-\d{{2}})(?:\.(\d+))?\.csv(\.gz)?$'
+
+
+def segmentos(directorio=DIRECTORIO_REGISTROS, prefijo=PREFIJO_REGISTRO) -> list:
+    """[(fecha, número, ruta)] ordenados del más antiguo al más reciente"""
+    if not os.path.isdir(directorio):
+        return []
+    patron = re.compile(_RE_SEGMENTO.format(prefijo=re.escape(prefijo)))
+    encontrados = {}
+    for nombre in os.listdir(directorio):
+        m = patron.match(nombre)
+        if m:
+            clave = (date.fromisoformat(m[1]), int(m[2] or 0))
+            # Si existen .csv y .csv.gz (compresión interrumpida) se prefiere el .csv
+            if clave not in encontrados or not nombre.endswith('.gz'):
+                encontrados[clave] = os.path.join(directorio, nombre)
+    return [(f, n, ruta) for (f, n), ruta in sorted(encontrados.items())]
+
+
+def _abrir_lectura(ruta: str):
+    if ruta.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(ruta, 'rb'), encoding='utf-8', newline='')
+    return open(ruta, encoding='utf-8', newline='')
+
+
+def leer_rango(desde: date, hasta: date, directorio=DIRECTORIO_REGISTROS, prefijo=PREFIJO_REGISTRO):
+    """Itera las filas (dict por encabezado) entre dos fechas, inclusive"""
+    for fecha, _, ruta in segmentos(directorio, prefijo):
+        if desde <= fecha <= hasta:
+            with _abrir_lectura(ruta) as f:
+                yield from csv.DictReader(f)
+
+
+def ultimas(n=20, directorio=DIRECTORIO_REGISTROS, prefijo=PREFIJO_REGISTRO) -> list:
+    """Últimas `n` filas, leyendo los segmentos desde el final"""
+    filas = []
+    for _, _, ruta in reversed(segmentos(directorio, prefijo)):
+        if ruta.endswith('.gz'):
+            with _abrir_lectura(ruta) as f:
+                contenido = list(csv.DictReader(f))
+        else:
+            contenido = _cola_archivo(ruta, n - len(filas))
+        filas = contenido[-(n - len(filas)):] + filas if contenido else filas
+        if len(filas) >= n:
+            break
+    return filas
+
+
+def _cola_archivo(ruta: str, n: int) -> list:
+    """Lee solo el final de un CSV sin recorrerlo entero"""
+    with open(ruta, 'rb') as f:
+        encabezado = f.readline()
+        tamano = f.seek(0, os.SEEK_END)
+        bloque = 8192
+        inicio = tamano
+        datos = b''
+        while inicio > len(encabezado) and datos.count(b'\n') <= n:
+            inicio = max(len(encabezado), inicio - bloque)
+            f.seek(inicio)
+            datos = f.read(tamano - inicio)
+            bloque *= 2
+    lineas = datos.splitlines(keepends=True)
+    if inicio > len(encabezado):
+        lineas = lineas[1:]  # La primera puede estar cortada
+    texto = (encabezado + b''.join(lineas[-n:] if n > 0 else [])).decode('utf-8')
+    return list(csv.DictReader(io.StringIO(texto, newline='')))
+
+
+class RegistroRotativo:
+    """Escritor CSV append-only con rotación diaria/por tamaño y fsync agrupado"""
+
+    def __init__(self, encabezado: list, directorio=DIRECTORIO_REGISTROS, prefijo=PREFIJO_REGISTRO,
+                 max_bytes=50 * 1024 * 1024, comprimir=True, fsync_cada=20, fsync_intervalo=5.0,
+                 metricas=None):
+        self.encabezado = encabezado
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.max_bytes = max_bytes
+        self.comprimir = comprimir
+        self.fsync_cada = fsync_cada
+        self.fsync_intervalo = fsync_intervalo
+
+        self._lock = threading.Lock()
+        self._archivo = None
+        self._writer = None
+        self._fecha = None
+        self._numero = 0
+        self._sin_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+        self._cerrados = set()  # Segmentos cerrados por esta instancia (quizás comprimiéndose)
+        self.ruta_actual = None
+
+        self._h_escritura = self._h_fsync = None
+        if metricas:
+            self._h_escritura = metricas.histograma('escritura_csv', 'Fila escrita en el backup CSV (con flush)')
+            self._h_fsync = metricas.histograma('fsync_csv', 'fsync del backup CSV')
+
+        os.makedirs(directorio, exist_ok=True)
+        self._detener = threading.Event()
+        threading.Thread(target=self._fsync_periodico, name="registro-fsync", daemon=True).start()
+
+    def _ruta(self, fecha: date, numero: int) -> str:
+        sufijo = f".{numero}" if numero else ""
+        return os.path.join(self.directorio, f"{self.prefijo}_{fecha.isoformat()}{sufijo}.csv")
+
+    def _abrir(self, fecha: date):
+        # Al reiniciar el programa el mismo día se continúa el último segmento de esa fecha,
+        # salvo que ya esté comprimido o cerrado (se estaría agregando a un archivo en gzip)
+        numero = None
+        ultimo = None
+        for f, n, ruta in segmentos(self.directorio, self.prefijo):
+            if f == fecha:
+                numero, ultimo = n, ruta
+        if numero is None:
+            numero = 0
+        elif (ultimo.endswith('.gz') or ultimo in self._cerrados
+              or os.path.getsize(ultimo) >= self.max_bytes):
+            numero += 1
+        self._abrir_ruta(fecha, numero, self._ruta(fecha, numero))
+        if self.comprimir:
+            self._comprimir_anteriores()
+
+    def _comprimir_anteriores(self):
+        """Comprime los segmentos sin comprimir que ya no se van a escribir (cerrados por otra corrida)"""
+        viejos = [ruta for _, _, ruta in segmentos(self.directorio, self.prefijo)
+                  if not ruta.endswith('.gz') and ruta != self.ruta_actual and ruta not in self._cerrados]
+        if viejos:
+            self._cerrados.update(viejos)
+            threading.Thread(target=_comprimir, args=viejos, name="registro-gzip", daemon=True).start()
+
+    def _abrir_ruta(self, fecha: date, numero: int, ruta: str):
+        self._archivo = open(ruta, 'a', newline='', encoding='utf-8', buffering=64 * 1024)
+        self._writer = csv.writer(self._archivo)
+        self._fecha = fecha
+        self._numero = numero
+        self.ruta_actual = ruta
+        if self._archivo.tell() == 0:
+            self._writer.writerow(self.encabezado)
+
+    def _cerrar_segmento(self):
+        if not self._archivo:
+            return
+        self._sincronizar()
+        self._archivo.close()
+        cerrado = self.ruta_actual
+        self._cerrados.add(cerrado)
+        self._archivo = None
+        if self.comprimir:
+            threading.Thread(target=_comprimir, args=(cerrado,), name="registro-gzip", daemon=True).start()
+
+    def escribir(self, fila: list, fecha: datetime = None):
+        """Agrega una fila; rota el archivo si cambió el día o se pasó del tamaño máximo"""
+        dia = (fecha or datetime.now()).date()
+        inicio = time.perf_counter()
+        with self._lock:
+            if self._archivo is None:
+                self._abrir(dia)
+            elif dia != self._fecha:
+                self._cerrar_segmento()
+                self._abrir(dia)
+            elif self._archivo.tell() >= self.max_bytes:
+                self._cerrar_segmento()
+                self._abrir_ruta(dia, self._numero + 1, self._ruta(dia, self._numero + 1))
+
+            self._writer.writerow(fila)
+            self._archivo.flush()  # Al sistema operativo; sobrevive a un cierre del programa
+            self._sin_fsync += 1
+            if (self._sin_fsync >= self.fsync_cada
+                    or time.monotonic() - self._ultimo_fsync >= self.fsync_intervalo):
+                self._sincronizar()
+        if self._h_escritura:
+            self._h_escritura.observar(time.perf_counter() - inicio)
+
+    def _sincronizar(self):
+        if self._archivo and self._sin_fsync:
+            self._archivo.flush()
+            inicio = time.perf_counter()
+            os.fsync(self._archivo.fileno())
+            if self._h_fsync:
+                self._h_fsync.observar(time.perf_counter() - inicio)
+        self._sin_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def sincronizar(self):
+        """Fuerza el fsync de lo escrito hasta ahora"""
+        with self._lock:
+            self._sincronizar()
+
+    def _fsync_periodico(self):
+        # Las filas que quedaron sin fsync no esperan a que llegue otro saco
+        while not self._detener.wait(self.fsync_intervalo):
+            with self._lock:
+                if self._sin_fsync:
+                    self._sincronizar()
+
+    def cerrar(self):
+        self._detener.set()
+        with self._lock:
+            if self._archivo:
+                self._sincronizar()
+                self._archivo.close()
+                self._archivo = None
+
+
+def _comprimir(*rutas: str):
+    """Comprime segmentos cerrados y borra los originales"""
+    for ruta in rutas:
+        try:
+            with open(ruta, 'rb') as origen, gzip.open(ruta + '.gz', 'wb') as destino:
+                shutil.copyfileobj(origen, destino)
+            os.remove(ruta)
+        except OSError as e:
+            print(f"⚠️ No se pudo comprimir {ruta}: {e}")
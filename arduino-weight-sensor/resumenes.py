@@ -0,0 +1,345 @@
+"""
+Resúmenes incrementales - Totales por fábrica, hora/día y estado mantenidos al escribir
+
+Las vistas de pérdidas del dashboard recorrían `sacos` y
+`pesajes_tiempo_real` completas en cada carga. Ahora los procesos que
+escriben esas filas (el bridge y la estación de pesaje) van sumando en
+memoria, por tabla, fábrica, hora y día, y estado:
+
+    cantidad, suma_diferencia, fuera_rango, kg_faltantes
+
+Cada `intervalo` segundos lo acumulado se manda en un solo llamado a la
+función `sumar_resumen` de Supabase. La función suma esas cifras a las filas
+de `resumen_pesajes`, así que varias estaciones pueden escribir las mismas
+celdas sin pisarse. Cada envío lleva un `lote` (UUID): si un envío falla
+a medias, se reintenta con el mismo lote y la base no lo suma dos veces.
+Mientras ese lote no sale, lo nuevo se sigue sumando en las mismas celdas
+en memoria (no se arman más lotes), así que un corte largo no hace crecer
+lo pendiente más allá de una celda por hora, fábrica y estado. Si el
+proceso se corta, se pierde lo acumulado desde el último envío (a lo más
+`intervalo` segundos); `--backfill` rearma los resúmenes desde el
+historial exportado.
+
+`sumar_resumen` no acepta la clave anon: `crear_cliente_resumenes()` arma
+el cliente con una clave de servicio o con la sesión de un usuario
+operador.
+
+Uso:
+    python resumenes.py --backfill --exportar                 # exporta y recalcula hasta ayer
+    python resumenes.py --backfill --tabla sacos --desde 2025-11-01 --sin-subir
+"""
+
+import argparse
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+TABLA_RESUMEN = 'resumen_pesajes'
+FUNCION_SUMAR = 'sumar_resumen'
+PERIODOS = ('hora', 'dia')
+TAMANO_LOTE = 500  # Celdas por llamado / por upsert del backfill
+AVISO_ERRORES = 300.0  # Segundos entre avisos mientras los envíos siguen fallando
+
+# Columna de fecha y de fábrica de cada tabla de origen
+TABLAS = {
+    'sacos': ('fecha_pesaje', 'fabrica_id'),
+    'pesajes_tiempo_real': ('timestamp', 'fabrica'),
+}
+
+
+def inicio_periodos(instante: datetime) -> tuple:
+    """Inicio de la hora y del día (hora local) como ISO con zona"""
+    local = instante.astimezone()  # Sin zona = hora local, como las filas del bridge
+    hora = local.replace(minute=0, second=0, microsecond=0)
+    # El día que cambia la hora la medianoche tiene otro desfase que la hora en curso
+    dia = datetime.combine(local.date(), datetime.min.time()).astimezone()
+    return hora.isoformat(), dia.isoformat()
+
+
+def crear_cliente_resumenes(url: str, clave: str, clave_resumenes: str = None, email: str = None,
+                            contrasena: str = None):
+    """Cliente autorizado para sumar_resumen, o None si no hay con qué autorizarlo.
+
+    Con `clave_resumenes` (clave de servicio) se usa esa clave; si no, se
+    inicia sesión con `email`/`contrasena` (un usuario operador, supervisor o
+    admin) sobre la clave anon. El cliente se crea en segundo plano y renueva
+    solo el token de la sesión.
+    """
+    if not clave_resumenes and not (email and contrasena):
+        return None
+    from cliente_diferido import ClienteDiferido
+
+    def crear():
+        from supabase import create_client
+        if clave_resumenes:
+            return create_client(url, clave_resumenes)
+        cliente = create_client(url, clave)
+        cliente.auth.sign_in_with_password({'email': email, 'password': contrasena})
+        return cliente
+
+    return ClienteDiferido(crear).iniciar()
+
+
+class AcumuladorResumenes:
+    """Celdas (tabla, período, inicio, fábrica, estado) → sumas pendientes de enviar"""
+
+    def __init__(self, supabase=None, intervalo=30.0, tamano_lote=TAMANO_LOTE, metricas=None):
+        self.supabase = supabase
+        self.intervalo = intervalo
+        self.tamano_lote = tamano_lote
+
+        self._lock = threading.Lock()
+        self._celdas = {}       # clave -> [cantidad, suma_diferencia, fuera_rango, kg_faltantes]
+        self._por_enviar = []   # [(lote, filas)] armados y aún no confirmados, en orden
+        self._envio = threading.Lock()
+        self._ultima_hora = (None, None)  # Caché de la última hora parseada
+
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo = None
+
+        self.filas = 0
+        self.enviadas = 0
+        self.errores = 0
+        self.ultimo_error = None
+        self._ultimo_aviso = None
+
+        if metricas:
+            metricas.indicador('celdas_resumen_pendientes', lambda: self.pendientes,
+                               'Celdas de resumen_pesajes acumuladas sin enviar')
+            metricas.indicador('errores_resumen', lambda: self.errores, 'Envíos de resúmenes fallidos')
+
+    # -------------------- Acumulación (camino de cada fila) --------------------
+
+    def _periodos(self, instante) -> tuple:
+        if not instante:
+            return inicio_periodos(datetime.now())
+        if isinstance(instante, datetime):
+            return inicio_periodos(instante)
+        # Filas de una misma hora comparten los primeros 13 caracteres y la zona
+        clave = (instante[:13], instante[19:].lstrip('.0123456789'))
+        guardada, periodos = self._ultima_hora
+        if clave != guardada:
+            periodos = inicio_periodos(datetime.fromisoformat(instante))
+            self._ultima_hora = (clave, periodos)
+        return periodos
+
+    def agregar(self, tabla: str, fila: dict):
+        self.agregar_lote(tabla, [fila])
+
+    def agregar_lote(self, tabla: str, filas: list):
+        """Suma las filas recién escritas en `tabla` (sacos o pesajes_tiempo_real)"""
+        columna_fecha, columna_fabrica = TABLAS[tabla]
+        with self._lock:
+            celdas = self._celdas
+            for fila in filas:
+                hora, dia = self._periodos(fila.get(columna_fecha))
+                fabrica = fila.get(columna_fabrica)
+                estado = fila.get('estado')
+                diferencia = float(fila.get('diferencia') or 0.0)
+                fuera = 1 if estado == 'FUERA_RANGO' else 0
+                faltante = -diferencia if diferencia < 0 else 0.0
+                for periodo, inicio in (('hora', hora), ('dia', dia)):
+                    suma = celdas.get((tabla, periodo, inicio, fabrica, estado))
+                    if suma is None:
+                        celdas[(tabla, periodo, inicio, fabrica, estado)] = [1, diferencia, fuera, faltante]
+                    else:
+                        suma[0] += 1
+                        suma[1] += diferencia
+                        suma[2] += fuera
+                        suma[3] += faltante
+            self.filas += len(filas)
+        if len(self._celdas) >= self.tamano_lote:
+            self._despertar.set()
+
+    @property
+    def pendientes(self) -> int:
+        return len(self._celdas) + sum(len(filas) for _, filas in self._por_enviar)
+
+    # -------------------- Envío --------------------
+
+    def _armar_lotes(self) -> bool:
+        """Pasa las celdas acumuladas a lotes; no arma nada mientras quede un lote sin confirmar"""
+        if self._por_enviar:
+            return False
+        with self._lock:
+            celdas, self._celdas = self._celdas, {}
+        filas = [
+            {
+                'tabla': tabla, 'periodo': periodo, 'inicio': inicio,
+                'fabrica_id': fabrica if tabla == 'sacos' else None,
+                'fabrica': None if tabla == 'sacos' else fabrica,
+                'estado': estado, 'cantidad': cantidad, 'suma_diferencia': round(suma_diferencia, 6),
+                'fuera_rango': fuera_rango, 'kg_faltantes': round(kg_faltantes, 6),
+            }
+            for (tabla, periodo, inicio, fabrica, estado), (cantidad, suma_diferencia, fuera_rango, kg_faltantes)
+            in celdas.items()
+        ]
+        for i in range(0, len(filas), self.tamano_lote):
+            self._por_enviar.append((str(uuid.uuid4()), filas[i:i + self.tamano_lote]))
+        return True
+
+    def vaciar(self) -> int:
+        """Envía todo lo acumulado; devuelve las celdas enviadas (lanza excepción si falla)"""
+        total = 0
+        with self._envio:
+            armadas = self._armar_lotes()
+            while self._por_enviar:
+                lote, filas = self._por_enviar[0]
+                # Mismo lote en cada reintento: la función ignora los lotes ya aplicados
+                self.supabase.rpc(FUNCION_SUMAR, {'lote': lote, 'filas': filas}).execute()
+                self._por_enviar.pop(0)
+                total += len(filas)
+                self.enviadas += len(filas)
+                if not armadas and not self._por_enviar:
+                    # Salieron los lotes de un envío anterior: ahora lo acumulado mientras tanto
+                    armadas = self._armar_lotes()
+        return total
+
+    def iniciar(self, supabase=None):
+        if supabase is not None:
+            self.supabase = supabase
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._trabajar, name="resumenes", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    def _trabajar(self):
+        while not self._detener.is_set():
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self._intentar()
+        # Último envío al cerrar
+        self._intentar()
+
+    def _intentar(self):
+        try:
+            self.vaciar()
+            if self.ultimo_error is not None:
+                print(f"✅ Resúmenes enviados de nuevo tras {self.errores} errores")
+            self.ultimo_error = None
+            self._ultimo_aviso = None
+        except Exception as e:
+            self.errores += 1
+            self.ultimo_error = e
+            # Primer error y luego cada AVISO_ERRORES s: un permiso mal configurado no queda en silencio
+            ahora = time.monotonic()
+            if self._ultimo_aviso is None or ahora - self._ultimo_aviso >= AVISO_ERRORES:
+                self._ultimo_aviso = ahora
+                print(f"⚠️ No se pudieron enviar los resúmenes ({self.pendientes} celdas pendientes, "
+                      f"{self.errores} errores): {e}")
+
+
+# -------------------- Backfill desde el historial --------------------
+
+def resumir_historial(df, tabla: str):
+    """Mismas celdas que AcumuladorResumenes, calculadas con pandas sobre la exportación de `tabla`"""
+    import numpy as np
+    import pandas as pd
+
+    columna_fecha, columna_fabrica = TABLAS[tabla]
+    if df.empty:
+        return []
+    diferencia = df['diferencia'].astype('float64').fillna(0.0)
+    # Desfase local de cada fila, el mismo que le da astimezone() en vivo: cambia con el horario
+    # de verano, y en la hora que se repite distingue las dos pasadas. Los cambios de hora caen
+    # en múltiplos de 15 min (UTC), así que se calcula una vez por cuarto de hora.
+    utc = df[columna_fecha].dt.tz_convert('UTC')
+    cuartos = utc.dt.floor('15min')
+    desfases = {c: c.to_pydatetime().astimezone().utcoffset() // timedelta(seconds=1) for c in cuartos.unique()}
+    desfase = cuartos.map(desfases).astype('int64')
+    reloj = utc.dt.tz_localize(None) + pd.to_timedelta(desfase, unit='s')  # Hora local "de pared"
+    base = pd.DataFrame({
+        'fabrica': df[columna_fabrica].astype('object'),
+        'estado': df['estado'].astype('object'),
+        'diferencia': diferencia,
+        'fuera_rango': (df['estado'] == 'FUERA_RANGO').astype('int64'),
+        'kg_faltantes': np.clip(-diferencia.to_numpy(), 0, None),
+    })
+
+    def inicio_hora(reloj_hora, segundos):
+        return reloj_hora.to_pydatetime().replace(tzinfo=timezone(timedelta(seconds=segundos))).isoformat()
+
+    def inicio_dia(reloj_dia, _):
+        return datetime.combine(reloj_dia.date(), datetime.min.time()).astimezone().isoformat()
+
+    filas = []
+    for periodo, reloj_inicio, formato in (('hora', reloj.dt.floor('h'), inicio_hora),
+                                           ('dia', reloj.dt.normalize(), inicio_dia)):
+        grupos = base.assign(inicio=reloj_inicio, desfase=desfase if periodo == 'hora' else 0) \
+            .groupby(['inicio', 'desfase', 'fabrica', 'estado'], dropna=False, sort=True)
+        resumen = grupos.agg(cantidad=('diferencia', 'size'), suma_diferencia=('diferencia', 'sum'),
+                             fuera_rango=('fuera_rango', 'sum'), kg_faltantes=('kg_faltantes', 'sum'))
+        for (inicio_celda, segundos, fabrica, estado), c in resumen.iterrows():
+            fabrica = None if pd.isna(fabrica) else fabrica
+            filas.append({
+                'tabla': tabla, 'periodo': periodo, 'inicio': formato(inicio_celda, segundos),
+                'fabrica_id': int(fabrica) if tabla == 'sacos' and fabrica is not None else None,
+                'fabrica': None if tabla == 'sacos' else fabrica,
+                'estado': None if pd.isna(estado) else estado,
+                'cantidad': int(c['cantidad']), 'suma_diferencia': round(float(c['suma_diferencia']), 6),
+                'fuera_rango': int(c['fuera_rango']), 'kg_faltantes': round(float(c['kg_faltantes']), 6),
+            })
+    return filas
+
+
+def reemplazar_resumenes(supabase, tabla: str, desde: date, hasta: date, filas: list, tamano=TAMANO_LOTE) -> int:
+    """Borra las celdas de `tabla` en [desde, hasta) y sube las recalculadas (valores absolutos)"""
+    inicio = datetime.combine(desde, datetime.min.time()).astimezone().isoformat()
+    fin = datetime.combine(hasta, datetime.min.time()).astimezone().isoformat()
+    (supabase.table(TABLA_RESUMEN).delete()
+     .eq('tabla', tabla).gte('inicio', inicio).lt('inicio', fin).execute())
+    for i in range(0, len(filas), tamano):
+        (supabase.table(TABLA_RESUMEN)
+         .upsert(filas[i:i + tamano], on_conflict='tabla,periodo,inicio,fabrica_id,fabrica,estado')
+         .execute())
+    return len(filas)
+
+
+def main(argv=None):
+    from exportar import cargar, exportar_tabla, DIRECTORIO_EXPORTES, SUPABASE_URL, SUPABASE_KEY
+
+    args = argparse.ArgumentParser(description="Resúmenes por fábrica/hora/día/estado (resumen_pesajes)")
+    args.add_argument("--backfill", action="store_true", help="Recalcular los resúmenes desde el historial exportado")
+    args.add_argument("--tabla", choices=list(TABLAS), action="append", help="Tabla de origen (por defecto, ambas)")
+    args.add_argument("--desde", type=date.fromisoformat, help="Primer día (AAAA-MM-DD); por defecto, todo")
+    args.add_argument("--hasta", type=date.fromisoformat,
+                      help="Último día incluido; por defecto ayer (hoy lo siguen sumando las estaciones)")
+    args.add_argument("--directorio", default=DIRECTORIO_EXPORTES, help="Carpeta de exportar.py")
+    args.add_argument("--exportar", action="store_true", help="Exportar antes las filas nuevas desde Supabase")
+    args.add_argument("--sin-subir", action="store_true", help="Solo calcular y mostrar cuántas celdas salen")
+    args = args.parse_args(argv)
+
+    if not args.backfill:
+        print("Nada que hacer: los resúmenes los mantienen el bridge y las estaciones (usa --backfill)")
+        return
+
+    supabase = None
+    if args.exportar or not args.sin_subir:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    hasta = args.hasta or date.today() - timedelta(days=1)
+    for tabla in args.tabla or list(TABLAS):
+        if args.exportar:
+            exportar_tabla(supabase, tabla, args.directorio)
+        inicio = time.monotonic()
+        df = cargar(tabla, args.directorio, desde=args.desde, hasta=hasta)  # Días en hora local
+        filas = resumir_historial(df, tabla)
+        print(f"📊 {tabla}: {len(df)} filas → {len(filas)} celdas en {time.monotonic() - inicio:.2f} s")
+        if args.sin_subir or df.empty:
+            continue
+        desde = args.desde or df['dia'].min().date()
+        n = reemplazar_resumenes(supabase, tabla, desde, hasta + timedelta(days=1), filas)
+        print(f"☁️ {n} celdas reemplazadas en {TABLA_RESUMEN} ({desde} → {hasta})")
+
+
+if __name__ == "__main__":
+    main()
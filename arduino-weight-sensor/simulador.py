@@ -0,0 +1,257 @@
+"""
+Balanza simulada - Emite las tramas de los sketches sin hardware
+
+Genera las mismas líneas que los sketches (`OBJ:x;ACT:y;DIF:z`, el JSON
+de arduino_code.ino y `HEARTBEAT`, o las tramas del modo binario) a la tasa que se pida, por un par
+pty (Linux/Mac) o por `serial_for_url('loop://')`. También puede grabar
+una sesión real de una balanza y reproducirla después.
+
+Uso:
+    python simulador.py --formato json --tasa 50
+        → imprime el puerto, ej. /dev/pts/5; luego:
+          python arduino_bridge.py --puertos /dev/pts/5
+    python simulador.py --capturar COM3 sesion.log      (graba una balanza real)
+    python simulador.py --reproducir sesion.log --velocidad 4
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import serial
+
+from protocolo import TIPO_CALIBRACION, TIPO_MUESTRA, empaquetar_binaria
+
+FORMATOS = ('obj', 'json', 'mixto', 'binario')
+
+# Calibración de sketch_pesa_intnuev.ino (modo binario)
+ESCALA = 98500.0
+OFFSET = -91830
+
+
+class BalanzaSimulada:
+    """Genera tramas con un ciclo de carga: vacía → cargando → estable → retiro"""
+
+    def __init__(self, escribir, formato='obj', tasa_hz=2.0, heartbeat_s=2.0,
+                 objetivo=1.2, ruido_kg=0.0005, ciclo_s=6.0):
+        self.escribir = escribir  # escribir(bytes)
+        self.formato = formato
+        self.tasa_hz = tasa_hz
+        self.heartbeat_s = heartbeat_s
+        self.objetivo = objetivo
+        self.ruido_kg = ruido_kg
+        self.ciclo_s = ciclo_s
+
+        self.enviadas = 0
+        self._detener = threading.Event()
+        self._inicio = time.monotonic()
+        self._seq_binaria = 0
+        self._ventana = deque(maxlen=10)  # Media móvil del sketch en modo binario
+
+    def peso(self, t: float) -> float:
+        """Perfil de un saco: vacío 20%, subida 20%, estable 50%, retiro 10% del ciclo"""
+        fase = (t % self.ciclo_s) / self.ciclo_s
+        if fase < 0.2:
+            base = 0.0
+        elif fase < 0.4:
+            x = (fase - 0.2) / 0.2
+            base = self.objetivo * (1 - math.cos(math.pi * x)) / 2 * (1 + 0.1 * math.sin(8 * math.pi * x))
+        elif fase < 0.9:
+            base = self.objetivo
+        else:
+            base = 0.0
+        return base + random.gauss(0, self.ruido_kg)
+
+    def trama_binaria(self, tipo: int, peso: float) -> bytes:
+        ms = int((time.monotonic() - self._inicio) * 1000)
+        self._seq_binaria += 1
+        if tipo == TIPO_CALIBRACION:
+            return empaquetar_binaria(tipo, self._seq_binaria - 1, ms, OFFSET, 0, ESCALA, self.objetivo)
+        crudo = round(peso * ESCALA + OFFSET)
+        self._ventana.append(crudo)
+        promedio = sum(self._ventana) // len(self._ventana)
+        return empaquetar_binaria(tipo, self._seq_binaria - 1, ms, crudo, promedio,
+                                  (promedio - OFFSET) / ESCALA, self.objetivo)
+
+    def latido(self) -> bytes:
+        if self.formato == 'binario':
+            return self.trama_binaria(TIPO_CALIBRACION, 0.0)
+        return b"HEARTBEAT\r\n"
+
+    def linea(self, seq: int, t: float) -> bytes:
+        peso = self.peso(t)
+        if self.formato == 'binario':
+            return self.trama_binaria(TIPO_MUESTRA, peso)
+        formato = self.formato if self.formato != 'mixto' else FORMATOS[seq % 2]
+        if formato == 'json':
+            return (json.dumps({
+                "peso": round(peso, 3),
+                "objetivo": self.objetivo,
+                "diferencia": round(peso - self.objetivo, 3),
+                "codigo_saco": f"SIM-{seq}",
+                "fabrica": "Simulada",
+                "timestamp": int(t * 1000),
+            }, separators=(',', ':')) + "\r\n").encode()
+        return f"OBJ:{self.objetivo:.3f};ACT:{peso:.3f};DIF:{peso - self.objetivo:.3f}\r\n".encode()
+
+    def procesar_comando(self, comando: bytes):
+        """Responde a OBJ:/TARE igual que sketch_pesa_intnuev.ino"""
+        comando = comando.strip()
+        if comando.startswith(b"OBJ:"):
+            try:
+                self.objetivo = float(comando[4:])
+            except ValueError:
+                return
+            self.escribir(f"Nuevo objetivo: {self.objetivo:.2f}\r\n".encode())
+        elif comando == b"TARE":
+            self.objetivo = 0.0
+            self.escribir(b"Tara realizada\r\n")
+
+    def correr(self, duracion=None, n_tramas=None, al_enviar=None):
+        """Emite tramas a `tasa_hz` hasta cumplir la duración o el número de tramas.
+
+        al_enviar(seq, instante_monotonic) permite medir latencia extremo a extremo.
+        """
+        self._detener.clear()
+        self.escribir(b"Arduino listo.\r\n")
+        inicio = self._inicio = time.monotonic()
+        periodo = 1.0 / self.tasa_hz
+        proximo_heartbeat = inicio + self.heartbeat_s
+        seq = 0
+        while not self._detener.is_set():
+            ahora = time.monotonic()
+            if duracion is not None and ahora - inicio >= duracion:
+                break
+            if n_tramas is not None and seq >= n_tramas:
+                break
+
+            if self.heartbeat_s and ahora >= proximo_heartbeat:
+                self.escribir(self.latido())
+                proximo_heartbeat += self.heartbeat_s
+
+            self.escribir(self.linea(seq, ahora - inicio))
+            if al_enviar:
+                al_enviar(seq, time.monotonic())
+            seq += 1
+            self.enviadas += 1
+
+            # Programación por plazo absoluto: no acumula deriva a tasas altas
+            espera = inicio + seq * periodo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+
+    def detener(self):
+        self._detener.set()
+
+
+def abrir_pty():
+    """Crea un par pty. Devuelve (fd_maestro, nombre_del_puerto_esclavo). Solo Linux/Mac."""
+    import pty
+    import tty
+    maestro, esclavo = pty.openpty()
+    tty.setraw(esclavo)  # Sin eco ni traducción de fin de línea, como un puerto real
+    return maestro, os.ttyname(esclavo)
+
+
+def escuchar_comandos(maestro: int, balanza: BalanzaSimulada):
+    """Hilo que lee los comandos que el host escribe en el pty"""
+    def leer():
+        buffer = b""
+        while True:
+            try:
+                datos = os.read(maestro, 256)
+            except OSError:
+                return
+            if not datos:
+                return
+            buffer += datos
+            while b"\n" in buffer:
+                comando, buffer = buffer.split(b"\n", 1)
+                balanza.procesar_comando(comando)
+    threading.Thread(target=leer, name="simulador-comandos", daemon=True).start()
+
+
+def abrir_loop(timeout=1):
+    """Puerto `loop://` de pyserial: lo que se escribe se lee en el mismo objeto (multiplataforma)"""
+    return serial.serial_for_url('loop://', timeout=timeout)
+
+
+def capturar(puerto: str, ruta: str, baud=9600):
+    """Graba las líneas de una balanza real como 'segundos<TAB>línea'"""
+    ser = serial.serial_for_url(puerto, baud, timeout=1)
+    inicio = time.monotonic()
+    lineas = 0
+    print(f"🎙️ Grabando {puerto} en {ruta}. Ctrl+C para terminar.")
+    try:
+        with open(ruta, 'w', encoding='utf-8') as f:
+            while True:
+                linea = ser.readline()
+                if linea:
+                    texto = linea.decode('utf-8', errors='replace').rstrip('\r\n')
+                    f.write(f"{time.monotonic() - inicio:.4f}\t{texto}\n")
+                    lineas += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ser.close()
+    print(f"💾 {lineas} líneas grabadas")
+
+
+def reproducir(ruta: str, escribir, velocidad=1.0, al_enviar=None):
+    """Reproduce una sesión grabada respetando los tiempos (velocidad 0 = lo más rápido posible)"""
+    inicio = time.monotonic()
+    enviadas = 0
+    with open(ruta, encoding='utf-8') as f:
+        for seq, registro in enumerate(f):
+            t, _, texto = registro.rstrip('\n').partition('\t')
+            if velocidad > 0:
+                espera = inicio + float(t) / velocidad - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+            escribir((texto + "\r\n").encode('utf-8'))
+            if al_enviar:
+                al_enviar(seq, time.monotonic())
+            enviadas += 1
+    return enviadas
+
+
+def main():
+    args = argparse.ArgumentParser(description="Balanza simulada para probar el bridge sin hardware")
+    args.add_argument("--formato", choices=FORMATOS, default="obj")
+    args.add_argument("--tasa", type=float, default=2.0, help="Tramas por segundo")
+    args.add_argument("--duracion", type=float, help="Segundos (por defecto, hasta Ctrl+C)")
+    args.add_argument("--objetivo", type=float, default=1.2)
+    args.add_argument("--reproducir", metavar="ARCHIVO", help="Reproducir una sesión grabada")
+    args.add_argument("--velocidad", type=float, default=1.0, help="Multiplicador de velocidad al reproducir")
+    args.add_argument("--capturar", nargs=2, metavar=("PUERTO", "ARCHIVO"), help="Grabar una balanza real")
+    args = args.parse_args()
+
+    if args.capturar:
+        capturar(*args.capturar)
+        return
+
+    maestro, nombre = abrir_pty()
+    escribir = lambda datos: os.write(maestro, datos)
+    print(f"🧪 Balanza simulada en {nombre}")
+    print(f"   python arduino_bridge.py --puertos {nombre}\n")
+
+    try:
+        if args.reproducir:
+            n = reproducir(args.reproducir, escribir, args.velocidad)
+            print(f"▶️ {n} líneas reproducidas")
+        else:
+            balanza = BalanzaSimulada(escribir, args.formato, args.tasa, objetivo=args.objetivo)
+            escuchar_comandos(maestro, balanza)
+            balanza.correr(args.duracion)
+            print(f"📤 {balanza.enviadas} tramas enviadas")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
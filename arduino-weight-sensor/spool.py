@@ -0,0 +1,300 @@
+"""
+Spool local (SQLite) - Registro de escritura anticipada para trabajar sin red
+
+Los scripts escriben primero aquí (una transacción local, sin red) y un
+hilo `ReplayerSpool` drena las filas pendientes hacia Supabase en lotes.
+Cada fila lleva una `clave_idempotencia` única, así que reenviar un lote
+después de un corte no duplica registros en la base de datos.
+
+Si Supabase rechaza un lote por su contenido (un CHECK, un tipo, una
+columna que no existe), `aislar_rechazo()` lo sube por mitades hasta dar
+con la fila rechazada. Esa fila pasa a la tabla `rechazadas` del spool
+para revisarla a mano, y ya no bloquea a las que vienen detrás.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+SPOOL_DB = 'spool_pesajes.db'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pendientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tabla TEXT NOT NULL,
+    clave TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    creado REAL NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_pendientes_tabla ON pendientes(tabla, id);
+CREATE TABLE IF NOT EXISTS rechazadas (
+    id INTEGER PRIMARY KEY,
+    tabla TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    creado REAL NOT NULL,
+    intentos INTEGER NOT NULL,
+    error TEXT,
+    rechazado REAL NOT NULL
+);
+"""
+
+# Códigos de Postgres/PostgREST de una fila que no entra por su contenido (datos, CHECK,
+# columnas, permisos): reintentar el mismo lote no sirve. Sin código = red o servidor caído.
+CODIGOS_RECHAZO = ('22', '23', '42', 'PGRST1', 'PGRST2')
+
+
+def es_rechazo(error: Exception) -> bool:
+    codigo = getattr(error, 'code', None)
+    return isinstance(codigo, str) and codigo.startswith(CODIGOS_RECHAZO)
+
+
+class SpoolLocal:
+    """Cola persistente de filas pendientes de subir a Supabase"""
+
+    def __init__(self, ruta=SPOOL_DB):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_ESQUEMA)
+
+    def agregar(self, tabla: str, registro: dict) -> str:
+        """Guarda una fila y devuelve su clave de idempotencia"""
+        return self.agregar_lote(tabla, [registro])[0]
+
+    def agregar_lote(self, tabla: str, registros: list) -> list:
+        """Guarda varias filas en una sola transacción"""
+        claves = []
+        filas = []
+        ahora = time.time()
+        for registro in registros:
+            clave = registro.get('clave_idempotencia') or str(uuid.uuid4())
+            registro = dict(registro, clave_idempotencia=clave)
+            claves.append(clave)
+            filas.append((tabla, clave, json.dumps(registro, default=str), ahora))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pendientes (tabla, clave, payload, creado) VALUES (?, ?, ?, ?)",
+                filas,
+            )
+        return claves
+
+    def tablas_pendientes(self) -> list:
+        with self._lock:
+            return [t for (t,) in self._conn.execute("SELECT DISTINCT tabla FROM pendientes")]
+
+    def leer_pendientes(self, tabla: str, limite=200, con_creado=False, despues_de=0) -> list:
+        """Devuelve [(id, registro)] en orden de llegada ([(id, registro, creado)] con con_creado)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, payload, creado FROM pendientes WHERE tabla = ? AND id > ? ORDER BY id LIMIT ?",
+                (tabla, despues_de, limite),
+            )
+            if con_creado:
+                return [(id_, json.loads(payload), creado) for id_, payload, creado in cursor]
+            return [(id_, json.loads(payload)) for id_, payload, _ in cursor]
+
+    def confirmar(self, ids: list):
+        """Borra las filas que ya llegaron a Supabase"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM pendientes WHERE id = ?", [(i,) for i in ids])
+
+    def marcar_fallo(self, ids: list):
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE pendientes SET intentos = intentos + 1 WHERE id = ?", [(i,) for i in ids])
+
+    def rechazar(self, id_: int, error: str):
+        """Pasa una fila que Supabase no acepta a la tabla rechazadas"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rechazadas (id, tabla, clave, payload, creado, intentos, error, rechazado) "
+                "SELECT id, tabla, clave, payload, creado, intentos, ?, ? FROM pendientes WHERE id = ?",
+                (error, time.time(), id_),
+            )
+            self._conn.execute("DELETE FROM pendientes WHERE id = ?", (id_,))
+
+    def contar(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pendientes").fetchone()[0]
+
+    def contar_rechazadas(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rechazadas").fetchone()[0]
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+def aislar_rechazo(spool: SpoolLocal, tabla: str, pendientes: list, error: Exception):
+    """Generador que saca del camino la fila rechazada de un lote, probando por mitades.
+
+    `pendientes` es el lote rechazado ([(id, registro, ...)] de leer_pendientes).
+    Produce las listas de registros a subir y recibe con send() la excepción
+    de cada subida (None si entró); así sirve igual para un cliente síncrono
+    o asyncio. Lo que entra se confirma. La fila rechazada pasa a
+    `rechazadas` solo si la que le sigue sí entra: si también se rechaza, el
+    problema no es de una fila (permisos, esquema) y se relanza el error sin
+    mover nada. Devuelve cuántas filas subió.
+    """
+    subidas = 0
+    while True:
+        if len(pendientes) == 1:
+            fallo = yield [pendientes[0][1]]  # La sospechosa sola
+            if fallo is None:
+                spool.confirmar([pendientes[0][0]])
+                return subidas + 1
+            if not es_rechazo(fallo):
+                raise fallo
+            error = fallo
+            break
+        mitad = len(pendientes) // 2
+        fallo = yield [p[1] for p in pendientes[:mitad]]
+        if fallo is None:
+            spool.confirmar([p[0] for p in pendientes[:mitad]])
+            subidas += mitad
+            pendientes = pendientes[mitad:]
+        elif es_rechazo(fallo):
+            error, pendientes = fallo, pendientes[:mitad]
+        else:
+            raise fallo
+
+    id_ = pendientes[0][0]
+    siguiente = spool.leer_pendientes(tabla, 1, despues_de=id_)
+    if not siguiente:
+        raise error  # Nada detrás para comparar (ni que bloquear): se reintenta en la próxima vuelta
+    fallo = yield [siguiente[0][1]]
+    if fallo is not None:
+        raise error if es_rechazo(fallo) else fallo
+    spool.confirmar([siguiente[0][0]])
+    spool.rechazar(id_, str(error))
+    print(f"🚫 Supabase rechazó una fila de {tabla}, pasa a 'rechazadas' del spool: {error}")
+    return subidas + 1
+
+
+class ReplayerSpool:
+    """Hilo que drena el spool hacia Supabase con upserts idempotentes"""
+
+    def __init__(self, spool: SpoolLocal, supabase, tamano_lote=200, intervalo=2.0, espera_max=60.0,
+                 metricas=None):
+        self.spool = spool
+        self.supabase = supabase
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.espera_max = espera_max
+
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+        self.subidos = 0
+        self.errores = 0
+        self.ultimo_error = None
+        self.rechazadas = 0
+
+        self._h_insert = self._h_spool = None
+        if metricas:
+            self._h_insert = metricas.histograma('insert_http', 'Upsert de un lote en Supabase')
+            self._h_spool = metricas.histograma('espera_spool', 'Fila guardada en el spool → confirmada por Supabase')
+            metricas.indicador('filas_subidas', lambda: self.subidos, 'Filas confirmadas por Supabase')
+            metricas.indicador('errores_supabase', lambda: self.errores, 'Drenados del spool fallidos')
+            metricas.indicador('filas_en_spool', spool.contar, 'Filas guardadas localmente sin subir')
+            metricas.indicador('filas_rechazadas', lambda: self.rechazadas,
+                               'Filas que Supabase no aceptó, apartadas en el spool')
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._trabajar, name="replayer-spool", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=10.0):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    def despertar(self):
+        """Pide un drenado inmediato (por ejemplo, justo después de guardar un saco)"""
+        self._despertar.set()
+
+    def _subir(self, tabla: str, filas: list):
+        self.supabase.table(tabla).upsert(
+            filas, on_conflict='clave_idempotencia', ignore_duplicates=True
+        ).execute()
+
+    def drenar(self) -> int:
+        """Sube todo lo pendiente. Devuelve el número de filas subidas (lanza excepción si falla)"""
+        total = 0
+        for tabla in self.spool.tablas_pendientes():
+            while True:
+                pendientes = self.spool.leer_pendientes(tabla, self.tamano_lote, con_creado=True)
+                if not pendientes:
+                    break
+                ids = [id_ for id_, _, _ in pendientes]
+                try:
+                    inicio = time.perf_counter()
+                    self._subir(tabla, [registro for _, registro, _ in pendientes])
+                except Exception as e:
+                    self.spool.marcar_fallo(ids)
+                    if not es_rechazo(e):
+                        raise
+                    subidas = self._aislar(tabla, pendientes, e)
+                    total += subidas
+                    self.subidos += subidas
+                    continue
+                if self._h_insert:
+                    self._h_insert.observar(time.perf_counter() - inicio)
+                    ahora = time.time()
+                    self._h_spool.observar_varios([ahora - creado for _, _, creado in pendientes])
+                self.spool.confirmar(ids)
+                total += len(ids)
+                self.subidos += len(ids)
+                if len(pendientes) < self.tamano_lote:
+                    break
+        return total
+
+    def _aislar(self, tabla: str, pendientes: list, error: Exception) -> int:
+        """Sube un lote rechazado con aislar_rechazo()"""
+        pasos = aislar_rechazo(self.spool, tabla, pendientes, error)
+        fallo = None
+        try:
+            while True:
+                filas = pasos.send(fallo)
+                try:
+                    self._subir(tabla, filas)
+                    fallo = None
+                except Exception as e:
+                    fallo = e
+        except StopIteration as fin:
+            self.rechazadas = self.spool.contar_rechazadas()
+            return fin.value
+
+    def _trabajar(self):
+        espera = self.intervalo
+        while not self._detener.is_set():
+            try:
+                self.drenar()
+                espera = self.intervalo
+                self.ultimo_error = None
+            except Exception as e:
+                self.errores += 1
+                self.ultimo_error = str(e)
+                print(f"⚠️ Supabase no disponible, {self.spool.contar()} filas quedan en el spool: {e}")
+                espera = min(espera * 2, self.espera_max)
+
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+        # Último intento al cerrar
+        try:
+            self.drenar()
+        except Exception:
+            pass
@@ -0,0 +1,213 @@
+"""
+Supabase falso - Servidor local que imita el endpoint REST de PostgREST
+
+Acepta los POST que hace el cliente `supabase` (`/rest/v1/<tabla>`, con
+una fila o una lista), guarda las filas en memoria con `id` y
+`created_at` como lo haría la tabla, y anota la hora de llegada de cada
+una. Los GET entienden los filtros simples de PostgREST (`eq`, `gt`,
+`gte`, `lt`, `lte`, `order`, `limit`), suficiente para paginar. De las
+funciones (`/rest/v1/rpc/<nombre>`) implementa `sumar_resumen`. Sirve
+para pruebas de carga del bridge y de las exportaciones sin tocar la
+base de datos real.
+
+Uso:
+    python supabase_falso.py --puerto 54321 [--latencia-ms 80]
+    SUPABASE_URL=http://127.0.0.1:54321 python arduino_bridge.py
+"""
+
+import argparse
+import json
+import operator
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# El cliente valida que la clave tenga forma de JWT
+CLAVE_FALSA = "clave.de.prueba"
+
+_OPERADORES = {'eq': operator.eq, 'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+
+
+def _comparable(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return str(valor)
+
+
+def filtrar(filas: list, consulta: str) -> list:
+    """Aplica a una lista de filas los filtros de una query string de PostgREST"""
+    orden = None
+    limite = None
+    for clave, valor in parse_qsl(consulta):
+        if clave == 'order':
+            columna, _, direccion = valor.partition('.')
+            orden = (columna, direccion.startswith('desc'))
+        elif clave == 'limit':
+            limite = int(valor)
+        elif clave not in ('select', 'offset', 'on_conflict', 'columns'):
+            nombre, _, objetivo = valor.partition('.')
+            comparar = _OPERADORES.get(nombre)
+            if comparar:
+                objetivo = _comparable(objetivo)
+                filas = [f for f in filas if f.get(clave) is not None
+                         and comparar(_comparable(f[clave]), objetivo)]
+    if orden:
+        filas = sorted(filas, key=lambda f: _comparable(f.get(orden[0])), reverse=orden[1])
+    return filas[:limite] if limite is not None else filas
+
+
+class SupabaseFalso:
+    """Servidor HTTP en un hilo con las filas recibidas por tabla"""
+
+    def __init__(self, puerto=0, latencia_ms=0.0, tasa_error=0.0):
+        self.latencia_ms = latencia_ms
+        self.tasa_error = tasa_error  # Fracción de requests que responden 503
+        self.rechazar = None          # fila -> bool: el lote que la contenga responde 400 (CHECK violado)
+
+        self._lock = threading.Lock()
+        self.filas = {}      # tabla -> [fila]
+        self.llegadas = {}   # tabla -> [instante time.monotonic()]
+        self._claves = set()  # clave_idempotencia ya vistas (upsert con ignore_duplicates)
+        self._lotes = set()   # Lotes de sumar_resumen ya aplicados
+        self._celdas = {}     # Clave de resumen_pesajes -> fila
+        self.requests = 0
+        self.fallidos = 0
+
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como PostgREST
+
+            def log_message(self, *args):
+                pass
+
+            def _tabla(self):
+                ruta = self.path.split("?", 1)[0]
+                return ruta.rsplit("/", 1)[-1]
+
+            def _responder(self, codigo, cuerpo):
+                datos = json.dumps(cuerpo).encode()
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_POST(self):
+                largo = int(self.headers.get("Content-Length", 0))
+                cuerpo = json.loads(self.rfile.read(largo) or b"[]")
+                filas = cuerpo if isinstance(cuerpo, list) else [cuerpo]
+
+                if servidor.latencia_ms:
+                    time.sleep(servidor.latencia_ms / 1000)
+
+                with servidor._lock:
+                    servidor.requests += 1
+                    fallar = random.random() < servidor.tasa_error
+                    if fallar:
+                        servidor.fallidos += 1
+                if fallar:
+                    self._responder(503, {"message": "Servicio no disponible (simulado)"})
+                    return
+                if servidor.rechazar and any(servidor.rechazar(f) for f in filas):
+                    self._responder(400, {"code": "23514", "message": "Fila rechazada por un CHECK (simulado)"})
+                    return
+
+                if "/rpc/" in self.path:
+                    resultado = servidor.rpc(self._tabla(), cuerpo)
+                    self._responder(200 if resultado is not None else 404, resultado)
+                    return
+                self._responder(201, servidor.registrar(self._tabla(), filas))
+
+            def do_GET(self):
+                # postgrest-py manda un cuerpo "{}" también en los GET; hay que consumirlo (keep-alive)
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with servidor._lock:
+                    servidor.requests += 1
+                    filas = list(servidor.filas.get(self._tabla(), []))
+                self._responder(200, filtrar(filas, self.path.partition("?")[2]))
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), Manejador)
+        self._httpd.daemon_threads = True
+        self.puerto = self._httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.puerto}"
+        self._hilo = None
+
+    def registrar(self, tabla, filas) -> list:
+        """Guarda las filas nuevas (con id y created_at) y las devuelve"""
+        ahora = time.monotonic()
+        creado = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            existentes = self.filas.setdefault(tabla, [])
+            nuevas = []
+            for fila in filas:
+                clave = fila.get("clave_idempotencia")
+                if clave is not None:
+                    if clave in self._claves:
+                        continue
+                    self._claves.add(clave)
+                nuevas.append({"id": len(existentes) + len(nuevas) + 1, "created_at": creado, **fila})
+            existentes.extend(nuevas)
+            self.llegadas.setdefault(tabla, []).extend([ahora] * len(nuevas))
+        return nuevas
+
+    def rpc(self, nombre, argumentos):
+        """Imita las funciones SQL; None si no existe"""
+        if nombre != "sumar_resumen":
+            return None
+        columnas = ("tabla", "periodo", "inicio", "fabrica_id", "fabrica", "estado")
+        sumas = ("cantidad", "suma_diferencia", "fuera_rango", "kg_faltantes")
+        with self._lock:
+            if argumentos["lote"] in self._lotes:
+                return 0
+            self._lotes.add(argumentos["lote"])
+            for celda in argumentos["filas"]:
+                clave = tuple(celda.get(c) for c in columnas)
+                fila = self._celdas.get(clave)
+                if fila is None:
+                    fila = self._celdas[clave] = {**dict(zip(columnas, clave)), **{s: 0 for s in sumas}}
+                    self.filas.setdefault("resumen_pesajes", []).append(fila)
+                for s in sumas:
+                    fila[s] += celda[s]
+        return len(argumentos["filas"])
+
+    def total(self, tabla=None) -> int:
+        with self._lock:
+            if tabla:
+                return len(self.filas.get(tabla, []))
+            return sum(len(f) for f in self.filas.values())
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, name="supabase-falso", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    args = argparse.ArgumentParser(description="Servidor REST falso de Supabase para pruebas")
+    args.add_argument("--puerto", type=int, default=54321)
+    args.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia artificial por request")
+    args.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de requests que fallan (0-1)")
+    args = args.parse_args()
+
+    servidor = SupabaseFalso(args.puerto, args.latencia_ms, args.tasa_error).iniciar()
+    print(f"🧪 Supabase falso en {servidor.url} (clave: {CLAVE_FALSA})")
+    print("Presiona Ctrl+C para detener.\n")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"📥 Requests: {servidor.requests} | Filas: {servidor.total()} | Fallidos: {servidor.fallidos}")
+    except KeyboardInterrupt:
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,28 @@ CREATE TABLE IF NOT EXISTS pesajes_tiempo_real (
   fabrica VARCHAR(100) NOT NULL,
   timestamp TIMESTAMPTZ DEFAULT NOW(),
   estado VARCHAR(20) CHECK (estado IN ('OK', 'FUERA_RANGO')),
+  clave_idempotencia UUID UNIQUE,
+  estacion VARCHAR(50),
+  peso_min DECIMAL(10, 3),
+  peso_max DECIMAL(10, 3),
+  muestras INTEGER,
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Clave de idempotencia del spool local (para tablas creadas antes de este cambio)
+ALTER TABLE pesajes_tiempo_real ADD COLUMN IF NOT EXISTS clave_idempotencia UUID UNIQUE;
+-- Balanza que tomó la lectura (modo multi-balanza del bridge)
+ALTER TABLE pesajes_tiempo_real ADD COLUMN IF NOT EXISTS estacion VARCHAR(50);
+-- Filas agregadas por ventana del reductor del bridge (NULL en lecturas sueltas)
+ALTER TABLE pesajes_tiempo_real ADD COLUMN IF NOT EXISTS peso_min DECIMAL(10, 3);
+ALTER TABLE pesajes_tiempo_real ADD COLUMN IF NOT EXISTS peso_max DECIMAL(10, 3);
+ALTER TABLE pesajes_tiempo_real ADD COLUMN IF NOT EXISTS muestras INTEGER;
+
 -- Índices para mejorar rendimiento
 CREATE INDEX idx_pesajes_timestamp ON pesajes_tiempo_real(timestamp DESC);
 CREATE INDEX idx_pesajes_codigo ON pesajes_tiempo_real(codigo_saco);
 CREATE INDEX idx_pesajes_fabrica ON pesajes_tiempo_real(fabrica);
+CREATE INDEX IF NOT EXISTS idx_pesajes_estacion ON pesajes_tiempo_real(estacion, timestamp DESC);
 
 -- Habilitar Row Level Security (RLS)
 ALTER TABLE pesajes_tiempo_real ENABLE ROW LEVEL SECURITY;
@@ -40,3 +55,6 @@ COMMENT ON COLUMN pesajes_tiempo_real.peso_objetivo IS 'Peso objetivo en kg';
 COMMENT ON COLUMN pesajes_tiempo_real.diferencia IS 'Diferencia entre actual y objetivo';
 COMMENT ON COLUMN pesajes_tiempo_real.codigo_saco IS 'Código del saco pesado';
 COMMENT ON COLUMN pesajes_tiempo_real.estado IS 'OK si está dentro de tolerancia, FUERA_RANGO si no';
+COMMENT ON COLUMN pesajes_tiempo_real.clave_idempotencia IS 'Clave única generada por el spool local; evita duplicados al reenviar lotes';
+COMMENT ON COLUMN pesajes_tiempo_real.estacion IS 'Identificador de la balanza/línea que envió la lectura';
+COMMENT ON COLUMN pesajes_tiempo_real.muestras IS 'Lecturas agregadas en la fila (modo ventana); peso_actual es la media';
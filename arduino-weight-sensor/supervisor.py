@@ -0,0 +1,301 @@
+"""
+Supervisor de conexión serial - Detecta balanzas caídas o mudas y las reconecta
+
+El sketch manda `HEARTBEAT` (o la trama binaria de calibración) cada 2 s y una lectura cada 500 ms. Si pasa
+`plazo` segundos sin ninguna trama (cable flojo, Arduino colgado, puerto
+que Windows dejó abierto pero muerto) o el lector serial termina con un
+error, el supervisor cierra el puerto y lo vuelve a abrir con esperas
+crecientes (1 s, 2 s, 4 s... hasta `espera_max`).
+
+Al reconectar, el Arduino se reinicia y pierde el objetivo: el último
+`OBJ:` enviado se repite apenas llega la primera trama.
+
+Cuenta caídas, reconexiones y segundos sin conexión, de modo que la
+disponibilidad de cada balanza se puede ver en las métricas
+(`conexion_<balanza>_disponibilidad`, ...).
+"""
+
+import re
+import threading
+import time
+
+import serial
+
+from lector_serial import LectorSerial
+from protocolo import es_latido
+
+_MANUAL = "reconexión manual"
+
+
+class SupervisorConexion:
+    """Dueño del puerto y del LectorSerial de una balanza; los reemplaza cuando la conexión se cae"""
+
+    def __init__(self, puerto: str, baudios: int, cola, parsear=None, nombre: str = None, plazo=6.0,
+                 revision=0.5, espera_min=1.0, espera_max=30.0, abrir=None, al_conectar=None,
+                 metricas=None, separar=None):
+        # abrir() -> serial.Serial (por defecto el puerto con timeout=1); al_conectar(supervisor)
+        # se llama desde el hilo del supervisor cada vez que el puerto queda abierto;
+        # separar se pasa al lector (ParserBinario.separar en modo binario)
+        self.puerto = puerto
+        self.baudios = baudios
+        self.cola = cola
+        self.parsear = parsear
+        self.separar = separar
+        self.nombre = nombre or puerto
+        self.plazo = plazo
+        self.revision = revision
+        self.espera_min = espera_min
+        self.espera_max = espera_max
+        self._abrir = abrir or (lambda: serial.Serial(puerto, baudios, timeout=1))
+        self.al_conectar = al_conectar
+        self.metricas = metricas
+
+        self.ser = None
+        self.lector = None
+        self._lock = threading.Lock()        # Escrituras al puerto vs. cierre
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self._forzar = False
+        self._hilo = None
+        self._espera = espera_min
+
+        self.objetivo = None                 # Último OBJ: pedido; se repite al reconectar
+        self._objetivo_pendiente = False
+
+        self.conectado = False
+        self.conectado_desde = None
+        self._inicio = time.monotonic()
+        self.caido_desde = self._inicio      # Hasta la primera conexión también cuenta como caído
+        self.ultima_trama = None
+        self.ultimo_latido = None
+        self.caidas = 0
+        self.reconexiones = 0
+        self.aperturas_fallidas = 0
+        self._segundos_caido = 0.0
+        self.error = None
+        self._lineas_previas = 0
+        self._descartadas_previas = 0
+
+        if metricas:
+            self._registrar_indicadores(metricas)
+
+    # -------------------- Ciclo de vida --------------------
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return self
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._supervisar, name=f"supervisor-{self.nombre}", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self, timeout=3.0):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+        self._cerrar()
+
+    def reconectar(self):
+        """Fuerza cerrar y reabrir el puerto (botón "Conectar"); desconectado, solo reintenta ya"""
+        self._forzar = self.conectado
+        self._espera = self.espera_min
+        self._despertar.set()
+
+    def esperar_conexion(self, timeout: float) -> bool:
+        limite = time.monotonic() + timeout
+        while not self.conectado and time.monotonic() < limite:
+            time.sleep(0.05)
+        return self.conectado
+
+    # -------------------- Comandos --------------------
+
+    def enviar(self, comando: str) -> bool:
+        """Escribe un comando; False si el puerto no está disponible (no lanza)"""
+        if comando == 'TARE':
+            self.objetivo = None  # El sketch pone el objetivo en 0 al hacer tara
+            self._objetivo_pendiente = False
+        with self._lock:
+            if not (self.conectado and self.ser):
+                return False
+            try:
+                self.ser.write((comando + '\n').encode())
+                return True
+            except (serial.SerialException, OSError) as e:
+                self.error = e
+                self._despertar.set()  # Que el supervisor lo revise ya
+                return False
+
+    def enviar_objetivo(self, kg: float) -> bool:
+        """Envía OBJ: y lo recuerda; si no se pudo, se envía al reconectar"""
+        self.objetivo = kg
+        enviado = self.enviar(f"OBJ:{kg:.3f}")
+        self._objetivo_pendiente = not enviado
+        return enviado
+
+    # -------------------- Estado --------------------
+
+    @property
+    def vivo(self) -> bool:
+        return bool(self._hilo and self._hilo.is_alive())
+
+    @property
+    def lineas(self) -> int:
+        return self._lineas_previas + (self.lector.lineas if self.lector else 0)
+
+    @property
+    def descartadas(self) -> int:
+        return self._descartadas_previas + (self.lector.descartadas if self.lector else 0)
+
+    @property
+    def segundos_caido(self) -> float:
+        """Total sin conexión desde que arrancó, incluida la caída en curso"""
+        actual = time.monotonic() - self.caido_desde if self.caido_desde is not None else 0.0
+        return self._segundos_caido + actual
+
+    @property
+    def disponibilidad(self) -> float:
+        total = time.monotonic() - self._inicio
+        return 1.0 - self.segundos_caido / total if total > 0 else 0.0
+
+    def edad_ultima_trama(self) -> float:
+        return time.monotonic() - self.ultima_trama if self.ultima_trama else float('nan')
+
+    def edad_ultimo_latido(self) -> float:
+        return time.monotonic() - self.ultimo_latido if self.ultimo_latido else float('nan')
+
+    def estadisticas(self) -> dict:
+        return {
+            'conectado': self.conectado,
+            'caidas': self.caidas,
+            'reconexiones': self.reconexiones,
+            'aperturas_fallidas': self.aperturas_fallidas,
+            'segundos_caido': round(self.segundos_caido, 1),
+            'disponibilidad': round(self.disponibilidad, 4),
+        }
+
+    def _registrar_indicadores(self, metricas):
+        base = 'conexion_' + re.sub(r'[^0-9a-zA-Z]+', '_', self.nombre).strip('_').lower()
+        metricas.indicador(f'{base}_conectada', lambda: int(self.conectado), f'{self.nombre}: 1 si el puerto está abierto')
+        metricas.indicador(f'{base}_caidas', lambda: self.caidas, f'{self.nombre}: conexiones perdidas')
+        metricas.indicador(f'{base}_reconexiones', lambda: self.reconexiones, f'{self.nombre}: reconexiones exitosas')
+        metricas.indicador(f'{base}_segundos_caido', lambda: self.segundos_caido, f'{self.nombre}: segundos sin conexión')
+        metricas.indicador(f'{base}_disponibilidad', lambda: self.disponibilidad, f'{self.nombre}: fracción del tiempo conectada')
+        metricas.indicador(f'{base}_edad_trama_segundos', self.edad_ultima_trama, f'{self.nombre}: segundos desde la última trama')
+        metricas.indicador(f'{base}_edad_latido_segundos', self.edad_ultimo_latido, f'{self.nombre}: segundos desde el último HEARTBEAT')
+
+    # -------------------- Supervisión --------------------
+
+    def _parsear(self, linea: bytes):
+        # Corre en el hilo del lector: solo anota cuándo llegó algo
+        ahora = time.monotonic()
+        if es_latido(linea):
+            self.ultimo_latido = ahora
+        trama = self.parsear(linea) if self.parsear else linea
+        if trama is not None:
+            self.ultima_trama = ahora
+        return trama
+
+    def _motivo_caida(self, ahora: float):
+        if self._forzar:
+            self._forzar = False
+            return _MANUAL
+        if not self.lector.vivo:
+            return f"error de lectura: {self.lector.error}"
+        if isinstance(self.error, (serial.SerialException, OSError)):
+            return f"error de escritura: {self.error}"
+        referencia = max(self.ultima_trama or 0.0, self.conectado_desde)
+        if ahora - referencia > self.plazo:
+            return f"sin tramas hace {ahora - referencia:.1f} s"
+        return None
+
+    def _supervisar(self):
+        while not self._detener.is_set():
+            if not self.conectado:
+                ser = self._intentar_abrir()
+                if ser is None:
+                    self._despertar.wait(self._espera)
+                    self._despertar.clear()
+                    self._espera = min(self._espera * 2, self.espera_max)
+                    continue
+                self._establecer(ser)
+            self._revisar(time.monotonic())
+            self._despertar.wait(self.revision)
+            self._despertar.clear()
+
+    def _revisar(self, ahora: float):
+        """Una pasada de vigilancia sobre una conexión abierta"""
+        motivo = self._motivo_caida(ahora)
+        if motivo:
+            self._desconectar(motivo)
+        elif self._objetivo_pendiente and self.ultima_trama and self.ultima_trama > self.conectado_desde:
+            # El Arduino ya arrancó (mandó algo): recuperar el objetivo que tenía
+            self._objetivo_pendiente = not self.enviar(f"OBJ:{self.objetivo:.3f}")
+
+    def _intentar_abrir(self):
+        """El puerto abierto, o None (puede bloquear: en el modo async corre en otro hilo)"""
+        try:
+            ser = self._abrir()
+            ser.reset_input_buffer()
+            return ser
+        except Exception as e:
+            self.aperturas_fallidas += 1
+            self.error = e
+            print(f"❌ [{self.nombre}] No se pudo abrir {self.puerto}: {e} (reintento en {self._espera:.0f} s)")
+            return None
+
+    def _crear_lector(self, ser):
+        return LectorSerial(ser, self.cola, self._parsear, metricas=self.metricas, separar=self.separar).iniciar()
+
+    def _establecer(self, ser):
+        ahora = time.monotonic()
+        with self._lock:
+            self.ser = ser
+            self.error = None
+            self.lector = self._crear_lector(ser)
+            self.conectado = True
+            self.conectado_desde = ahora
+        self._forzar = False  # Un "Conectar" de mientras estaba caído ya quedó atendido
+        caido = ahora - self.caido_desde
+        self._segundos_caido += caido
+        self.caido_desde = None
+        self._objetivo_pendiente = self.objetivo is not None
+        if self.caidas:
+            self.reconexiones += 1
+            print(f"✅ [{self.nombre}] Reconectado a {self.puerto} tras {caido:.1f} s sin conexión")
+        else:
+            print(f"✅ [{self.nombre}] Conectado a {self.puerto}")
+        if self.al_conectar:
+            try:
+                self.al_conectar(self)
+            except Exception as e:
+                print(f"⚠️ [{self.nombre}] Error en al_conectar: {e}")
+
+    def _desconectar(self, motivo: str):
+        # Si la conexión llegó a entregar tramas, la próxima vez se reintenta rápido
+        if self.ultima_trama and self.ultima_trama > self.conectado_desde:
+            self._espera = self.espera_min
+        self.caidas += 1
+        if motivo == _MANUAL:
+            self.caido_desde = time.monotonic()
+        else:
+            # La balanza dejó de servir con la última trama, no cuando se notó
+            self.caido_desde = max(self.ultima_trama or 0.0, self.conectado_desde)
+        print(f"⚠️ [{self.nombre}] Conexión caída ({motivo}); reabriendo {self.puerto}...")
+        self._cerrar()
+
+    def _cerrar(self):
+        with self._lock:
+            self.conectado = False
+            lector, ser = self.lector, self.ser
+            self.ser = None
+        if lector:
+            lector.detener()
+            self._lineas_previas += lector.lineas
+            self._descartadas_previas += lector.descartadas
+            self.lector = None
+        if ser:
+            try:
+                ser.close()
+            except Exception:
+                pass
@@ -0,0 +1,167 @@
+"""
+Tablero de pesos en memoria compartida - Última lectura de cada balanza entre procesos
+
+En el modo `--procesos` del bridge cada balanza se lee, filtra y reduce en
+su propio proceso. Para que el proceso principal (o una interfaz) vea el
+peso de todas sin colas ni pickle, cada proceso escribe su última lectura
+en un registro de ancho fijo. Los registros están dentro de un bloque
+`multiprocessing.shared_memory`, leído como arreglo estructurado de NumPy.
+
+Cada registro tiene un solo escritor y lo protege un seqlock. El contador
+`seq` queda impar mientras se escribe y par al terminar. El lector copia
+el registro y lo repite si `seq` cambió o estaba impar: nunca ve medio
+registro y nunca bloquea al escritor. Si un proceso muere a mitad de una
+escritura (`terminate()` al cerrar), su `seq` queda impar para siempre:
+pasado `plazo` el lector se queda con la última copia en vez de esperar.
+
+Uso (ver el tablero de un bridge que ya corre):
+    python tablero.py [--nombre pesos_bridge] [--intervalo 0.5]
+"""
+
+import argparse
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+TABLERO_NOMBRE = 'pesos_bridge'
+LARGO_ESTACION = 32
+
+REGISTRO = np.dtype([
+    ('seq', '<u8'),
+    ('instante', '<f8'),      # time.time() de la última lectura
+    ('peso', '<f8'),
+    ('objetivo', '<f8'),
+    ('diferencia', '<f8'),
+    ('cero', '<f8'),          # Cero y deriva del filtro (NaN sin filtro)
+    ('deriva', '<f8'),
+    ('lecturas', '<u8'),      # Tramas JSON procesadas
+    ('lineas', '<u8'),        # Líneas recibidas por el puerto
+    ('descartadas', '<u8'),
+    ('malformadas', '<u8'),
+    ('filas', '<u8'),         # Filas guardadas en el spool
+    ('caidas', '<u4'),
+    ('reconexiones', '<u4'),
+    ('pid', '<u4'),
+    ('conectado', 'u1'),
+    ('terminado', 'u1'),
+    ('estacion', f'S{LARGO_ESTACION}'),
+], align=True)
+
+
+class TableroPesos:
+    """Un registro de ancho fijo por estación sobre memoria compartida"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, dueno: bool):
+        self._shm = shm
+        self._dueno = dueno
+        self.nombre = shm.name
+        n = shm.size // REGISTRO.itemsize
+        self.registros = np.ndarray((n,), dtype=REGISTRO, buffer=shm.buf)
+        self._seq = self.registros['seq']
+        self._campos = {campo: self.registros[campo] for campo in REGISTRO.names}
+
+    @classmethod
+    def crear(cls, estaciones: list, nombre=TABLERO_NOMBRE):
+        """Crea el bloque (reemplaza uno que haya quedado de una corrida anterior)"""
+        tamano = max(len(estaciones), 1) * REGISTRO.itemsize
+        try:
+            shm = shared_memory.SharedMemory(nombre, create=True, size=tamano)
+        except FileExistsError:
+            viejo = shared_memory.SharedMemory(nombre)
+            viejo.close()
+            viejo.unlink()
+            shm = shared_memory.SharedMemory(nombre, create=True, size=tamano)
+        tablero = cls(shm, dueno=True)
+        tablero.registros[:] = np.zeros(1, dtype=REGISTRO)
+        for campo in ('peso', 'objetivo', 'diferencia', 'cero', 'deriva'):
+            tablero.registros[campo] = np.nan
+        # Cortar en bytes puede partir una letra con tilde: se recorta a un carácter completo
+        tablero.registros['estacion'] = [e.encode()[:LARGO_ESTACION].decode('utf-8', 'ignore').encode()
+                                         for e in estaciones]
+        return tablero
+
+    @classmethod
+    def adjuntar(cls, nombre=TABLERO_NOMBRE):
+        """Abre un tablero que creó otro proceso"""
+        try:
+            shm = shared_memory.SharedMemory(nombre, track=False)  # Python 3.13+
+        except TypeError:
+            shm = shared_memory.SharedMemory(nombre)
+        return cls(shm, dueno=False)
+
+    @property
+    def estaciones(self) -> list:
+        return [e.decode() for e in self.registros['estacion']]
+
+    # -------------------- Escritor (un proceso por registro) --------------------
+
+    def publicar(self, indice: int, **valores):
+        """Escribe varios campos del registro `indice` como una sola actualización.
+
+        Solo un hilo puede escribir cada registro: `seq[indice] += 1` no es
+        atómico y dos escritores a la vez pueden dejarlo impar para siempre.
+        """
+        seq = self._seq
+        seq[indice] += 1  # Impar: escribiendo
+        campos = self._campos
+        for campo, valor in valores.items():
+            campos[campo][indice] = valor
+        seq[indice] += 1
+
+    # -------------------- Lectores --------------------
+
+    def leer(self, indice: int, plazo=0.05) -> np.void:
+        """Copia consistente de un registro (la última copia si el escritor quedó a mitad más de `plazo` s)"""
+        seq = self._seq
+        limite = None
+        while True:
+            antes = seq[indice]
+            copia = self.registros[indice].copy()
+            if not antes & 1 and seq[indice] == antes:
+                return copia
+            if limite is None:
+                limite = time.monotonic() + plazo
+            elif time.monotonic() > limite:
+                return copia
+            time.sleep(0)  # Cede el núcleo al escritor
+
+    def leer_todo(self) -> np.ndarray:
+        """Copia consistente de todos los registros (solo se releen los que cambiaron en medio)"""
+        copia = self.registros.copy()
+        for indice in np.flatnonzero((copia['seq'] & 1) | (copia['seq'] != self._seq)):
+            copia[indice] = self.leer(indice)
+        return copia
+
+    def cerrar(self):
+        del self.registros, self._seq, self._campos  # Sin vistas vivas el bloque se puede cerrar
+        self._shm.close()
+        if self._dueno:
+            self._shm.unlink()
+
+
+def main():
+    args = argparse.ArgumentParser(description="Muestra el tablero de pesos de un bridge en modo --procesos")
+    args.add_argument("--nombre", default=TABLERO_NOMBRE)
+    args.add_argument("--intervalo", type=float, default=0.5)
+    args = args.parse_args()
+
+    tablero = TableroPesos.adjuntar(args.nombre)
+    try:
+        while True:
+            ahora = time.time()
+            for r in tablero.leer_todo():
+                edad = ahora - r['instante'] if r['instante'] else float('nan')
+                estado = "🏁" if r['terminado'] else ("✅" if r['conectado'] else "❌")
+                print(f"{estado} {r['estacion'].decode():<16} {r['peso']:>9.3f} kg | Obj: {r['objetivo']:.3f} | "
+                      f"Dif: {r['diferencia']:+.3f} | Hace {edad:.1f} s | Lecturas: {r['lecturas']}")
+            print()
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tablero.cerrar()
+
+
+if __name__ == "__main__":
+    main()
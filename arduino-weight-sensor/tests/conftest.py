@@ -0,0 +1,23 @@
+import pytest
+
+from spool import SpoolLocal
+from supabase_falso import SupabaseFalso
+
+
+@pytest.fixture
+def servidor():
+    servidor = SupabaseFalso().iniciar()
+    yield servidor
+    servidor.detener()
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = SpoolLocal(str(tmp_path / "spool.db"))
+    yield spool
+    spool.cerrar()
+
+
+def lecturas(n, desde=0):
+    """Filas de pesajes_tiempo_real con pesos 1.000, 1.001, ... para seguir el orden de llegada"""
+    return [{'peso_actual': 1.0 + i / 1000, 'estacion': 'Linea-1'} for i in range(desde, desde + n)]
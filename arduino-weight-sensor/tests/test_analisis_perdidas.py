@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analisis_perdidas import analizar, filas_perdidas, unidades_por_saco
+
+
+@pytest.fixture(autouse=True)
+def hora_utc(monkeypatch):
+    """El día de cada saco se toma en la hora local: se fija en UTC para el test"""
+    monkeypatch.setenv('TZ', 'UTC')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def sacos(filas: list) -> pd.DataFrame:
+    df = pd.DataFrame(filas, columns=['fecha_pesaje', 'fabrica_id', 'lote', 'peso_objetivo', 'peso_real', 'estado'])
+    df['fecha_pesaje'] = pd.to_datetime(df['fecha_pesaje']).dt.tz_localize('UTC')
+    df['fabrica_id'] = df['fabrica_id'].astype('Int64')
+    df['lote'] = df['lote'].astype('category')
+    df['estado'] = df['estado'].astype('category')
+    return df
+
+
+def test_unidades_por_lote():
+    lotes = pd.Series(['ATUN-5', 'PALM-3', 'OTRO-12', 'SIN', None])
+    np.testing.assert_array_equal(unidades_por_saco(lotes), [5, 3, 12, np.nan, np.nan])
+
+
+def test_agregados_por_dia_fabrica_y_lote():
+    df = sacos([
+        # Día 1, fábrica 1: una lata de menos (1 kg por lata) y un saco exacto
+        ('2025-11-20 12:00', 1, 'ATUN-5', 5.0, 4.0, 'FUERA_RANGO'),
+        ('2025-11-20 12:05', 1, 'ATUN-5', 5.0, 5.0, 'OK'),
+        # Un 1.5% de diferencia que una estación con tolerancia del 1% marcó fuera de rango:
+        # manda el estado guardado, no una tolerancia fija
+        ('2025-11-20 12:10', 1, 'PALM-3', 3.0, 2.955, 'FUERA_RANGO'),
+        # Un 4% de sobrepeso aceptado con tolerancia propia de la estación
+        ('2025-11-20 12:15', 2, 'PALM-3', 3.0, 3.12, 'OK'),
+        ('2025-11-21 12:00', 2, None, 2.0, 1.9, None),
+    ])
+
+    resultados = analizar(df)
+    dia_fabrica = resultados['dia_fabrica'].set_index(['dia', 'fabrica_id'])
+    f1 = dia_fabrica.loc[(pd.Timestamp('2025-11-20'), 1)]
+
+    assert f1['sacos'] == 3 and f1['fuera_rango'] == 2
+    assert f1['tasa_fuera_rango'] == pytest.approx(2 / 3)
+    assert f1['kg_faltantes'] == pytest.approx(1.045)
+    assert f1['unidades_esperadas'] == 13 and f1['unidades_faltantes'] == 1
+    assert f1['porcentaje_perdida'] == pytest.approx(100 / 13)
+    assert f1['diferencia_p50'] == pytest.approx(-0.045)
+
+    f2 = dia_fabrica.loc[(pd.Timestamp('2025-11-20'), 2)]
+    assert f2['fuera_rango'] == 0 and f2['kg_faltantes'] == 0 and f2['porcentaje_perdida'] == 0
+
+    sin_lote = dia_fabrica.loc[(pd.Timestamp('2025-11-21'), 2)]
+    assert sin_lote['fuera_rango'] == 0 and sin_lote['unidades_faltantes'] == 0  # Sin lote no se estiman latas
+
+    por_lote = resultados['dia_fabrica_lote'].set_index(['dia', 'fabrica_id', 'lote'])
+    assert por_lote.loc[(pd.Timestamp('2025-11-20'), 1, 'ATUN-5'), 'sacos'] == 2
+    assert por_lote.loc[(pd.Timestamp('2025-11-21'), 2, 'SIN-LOTE'), 'sacos'] == 1
+
+    filas = filas_perdidas(resultados['dia_fabrica'], valor_unidad=2.5)
+    assert filas[0] == {'fecha': '2025-11-20', 'fabrica_id': 1, 'cantidad_perdida': 1,
+                        'porcentaje_perdida': round(100 / 13, 4), 'valor_estimado': 2.5, 'tipo': 'PESAJE'}
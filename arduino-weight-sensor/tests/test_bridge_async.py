@@ -0,0 +1,59 @@
+import asyncio
+
+from bridge_async import SubidorAsync
+from supabase_falso import CLAVE_FALSA
+
+from .conftest import lecturas
+
+
+def subir_y_detener(servidor, spool, filas, timeout, **opciones):
+    async def correr():
+        subidor = await SubidorAsync(servidor.url, CLAVE_FALSA, spool=spool, intervalo_spool=3600,
+                                     **opciones).iniciar()
+        for fila in filas:
+            await subidor.poner(fila)
+        await asyncio.sleep(0.2)
+        await subidor.detener(timeout=timeout)
+        return subidor
+    return asyncio.run(correr())
+
+
+def test_lote_a_medio_armar_va_al_spool(servidor, spool):
+    # Lote grande y sin vencer: al detener, _juntar todavía lo tiene en la mano
+    subidor = subir_y_detener(servidor, spool, lecturas(30), timeout=0.3, tamano_lote=1000, intervalo_max=60)
+
+    assert servidor.total() == 0
+    assert spool.contar() == 30 and subidor.al_spool == 30
+
+
+def test_envios_que_siguen_reintentando_van_al_spool(servidor, spool):
+    servidor.tasa_error = 1.0
+    subidor = subir_y_detener(servidor, spool, lecturas(25), timeout=0.3, tamano_lote=10, intervalo_max=0.05,
+                              reintentos=50)
+
+    assert spool.contar() == 25 and subidor.al_spool == 25
+
+
+def test_sin_cortes_todo_se_sube(servidor, spool):
+    subidor = subir_y_detener(servidor, spool, lecturas(120), timeout=5, tamano_lote=50, intervalo_max=0.05)
+
+    assert servidor.total('pesajes_tiempo_real') == 120 and subidor.enviados == 120
+    assert spool.contar() == 0
+
+
+def test_spool_con_una_fila_rechazada_se_drena_igual(servidor, spool):
+    spool.agregar_lote('pesajes_tiempo_real', lecturas(60))
+    servidor.rechazar = lambda fila: fila['peso_actual'] == 1.03
+
+    async def correr():
+        subidor = await SubidorAsync(servidor.url, CLAVE_FALSA, spool=spool, intervalo_spool=0.05).iniciar()
+        for _ in range(100):
+            if spool.contar() == 0:
+                break
+            await asyncio.sleep(0.05)
+        await subidor.detener(timeout=1)
+        return subidor
+    subidor = asyncio.run(correr())
+
+    assert spool.contar() == 0 and spool.contar_rechazadas() == 1
+    assert servidor.total('pesajes_tiempo_real') == 59 and subidor.del_spool == 59
@@ -0,0 +1,68 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from cache_fabricas import CacheFabricas
+
+
+class TablaFabricas:
+    """Lo mínimo del query builder de supabase que usa la caché; select() espera a `liberar`"""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.liberar = threading.Event()
+        self.liberar.set()
+        self.consultas = 0
+
+    def table(self, _nombre):
+        return self
+
+    def select(self, _columnas):
+        return self
+
+    def eq(self, *_):
+        return self
+
+    def execute(self):
+        self.consultas += 1
+        self.liberar.wait(5)
+        return SimpleNamespace(data=list(self.filas))
+
+
+def test_ttl_vencido_no_bloquea_y_refresca_en_segundo_plano():
+    servidor = TablaFabricas([{"id": 1, "nombre": "Planta Norte"}])
+    cache = CacheFabricas(servidor, ttl=0.05)
+    cache.precargar()
+    time.sleep(0.1)
+
+    servidor.filas = [{"id": 1, "nombre": "Planta Norte"}, {"id": 2, "nombre": "Planta Sur"}]
+    servidor.liberar.clear()  # Red colgada
+    inicio = time.monotonic()
+    assert cache.resolver("planta  norte") == 1
+    assert cache.resolver("Planta Norte") == 1
+    assert time.monotonic() - inicio < 0.5
+    assert servidor.consultas == 2  # Un solo refresco en curso
+
+    servidor.liberar.set()
+    limite = time.monotonic() + 2
+    while cache._refrescando and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert cache.resolver("Planta Sur") == 2
+    assert cache.fallos == 0
+
+
+def test_refresco_fallido_conserva_lo_cargado():
+    servidor = TablaFabricas([{"id": 7, "nombre": "Planta Norte"}])
+    cache = CacheFabricas(servidor, ttl=0.01, reintento=60)
+    cache.precargar()
+    time.sleep(0.05)
+
+    def sin_red():
+        raise ConnectionError("sin red")
+    servidor.execute = sin_red
+    assert cache.resolver("Planta Norte") == 7
+    limite = time.monotonic() + 2
+    while cache._refrescando and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert not cache._vencida()  # Pospuesto `reintento` segundos
+    assert cache.resolver("Planta Norte") == 7
@@ -0,0 +1,81 @@
+import pytest
+
+from estabilidad import DetectorEstabilidad
+
+
+def alimentar(detector, pesos):
+    return [p for p in (detector.agregar(peso) for peso in pesos) if p is not None]
+
+
+def test_emite_una_vez_al_asentarse():
+    eventos = []
+    detector = DetectorEstabilidad(ventana=4, tolerancia_kg=0.002, al_estabilizar=eventos.append)
+
+    emitidos = alimentar(detector, [0.5, 1.1, 1.19, 1.201, 1.2, 1.199, 1.2, 1.201, 1.2, 1.2])
+
+    assert len(emitidos) == 1 and emitidos[0] == pytest.approx(1.2, abs=0.002)
+    assert eventos == emitidos
+    assert detector.estable and detector.peso_estable == pytest.approx(1.2, abs=0.002)
+
+
+def test_no_emite_con_la_ventana_incompleta_ni_oscilando():
+    detector = DetectorEstabilidad(ventana=4, tolerancia_kg=0.002)
+
+    assert alimentar(detector, [1.2, 1.2, 1.2]) == []
+    assert alimentar(detector, [1.25, 1.15, 1.25, 1.15, 1.25]) == []
+    assert not detector.estable
+
+
+def test_se_rearma_al_retirar_el_saco():
+    detector = DetectorEstabilidad(ventana=3, tolerancia_kg=0.002)
+
+    primero = alimentar(detector, [1.2] * 6)
+    vacio = alimentar(detector, [0.0] * 3)
+    segundo = alimentar(detector, [1.2] * 6)
+
+    assert len(primero) == 1 and vacio == [] and len(segundo) == 1
+
+
+def test_se_rearma_si_el_peso_cambia_sin_vaciar():
+    detector = DetectorEstabilidad(ventana=3, tolerancia_kg=0.002)
+
+    emitidos = alimentar(detector, [1.2] * 5 + [1.201] * 5 + [1.5] * 5)
+
+    # 1.201 está dentro de la tolerancia del asentamiento anterior; 1.5 es un peso nuevo
+    assert [round(p, 3) for p in emitidos] == [1.2, 1.5]
+
+
+def test_reiniciar_vacia_la_ventana():
+    detector = DetectorEstabilidad(ventana=3, tolerancia_kg=0.002)
+    alimentar(detector, [1.2] * 5)
+
+    detector.reiniciar()
+
+    assert not detector.estable
+    assert alimentar(detector, [1.2] * 2) == []
+    assert len(alimentar(detector, [1.2])) == 1  # Después de una tara vuelve a avisar
+
+
+def test_sumas_incrementales_sin_error_acumulado():
+    detector = DetectorEstabilidad(ventana=4, tolerancia_kg=0.002)
+    alimentar(detector, [(i * 7919 % 60_000) / 1000 for i in range(200_000)])  # 0-60 kg, sin asentarse
+
+    assert len(alimentar(detector, [0.75] * 4)) == 1
+    assert detector.peso_estable == pytest.approx(0.75, abs=1e-9)
+
+
+@pytest.mark.parametrize('ventana', [4, 7])
+def test_varianza_sin_deriva_en_un_turno_largo(ventana):
+    # Tolerancia fina y pesos de kilos: restar Σx² dejaba ~4e-5 kg de desvío fantasma tras 200 000 lecturas
+    detector = DetectorEstabilidad(ventana=ventana, tolerancia_kg=1e-5)
+    alimentar(detector, [(i * 7919 % 60_000) / 1000 for i in range(200_000)])
+
+    assert len(alimentar(detector, [25.0] * ventana)) == 1
+    assert detector._desviacion(detector.peso_estable) < 1e-6
+
+    ruido = [25.0 + (0.001 if i % 2 else -0.001) for i in range(ventana * 3)]
+    alimentar(detector, ruido)
+    ultimos = ruido[-ventana:]
+    media = sum(ultimos) / ventana
+    esperada = (sum((x - media) ** 2 for x in ultimos) / ventana) ** 0.5
+    assert detector._desviacion(media) == pytest.approx(esperada, rel=1e-6)
@@ -0,0 +1,58 @@
+import csv
+
+from supabase import create_client
+
+from exportar import cargar, exportar_csv, exportar_tabla
+from supabase_falso import CLAVE_FALSA
+
+ENCABEZADO = ['Fecha', 'Código Saco', 'Saco Identificado', 'Peso Base (kg)', 'Peso Objetivo (kg)',
+              'Peso Actual (kg)', 'Diferencia (kg)', 'Unidades Faltantes/Sobrantes', 'Tolerancia', 'Resultado']
+
+
+def sacos(n, desde=0):
+    return [{'codigo': f'S{i}', 'fabrica_id': 1 + i % 2, 'peso_objetivo': 1.2, 'peso_real': 1.19,
+             'diferencia': -0.01, 'estado': 'OK', 'fecha_pesaje': f'2025-11-20T{10 + i % 3}:00:00+00:00'}
+            for i in range(desde, desde + n)]
+
+
+def escribir_csv(directorio, filas, modo='w'):
+    ruta = directorio / 'registro_inventario_2025-11-20.csv'
+    nuevo = modo == 'w'
+    with open(ruta, modo, newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        if nuevo:
+            escritor.writerow(ENCABEZADO)
+        for fecha, codigo in filas:
+            escritor.writerow([fecha, codigo, 'Harina', 1.0, 1.2, 1.19, -0.01, 0, '±3%', 'OK'])
+
+
+def test_incremental_y_desde_cero_sin_repetidas(servidor, tmp_path):
+    cliente = create_client(servidor.url, CLAVE_FALSA)
+    cliente.table('sacos').insert(sacos(10)).execute()
+
+    assert exportar_tabla(cliente, 'sacos', str(tmp_path)) == 10
+    cliente.table('sacos').insert(sacos(5, desde=10)).execute()
+    assert exportar_tabla(cliente, 'sacos', str(tmp_path)) == 5
+    assert len(cargar('sacos', str(tmp_path))) == 15
+
+    assert exportar_tabla(cliente, 'sacos', str(tmp_path), desde_cero=True) == 15
+    df = cargar('sacos', str(tmp_path))
+    assert len(df) == 15 and df['id'].is_unique
+
+
+def test_csv_no_pierde_filas_del_mismo_segundo_que_la_marca(tmp_path):
+    registros = tmp_path / 'registros'
+    registros.mkdir()
+    escribir_csv(registros, [('2025-11-20 10:00:00', 'A'), ('2025-11-20 10:00:01', 'B')])
+    assert exportar_csv(str(registros), str(tmp_path)) == 2
+
+    # Otro saco en el mismo segundo que la marca, y uno después
+    escribir_csv(registros, [('2025-11-20 10:00:01', 'C'), ('2025-11-20 10:00:02', 'D')], modo='a')
+    assert exportar_csv(str(registros), str(tmp_path)) == 2
+    assert exportar_csv(str(registros), str(tmp_path)) == 0
+
+    df = cargar('registro_inventario', str(tmp_path))
+    assert sorted(df['codigo_saco']) == ['A', 'B', 'C', 'D']
+
+    assert exportar_csv(str(registros), str(tmp_path), desde_cero=True) == 4
+    assert len(cargar('registro_inventario', str(tmp_path))) == 4
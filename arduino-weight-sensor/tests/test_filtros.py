@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from filtros import FiltroBalanzas, FiltroEstaciones
+
+
+def en_bloques(filtro, valores, instantes, cortes):
+    """Procesa una serie (N, m) partida en las columnas `cortes` y une las salidas"""
+    bordes = [0, *cortes, valores.shape[1]]
+    return np.concatenate([filtro.procesar(valores[:, a:b], instantes[:, a:b])
+                           for a, b in zip(bordes, bordes[1:])], axis=1)
+
+
+def test_la_mediana_sigue_entre_bloques():
+    rng = np.random.default_rng(1)
+    valores = rng.normal(1.2, 0.01, (2, 40))
+    valores[0, [7, 8, 21]] = 9.0  # Picos sueltos, uno justo en el borde de un bloque
+    instantes = np.broadcast_to(np.arange(40.0), valores.shape)
+
+    entero = FiltroBalanzas(2, metodo='mediana', mediana=5, seguir_cero=False)
+    partido = FiltroBalanzas(2, metodo='mediana', mediana=5, seguir_cero=False)
+    esperado = entero.procesar(valores, instantes)
+    obtenido = en_bloques(partido, valores, instantes, [3, 8, 9, 22, 30])
+
+    np.testing.assert_allclose(obtenido, esperado)
+    assert obtenido[0].max() < 1.3  # Los picos no pasan
+
+
+def test_kalman_sigue_el_escalon_sin_arrastrarse():
+    rng = np.random.default_rng(2)
+    valores = np.vstack([rng.normal(0.0, 0.0005, 60), rng.normal(0.0, 0.0005, 60)])
+    valores[0, 30:] += 1.2  # Saco puesto en la primera balanza
+    instantes = np.arange(60.0)
+
+    filtro = FiltroBalanzas(2, metodo='kalman', mediana=1, seguir_cero=False)
+    salida = filtro.procesar(valores, instantes)
+
+    assert filtro.saltos.tolist() == [1, 0]
+    assert salida[0, 30] == pytest.approx(1.2, abs=0.002)  # Ya en la primera muestra del escalón
+    assert np.abs(salida[0, 31:] - 1.2).max() < 0.002
+    assert np.abs(salida[1]).max() < 0.002
+
+    ema = FiltroBalanzas(2, metodo='ema', alfa=0.2, mediana=1, seguir_cero=False)
+    assert ema.procesar(valores, instantes)[0, 30] < 0.5  # La EMA todavía va por la cuarta parte
+
+
+def test_seguimiento_de_cero_limitado_por_ritmo_y_maximo():
+    filtro = FiltroBalanzas(1, metodo='ninguno', banda_cero=0.002, ritmo_cero=0.0005, cero_max=0.2)
+    ceros = []
+    for t in range(5):
+        filtro.procesar([[0.0015]], [float(t)])
+        ceros.append(round(float(filtro.cero[0]), 6))
+    # Como mucho ritmo_cero kg por segundo, hasta alcanzar la lectura
+    assert ceros == [0.0005, 0.001, 0.0015, 0.0015, 0.0015]
+
+    # Con la balanza cargada el cero no se mueve
+    filtro.procesar([[1.2]], [5.0])
+    assert filtro.cero[0] == pytest.approx(0.0015)
+
+    acotado = FiltroBalanzas(1, metodo='ninguno', banda_cero=0.002, ritmo_cero=1.0, cero_max=0.001)
+    for t, lectura in enumerate([0.0015, 0.0025, 0.0025]):
+        acotado.procesar([[lectura]], [float(t)])
+    # Nunca más de cero_max respecto del cero inicial
+    assert acotado.cero[0] == pytest.approx(0.001)
+
+
+def test_deriva_estimada_en_una_rampa():
+    pendientes = np.array([0.01, -0.02])  # kg/h
+    filtro = FiltroBalanzas(2, metodo='ninguno')
+    for minuto in range(120):
+        instantes = minuto * 60.0 + np.arange(60.0)
+        filtro.procesar(pendientes[:, None] * instantes / 3600.0, instantes)
+
+    np.testing.assert_allclose(filtro.deriva_kg_h, pendientes, rtol=1e-3)
+
+    # Cargada, el cero se extrapola con la deriva y el neto queda en el peso del saco
+    instantes = 7200.0 + np.arange(300.0)
+    neto = filtro.procesar(1.2 + pendientes[:, None] * instantes / 3600.0, instantes)
+    assert np.abs(neto - 1.2).max() < 0.0002
+
+
+def test_filas_con_distinta_cantidad_de_lecturas():
+    rng = np.random.default_rng(3)
+    series = [np.r_[rng.normal(0.0, 0.0005, 40), rng.normal(1.2, 0.0005, 40)],
+              rng.normal(0.0008, 0.0005, 50)]
+    tiempos = [np.arange(80.0) * 0.5, np.arange(50.0) * 0.8]
+
+    juntas = FiltroBalanzas(2)
+    salidas = [[], []]
+    trozos = [[], []]
+    posiciones = [0, 0]
+    while any(p < len(s) for p, s in zip(posiciones, series)):
+        cuentas = rng.integers(0, 6, size=2)
+        valores = np.full((2, cuentas.max()), np.nan)
+        instantes = np.full((2, cuentas.max()), np.nan)
+        for i, (serie, tiempo) in enumerate(zip(series, tiempos)):
+            trozo = slice(posiciones[i], min(posiciones[i] + cuentas[i], len(serie)))
+            n = trozo.stop - trozo.start
+            valores[i, :n], instantes[i, :n] = serie[trozo], tiempo[trozo]
+            posiciones[i] = trozo.stop
+            if n:
+                trozos[i].append(trozo)
+        salida = juntas.procesar(valores, instantes)
+        for i in range(2):
+            validos = ~np.isnan(valores[i])
+            assert np.isnan(salida[i, ~validos]).all()
+            salidas[i].append(salida[i, validos])
+
+    # Cada balanza queda igual que filtrada sola: el relleno NaN no toca su estado
+    for i, (serie, tiempo) in enumerate(zip(series, tiempos)):
+        sola = FiltroBalanzas(1)
+        esperado = np.concatenate([sola.procesar(serie[t], tiempo[t])[0] for t in trozos[i]])
+        np.testing.assert_allclose(np.concatenate(salidas[i]), esperado, atol=1e-9)
+        assert juntas.saltos[i] == sola.saltos[0]
+        assert juntas.cero[i] == pytest.approx(sola.cero[0])
+
+
+def test_filtro_estaciones_arma_el_bloque_de_un_lote_mezclado():
+    filtro = FiltroEstaciones(['A', 'B'], metodo='ninguno', seguir_cero=False)
+    lecturas = [(0.0, 'A', {'peso': 1.19, 'objetivo': 1.2}),
+                (0.1, 'A', {'peso': 1.21, 'objetivo': 1.2}),
+                (0.2, 'B', {'peso': 0.5, 'objetivo': 0.5}),
+                (0.3, 'A', {'peso': 1.2, 'objetivo': 1.2})]
+
+    filtro.aplicar(lecturas)
+
+    assert [d['peso'] for _, _, d in lecturas] == [1.19, 1.21, 0.5, 1.2]
+    assert [d['peso_crudo'] for _, _, d in lecturas] == [1.19, 1.21, 0.5, 1.2]
+    assert [d['diferencia'] for _, _, d in lecturas] == [-0.01, 0.01, 0.0, 0.0]
+    assert set(filtro.estadisticas()) == {'A', 'B'}
@@ -0,0 +1,93 @@
+import csv
+from datetime import datetime, timedelta
+
+from supabase import create_client
+
+from importar_csv import Avance, Importador, detectar_codificacion
+from supabase_falso import CLAVE_FALSA
+
+ENCABEZADO = ["Fecha", "Código Saco", "Saco Identificado", "Peso Base (kg)", "Peso Objetivo (kg)",
+              "Peso Actual (kg)", "Diferencia (kg)", "Unidades Faltantes/Sobrantes", "Tolerancia", "Resultado"]
+
+
+def escribir_csv(ruta, filas, codificacion):
+    with open(ruta, "w", newline="", encoding=codificacion) as f:
+        escritor = csv.writer(f)
+        escritor.writerow(ENCABEZADO)
+        escritor.writerows(filas)
+    return str(ruta)
+
+
+def fila(fecha, codigo, producto="Saco de 5 latas de Atún", real="5.010"):
+    return [fecha, codigo, producto, "1.000", "5.000", real, "0.010", "0", "±3%", "ACEPTADO"]
+
+
+def importar(servidor, tmp_path, archivos, **opciones):
+    importador = Importador(lambda: create_client(servidor.url, CLAVE_FALSA), hilos=2,
+                            avance=Avance(str(tmp_path / "avance.json")), **opciones)
+    return importador.importar([(ruta, ruta) for ruta in archivos])
+
+
+def test_registro_antiguo_en_cp1252(servidor, tmp_path):
+    ruta = escribir_csv(tmp_path / "registro_inventario.csv",
+                        [fila("2025-11-20 14:30:05", "SACO-001"), fila("2025-11-20 14:31:10", "SACO-002")],
+                        "cp1252")
+
+    assert detectar_codificacion(ruta) == "cp1252"
+    resumen = importar(servidor, tmp_path, [ruta])
+
+    assert resumen["subidas"] == 2 and resumen["invalidas"] == 0
+    assert {s["lote"] for s in servidor.filas["sacos"]} == {"ATUN-5"}  # "Atún" se leyó bien
+
+
+def test_utf8_con_bom(servidor, tmp_path):
+    ruta = escribir_csv(tmp_path / "excel.csv", [fila("2025-11-20 14:30:05", "SACO-001")], "utf-8-sig")
+
+    assert detectar_codificacion(ruta) == "utf-8-sig"
+    assert importar(servidor, tmp_path, [ruta])["subidas"] == 1
+    assert servidor.filas["sacos"][0]["codigo"] == "SACO-001"
+
+
+def test_codificacion_forzada(servidor, tmp_path):
+    ruta = escribir_csv(tmp_path / "latin.csv", [fila("2025-11-20 14:30:05", "SACO-001")], "latin-1")
+
+    resumen = importar(servidor, tmp_path, [ruta], codificacion="latin-1")
+
+    assert resumen["subidas"] == 1
+    assert servidor.filas["sacos"][0]["lote"] == "ATUN-5"
+
+
+def en_base(servidor, codigo, fecha):
+    servidor.registrar("sacos", [{"codigo": codigo, "fecha_pesaje": fecha.astimezone().isoformat()}])
+
+
+def test_saco_ya_subido_con_hora_del_servidor(servidor, tmp_path):
+    # La estación insertaba (fecha_pesaje = NOW()) y después anotaba la hora en el CSV
+    csv_hora = datetime(2025, 11, 20, 14, 30, 5)
+    en_base(servidor, "SACO-001", csv_hora - timedelta(seconds=2, microseconds=400000))
+    en_base(servidor, "SACO-002", csv_hora - timedelta(seconds=40))  # Mismo código reutilizado, otro saco
+    ruta = escribir_csv(tmp_path / "registro_inventario.csv",
+                        [fila("2025-11-20 14:30:05", "SACO-001"), fila("2025-11-20 14:30:05", "SACO-002")],
+                        "utf-8")
+
+    resumen = importar(servidor, tmp_path, [ruta])
+
+    assert resumen["duplicadas"] == 1 and resumen["subidas"] == 1
+    assert [s["codigo"] for s in servidor.filas["sacos"][2:]] == ["SACO-002"]
+
+
+def test_saco_ya_subido_el_dia_anterior(servidor, tmp_path):
+    en_base(servidor, "SACO-001", datetime(2025, 11, 20, 23, 59, 58))
+    ruta = escribir_csv(tmp_path / "registro.csv", [fila("2025-11-21 00:00:01", "SACO-001")], "utf-8")
+
+    assert importar(servidor, tmp_path, [ruta])["duplicadas"] == 1
+
+
+def test_repetido_entre_archivos_y_reimportacion(servidor, tmp_path):
+    uno = escribir_csv(tmp_path / "uno.csv", [fila("2025-11-20 14:30:05", "SACO-001")], "utf-8")
+    dos = escribir_csv(tmp_path / "dos.csv", [fila("2025-11-20 14:30:06", "SACO-001")], "utf-8")
+
+    assert importar(servidor, tmp_path, [uno, dos])["duplicadas"] == 1
+    (tmp_path / "avance.json").unlink()  # Desde cero: los sacos ya están en la base
+    assert importar(servidor, tmp_path, [uno, dos])["subidas"] == 0
+    assert servidor.total("sacos") == 1
@@ -0,0 +1,37 @@
+import json
+import math
+
+from metricas import Metricas
+
+
+def rechazar(constante):
+    raise AssertionError(f"{constante} no es JSON estricto")
+
+
+def test_json_estricto_con_indicadores_sin_valor(tmp_path):
+    metricas = Metricas()
+    metricas.indicador('edad_trama_segundos', lambda: float('nan'))
+    metricas.indicador('falla', lambda: 1 / 0)
+    metricas.indicador('filas', lambda: 12)
+    metricas.histograma('parseo')  # Sin observaciones: sin percentiles
+
+    ruta = str(tmp_path / 'metricas.json')
+    metricas.volcar(ruta)
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f, parse_constant=rechazar)
+
+    assert datos['indicadores'] == {'edad_trama_segundos': None, 'falla': None, 'filas': 12.0}
+    assert datos['latencias_ms']['parseo']['p50'] is None
+    # Prometheus sí entiende NaN
+    assert f"bridge_edad_trama_segundos {math.nan}" in metricas.exposicion()
+
+
+def test_percentiles():
+    metricas = Metricas()
+    h = metricas.histograma('insert_http')
+    h.observar_varios([0.010] * 90 + [0.200] * 10)
+
+    latencias = metricas.resumen()['latencias_ms']['insert_http']
+
+    assert latencias['cuenta'] == 100
+    assert latencias['p50'] <= 10.0 + 1e-9 and latencias['p99'] > 100
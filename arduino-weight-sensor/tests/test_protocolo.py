@@ -0,0 +1,159 @@
+import queue
+import time
+
+import serial
+
+from lector_serial import LectorSerial, SeparadorLineas
+from protocolo import (ParserBinario, ParserTramas, TIPO_CALIBRACION, TIPO_MUESTRA, TRAMA_ESTADO,
+                       TRAMA_HEARTBEAT, TRAMA_JSON, TRAMA_MUESTRA, TRAMA_PESO, empaquetar_binaria,
+                       es_latido)
+
+
+def test_tramas_de_texto():
+    parser = ParserTramas()
+
+    assert parser.parsear(b'OBJ:1.200;ACT:1.195;DIF:-0.005\r') == (TRAMA_PESO, (1.2, 1.195, -0.005))
+    tipo, datos = parser.parsear(b'{"peso":1.195,"objetivo":1.2,"diferencia":-0.005}')
+    assert tipo == TRAMA_JSON and datos['peso'] == 1.195
+    assert parser.parsear(b'HEARTBEAT\r') == (TRAMA_HEARTBEAT, None)
+    assert parser.parsear(b'Tara realizada\r') == (TRAMA_ESTADO, 'Tara realizada')
+    assert parser.parsear(b'\r') is None
+    assert es_latido(b'HEARTBEAT\r') and not es_latido(b'OBJ:1;ACT:1;DIF:0')
+
+
+def test_tramas_malformadas_se_cuentan_y_no_cortan_el_flujo():
+    parser = ParserTramas()
+
+    assert parser.parsear(b'OBJ:1.2;ACT:') is None              # Cortada
+    assert parser.parsear(b'OBJ:1.2;ACT:nan;DIF:nan') is None    # Falla del HX711
+    assert parser.parsear(b'{"peso":1.1,"objetivo"') is None     # JSON cortado
+    assert parser.parsear(b'{"peso":1.1}') is None               # Faltan campos
+    assert parser.parsear(b'OBJ:1.0;ACT:1.0;DIF:0.0')[0] == TRAMA_PESO
+    assert parser.contadores['malformadas'] == 4
+    assert parser.contadores[TRAMA_PESO] == 1
+
+
+def leer_con(lector_serial_args, escrituras, esperadas):
+    puerto = serial.serial_for_url('loop://', timeout=0.05)
+    cola = queue.Queue()
+    lector = LectorSerial(puerto, cola, **lector_serial_args).iniciar()
+    try:
+        for trozo in escrituras:
+            puerto.write(trozo)
+            time.sleep(0.02)  # Que cada trozo llegue en una lectura distinta
+        tramas = []
+        limite = time.monotonic() + 2
+        while len(tramas) < esperadas and time.monotonic() < limite:
+            try:
+                tramas.append(cola.get(timeout=0.1)[1])
+            except queue.Empty:
+                pass
+        return lector, tramas
+    finally:
+        lector.detener()
+        puerto.close()
+
+
+def test_linea_partida_entre_lecturas():
+    parser = ParserTramas()
+    escrituras = [b'OBJ:1.200;AC', b'T:1.195;DIF:-0.005\r\nHEART', b'BEAT\r\n{"peso":1.0,',
+                  b'"objetivo":1.0,"diferencia":0.0}\r\n']
+
+    _, tramas = leer_con({'parsear': parser}, escrituras, esperadas=3)
+
+    assert [t[0] for t in tramas] == [TRAMA_PESO, TRAMA_HEARTBEAT, TRAMA_JSON]
+    assert tramas[0][1] == (1.2, 1.195, -0.005)
+    assert parser.contadores['malformadas'] == 0
+
+
+def test_basura_sin_fin_de_linea_se_descarta():
+    parser = ParserTramas()
+    lector, tramas = leer_con({'parsear': parser}, [b'x' * 5000, b'\r\nOBJ:1.0;ACT:1.0;DIF:0.0\r\n'],
+                              esperadas=1)
+
+    assert tramas == [(TRAMA_PESO, (1.0, 1.0, 0.0))]
+    assert lector.lineas == 1  # La cola de la basura no llega al parser
+    assert lector.separar.bytes_descartados == 5002
+
+
+def test_basura_se_descarta_hasta_el_fin_de_linea():
+    separar = SeparadorLineas(max_linea=8)
+
+    # La basura llega en varias lecturas: su cola no se entrega como trama
+    assert separar(b'x' * 10) == ([], b'')
+    assert separar(b'yyyy') == ([], b'')
+    assert separar(b'zz\r\nOK\r\nOB') == ([b'OK\r'], b'OB')
+    assert separar(b'OB' + b'J\n') == ([b'OBJ'], b'')
+
+    # Basura y fin de línea en la misma lectura
+    assert separar(b'x' * 20 + b'\nOK\n' + b'y' * 9) == ([b'OK'], b'')
+    assert separar.descartando
+    assert separar(b'y\nFIN\n') == ([b'FIN'], b'')
+    assert separar.bytes_descartados == 10 + 4 + 4 + 21 + 9 + 2
+
+
+# -------------------- Modo binario --------------------
+
+def muestra(seq, peso=1.0, tipo=TIPO_MUESTRA):
+    return empaquetar_binaria(tipo, seq, 1000 + seq, 8000 + seq, 8000, peso, 1.2)
+
+
+def separar_todo(parser, trozos):
+    """Pasa los trozos por separar() como lo hace LectorSerial y parsea lo que sale"""
+    resto = b''
+    resultado = []
+    for trozo in trozos:
+        tramas, resto = parser.separar(resto + trozo)
+        resultado += [parser.parsear(t) for t in tramas]
+    return resultado, resto
+
+
+def test_binario_resincroniza_tras_crc_malo():
+    parser = ParserBinario()
+    mala = bytearray(muestra(1))
+    mala[15] ^= 0xFF  # Un byte del peso dañado en el cable
+    flujo = b'Arduino listo.\r\n' + muestra(0) + bytes(mala) + muestra(2) + muestra(3)
+
+    resultado, resto = separar_todo(parser, [flujo])
+
+    assert [d.seq for _, d in resultado] == [0, 2, 3]
+    assert parser.contadores['crc'] >= 1
+    assert parser.contadores['perdidas'] == 1  # La 1 se perdió
+    assert parser.contadores['bytes_ignorados'] >= len(b'Arduino listo.\r\n')
+    assert resto == b''
+
+
+def test_binario_trama_partida_entre_lecturas():
+    parser = ParserBinario()
+    flujo = muestra(0) + muestra(1, peso=2.5) + muestra(2)
+    # Cortes en medio de una trama y entre los dos bytes de sincronía
+    trozos = [flujo[:10], flujo[10:28], flujo[28:60], flujo[60:]]
+
+    resultado, resto = separar_todo(parser, trozos)
+
+    assert [d.seq for _, d in resultado] == [0, 1, 2]
+    assert resultado[1][1].peso == 2.5 and resultado[1][1].diferencia == 2.5 - resultado[1][1].objetivo
+    assert parser.contadores['crc'] == 0 and resto == b''
+
+
+def test_binario_calibracion_y_secuencia_que_da_la_vuelta():
+    parser = ParserBinario()
+    calibracion = empaquetar_binaria(TIPO_CALIBRACION, 0xFFFF, 10, 8000, 0, 400.0, 0.0)
+
+    resultado, _ = separar_todo(parser, [calibracion + muestra(0)])
+
+    assert es_latido(calibracion)
+    assert resultado[0] == (TRAMA_HEARTBEAT, None)
+    assert resultado[1][0] == TRAMA_MUESTRA
+    assert parser.contadores['perdidas'] == 0  # 0xFFFF → 0 es consecutivo
+    assert parser.a_kg(8400) == 1.0
+
+
+def test_binario_por_el_lector_serial():
+    parser = ParserBinario()
+    flujo = b''.join(muestra(i) for i in range(5))
+
+    _, tramas = leer_con({'parsear': parser, 'separar': parser.separar},
+                         [flujo[:40], flujo[40:41], flujo[41:]], esperadas=5)
+
+    assert [d.seq for _, d in tramas] == list(range(5))
@@ -0,0 +1,96 @@
+import pytest
+
+from reduccion import ReductorPesajes
+
+
+def registro(peso, objetivo=1.2, tolerancia=0.005):
+    diferencia = peso - objetivo
+    return {'peso_actual': peso, 'peso_objetivo': objetivo, 'diferencia': diferencia,
+            'estado': 'OK' if abs(diferencia) <= tolerancia else 'FUERA_RANGO', 'estacion': 'Linea-1'}
+
+
+def procesar(reductor, lecturas, estacion='Linea-1'):
+    """lecturas: [(instante, peso)] → filas emitidas"""
+    filas = []
+    for instante, peso in lecturas:
+        filas += reductor.procesar(registro(peso), estacion, instante)
+    return filas
+
+
+def test_banda_muerta():
+    reductor = ReductorPesajes(banda_muerta_kg=0.005, intervalo_min=0.5, intervalo_max=60)
+
+    filas = procesar(reductor, [(0.0, 1.200), (0.5, 1.202), (1.0, 1.204), (1.5, 1.206), (2.0, 1.206)])
+
+    # La primera siempre; 1.202 y 1.204 están dentro de la banda respecto de la última emitida
+    assert [f['peso_actual'] for f in filas] == [1.200, 1.206]
+    assert reductor.entrada == 5 and reductor.salida == 2
+    assert reductor.compresion == 2.5
+
+
+def test_intervalo_min_y_cambio_de_estado():
+    reductor = ReductorPesajes(banda_muerta_kg=0.005, intervalo_min=0.5, intervalo_max=60)
+
+    # 1.3 llega muy pronto (0.2 s): se espera al intervalo mínimo
+    filas = procesar(reductor, [(0.0, 1.2), (0.2, 1.3), (0.7, 1.3)])
+    assert [f['peso_actual'] for f in filas] == [1.2, 1.3]
+
+    # Cruzar el límite de tolerancia cambia el estado aunque el salto sea menor a la banda
+    reductor = ReductorPesajes(banda_muerta_kg=0.01, intervalo_min=0.5, intervalo_max=60)
+    filas = procesar(reductor, [(0.0, 1.204), (1.0, 1.206)])
+    assert [f['estado'] for f in filas] == ['OK', 'FUERA_RANGO']
+
+
+def test_intervalo_max_mantiene_viva_la_balanza():
+    reductor = ReductorPesajes(banda_muerta_kg=0.005, intervalo_min=0.5, intervalo_max=10)
+
+    filas = procesar(reductor, [(t * 0.5, 0.0) for t in range(61)])  # 30 s de balanza vacía
+
+    assert len(filas) == 4  # 0, 10, 20 y 30 s
+
+
+def test_estaciones_independientes():
+    reductor = ReductorPesajes(banda_muerta_kg=0.005, intervalo_min=0.5, intervalo_max=60)
+
+    assert len(procesar(reductor, [(0.0, 1.2)], 'Linea-1')) == 1
+    assert len(procesar(reductor, [(0.0, 1.2)], 'Linea-2')) == 1
+    assert procesar(reductor, [(1.0, 1.2)], 'Linea-1') == []
+
+
+def test_ventana_agrega_y_cierra_por_tiempo():
+    reductor = ReductorPesajes(ventana_s=1.0)
+
+    filas = procesar(reductor, [(0.0, 1.19), (0.4, 1.21), (0.8, 1.20), (1.0, 1.30)])
+
+    assert len(filas) == 1  # La lectura de 1.0 s abre la ventana siguiente
+    fila = filas[0]
+    assert fila['muestras'] == 3
+    assert fila['peso_actual'] == pytest.approx(1.2)
+    assert (fila['peso_min'], fila['peso_max']) == (1.19, 1.21)
+    assert fila['estado'] == 'OK' and fila['diferencia'] == pytest.approx(0.0)
+
+
+def test_ventana_vencida_y_vaciar():
+    reductor = ReductorPesajes(ventana_s=1.0)
+    procesar(reductor, [(0.0, 1.3), (0.5, 1.3)], 'Linea-1')
+    procesar(reductor, [(0.9, 1.0)], 'Linea-2')
+
+    # Sin más lecturas: vencidas() cierra solo las ventanas que ya cumplieron su tiempo
+    vencidas = reductor.vencidas(1.5)
+    assert [(f['peso_actual'], f['muestras'], f['estado']) for f in vencidas] == [(1.3, 2, 'FUERA_RANGO')]
+    assert reductor.vencidas(1.6) == []
+
+    restantes = reductor.vaciar()
+    assert [(f['peso_actual'], f['muestras']) for f in restantes] == [(1.0, 1)]
+    assert reductor.vaciar() == []
+    assert reductor.salida == 2
+
+
+def test_emitir_al_estabilizar_dentro_de_la_banda():
+    reductor = ReductorPesajes(banda_muerta_kg=0.05, intervalo_min=0.5, intervalo_max=60,
+                               emitir_al_estabilizar=True)
+
+    filas = procesar(reductor, [(t * 0.5, p) for t, p in enumerate([1.197, 1.203, 1.2, 1.2, 1.2, 1.2, 1.2])])
+
+    # 1.197 abre; las demás están dentro de la banda y en OK, pero el asentamiento en 1.2 se emite (una vez)
+    assert [f['peso_actual'] for f in filas] == [1.197, 1.2]
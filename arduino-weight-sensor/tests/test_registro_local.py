@@ -0,0 +1,87 @@
+import gzip
+import os
+import time
+from datetime import date, datetime
+
+from registro_local import RegistroRotativo, leer_rango, segmentos, ultimas
+
+ENCABEZADO = ['Fecha', 'Código Saco', 'Peso Actual (kg)']
+
+
+def fila(i, dia=20):
+    return [f'2025-11-{dia:02d} 10:00:{i % 60:02d}', f'S{i}', f'{1 + i / 1000:.3f}']
+
+
+def escribir(registro, desde, hasta, dia=20):
+    for i in range(desde, hasta):
+        registro.escribir(fila(i, dia), datetime(2025, 11, dia, 10))
+
+
+def esperar_comprimidos(directorio, n, plazo=5.0):
+    limite = time.monotonic() + plazo
+    while time.monotonic() < limite:
+        if sum(nombre.endswith('.gz') for nombre in os.listdir(directorio)) >= n:
+            return
+        time.sleep(0.02)
+
+
+def nombres(directorio):
+    return sorted(os.listdir(directorio))
+
+
+def test_rota_por_dia_y_por_tamano_y_comprime_los_cerrados(tmp_path):
+    registro = RegistroRotativo(ENCABEZADO, str(tmp_path), max_bytes=200)
+    escribir(registro, 0, 10, dia=19)   # Pasa de 200 bytes: un segundo segmento del 19
+    escribir(registro, 10, 12, dia=20)  # Cambio de día
+    registro.cerrar()
+    esperar_comprimidos(tmp_path, 2)
+
+    assert nombres(tmp_path) == ['registro_inventario_2025-11-19.1.csv.gz', 'registro_inventario_2025-11-19.csv.gz',
+                                 'registro_inventario_2025-11-20.csv']
+    with gzip.open(tmp_path / 'registro_inventario_2025-11-19.csv.gz', 'rt', encoding='utf-8') as f:
+        assert f.readline().strip() == ','.join(ENCABEZADO)  # Cada segmento con su encabezado
+    assert [f['Código Saco'] for f in leer_rango(date(2025, 11, 19), date(2025, 11, 20), str(tmp_path))] == \
+        [f'S{i}' for i in range(12)]
+
+
+def test_al_abrir_comprime_los_dias_anteriores(tmp_path):
+    # Segmentos de días anteriores que nadie rotó (sin comprimir al cerrar, como una estación apagada)
+    for dia in (18, 19):
+        registro = RegistroRotativo(ENCABEZADO, str(tmp_path), comprimir=False)
+        escribir(registro, 0, 3, dia=dia)
+        registro.cerrar()
+    assert not any(n.endswith('.gz') for n in nombres(tmp_path))
+
+    registro = RegistroRotativo(ENCABEZADO, str(tmp_path))
+    escribir(registro, 0, 1, dia=20)
+    esperar_comprimidos(tmp_path, 2)
+    registro.cerrar()
+
+    assert nombres(tmp_path) == ['registro_inventario_2025-11-18.csv.gz', 'registro_inventario_2025-11-19.csv.gz',
+                                 'registro_inventario_2025-11-20.csv']
+
+
+def test_mismo_dia_continua_el_segmento(tmp_path):
+    for desde in (0, 3):
+        registro = RegistroRotativo(ENCABEZADO, str(tmp_path))
+        escribir(registro, desde, desde + 3)
+        registro.cerrar()
+
+    assert [n for _, n, _ in segmentos(str(tmp_path))] == [0]
+    assert len(list(leer_rango(date(2025, 11, 20), date(2025, 11, 20), str(tmp_path)))) == 6
+
+
+def test_ultimas_y_leer_rango_entre_segmentos(tmp_path):
+    registro = RegistroRotativo(ENCABEZADO, str(tmp_path), max_bytes=300)
+    for dia in (18, 19, 20):
+        escribir(registro, dia * 100, dia * 100 + 15, dia=dia)
+    registro.cerrar()
+    esperar_comprimidos(tmp_path, 1)
+
+    assert len(segmentos(str(tmp_path))) > 3
+    assert [f['Código Saco'] for f in ultimas(20, str(tmp_path))] == \
+        [f'S{i}' for i in range(1910, 1915)] + [f'S{i}' for i in range(2000, 2015)]
+    assert [f['Código Saco'] for f in ultimas(2, str(tmp_path))] == ['S2013', 'S2014']
+    assert [f['Código Saco'] for f in leer_rango(date(2025, 11, 19), date(2025, 11, 19), str(tmp_path))] == \
+        [f'S{i}' for i in range(1900, 1915)]
+    assert ultimas(5, str(tmp_path / 'no_existe')) == []
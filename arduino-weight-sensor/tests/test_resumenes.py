@@ -0,0 +1,110 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from resumenes import AcumuladorResumenes, resumir_historial
+
+
+@pytest.fixture
+def zona(monkeypatch):
+    """Cambia la zona local del proceso (astimezone() la usa) y la restaura al final"""
+    def cambiar(nombre):
+        monkeypatch.setenv('TZ', nombre)
+        time.tzset()
+    yield cambiar
+    monkeypatch.undo()
+    time.tzset()
+
+
+def pesajes(desde_utc: datetime, horas: int, cada_minutos=10) -> list:
+    filas = []
+    for i in range(horas * 60 // cada_minutos):
+        instante = desde_utc + timedelta(minutes=i * cada_minutos)
+        filas.append({'timestamp': instante.astimezone().isoformat(), 'fabrica': 'Planta Norte',
+                      'estado': 'FUERA_RANGO' if i % 3 == 0 else 'OK', 'diferencia': -0.01 * (i % 5)})
+    return filas
+
+
+def celdas_en_vivo(filas: list) -> dict:
+    acumulador = AcumuladorResumenes()
+    acumulador.agregar_lote('pesajes_tiempo_real', filas)
+    acumulador._armar_lotes()
+    return {(f['periodo'], f['inicio'], f['estado']): (f['cantidad'], f['fuera_rango'])
+            for _, lote in acumulador._por_enviar for f in lote}
+
+
+def celdas_backfill(filas: list) -> dict:
+    df = pd.DataFrame(filas)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', utc=True)
+    return {(f['periodo'], f['inicio'], f['estado']): (f['cantidad'], f['fuera_rango'])
+            for f in resumir_historial(df, 'pesajes_tiempo_real')}
+
+
+@pytest.mark.parametrize('nombre, desde', [
+    ('Europe/Madrid', datetime(2025, 10, 25, 20, tzinfo=timezone.utc)),      # 03:00 CEST → 02:00 CET
+    ('Europe/Madrid', datetime(2025, 3, 29, 20, tzinfo=timezone.utc)),       # 02:00 CET → 03:00 CEST
+    ('America/Santiago', datetime(2025, 4, 5, 20, tzinfo=timezone.utc)),     # 00:00 -03 → 23:00 -04
+])
+def test_backfill_igual_al_acumulado_en_vivo_con_cambio_de_hora(zona, nombre, desde):
+    zona(nombre)
+    filas = pesajes(desde, horas=12)
+
+    en_vivo = celdas_en_vivo(filas)
+    backfill = celdas_backfill(filas)
+
+    assert backfill == en_vivo
+    for periodo in ('hora', 'dia'):
+        assert sum(n for (p, _, _), (n, _) in backfill.items() if p == periodo) == len(filas)
+
+
+def test_hora_repetida_queda_en_dos_celdas(zona):
+    zona('Europe/Madrid')
+    filas = pesajes(datetime(2025, 10, 26, 0, tzinfo=timezone.utc), horas=1)  # 02:00-03:00 CEST
+    filas += pesajes(datetime(2025, 10, 26, 1, tzinfo=timezone.utc), horas=1)  # 02:00-03:00 CET
+
+    horas = {inicio for (periodo, inicio, _) in celdas_backfill(filas) if periodo == 'hora'}
+    dias = {inicio for (periodo, inicio, _) in celdas_backfill(filas) if periodo == 'dia'}
+
+    assert horas == {'2025-10-26T02:00:00+02:00', '2025-10-26T02:00:00+01:00'}
+    assert dias == {'2025-10-26T00:00:00+02:00'}
+
+
+class ClienteCaido:
+    """Cliente con rpc() que falla mientras `caido`; anota los lotes recibidos"""
+
+    def __init__(self):
+        self.caido = True
+        self.lotes = []
+
+    def rpc(self, nombre, argumentos):
+        self.lotes.append(argumentos)
+        if self.caido:
+            raise ConnectionError("permiso denegado para sumar_resumen")
+        return self
+
+    def execute(self):
+        pass
+
+
+def test_sin_permiso_lo_pendiente_no_crece_y_se_reintenta_el_mismo_lote():
+    cliente = ClienteCaido()
+    acumulador = AcumuladorResumenes(cliente)
+    hora = datetime(2025, 11, 20, 10, tzinfo=timezone.utc)
+    fila = {'timestamp': hora.isoformat(), 'fabrica': 'Planta Norte', 'estado': 'OK', 'diferencia': -0.01}
+
+    for _ in range(50):  # 50 intervalos con el envío fallando
+        acumulador.agregar_lote('pesajes_tiempo_real', [fila] * 10)
+        acumulador._intentar()
+
+    assert acumulador.errores == 50
+    assert len(acumulador._por_enviar) == 1 and acumulador.pendientes == 4  # hora y día, en lote y en memoria
+    assert len({argumentos['lote'] for argumentos in cliente.lotes}) == 1
+
+    cliente.caido = False
+    acumulador._intentar()
+
+    assert acumulador.pendientes == 0 and acumulador.ultimo_error is None
+    enviadas = [f for argumentos in cliente.lotes[-2:] for f in argumentos['filas'] if f['periodo'] == 'hora']
+    assert sum(f['cantidad'] for f in enviadas) == 500
@@ -0,0 +1,70 @@
+import pytest
+from supabase import create_client
+
+from spool import ReplayerSpool
+from supabase_falso import CLAVE_FALSA
+
+from .conftest import lecturas
+
+
+def test_sin_red_las_filas_quedan_y_se_suben_al_volver(servidor, spool):
+    spool.agregar_lote('pesajes_tiempo_real', lecturas(450))
+    replayer = ReplayerSpool(spool, create_client(servidor.url, CLAVE_FALSA), tamano_lote=200)
+
+    servidor.tasa_error = 1.0
+    with pytest.raises(Exception):
+        replayer.drenar()
+    assert spool.contar() == 450 and servidor.total() == 0
+
+    servidor.tasa_error = 0.0
+    assert replayer.drenar() == 450
+    assert spool.contar() == 0
+    pesos = [f['peso_actual'] for f in servidor.filas['pesajes_tiempo_real']]
+    assert pesos == [1.0 + i / 1000 for i in range(450)]  # En orden de llegada
+
+
+def test_reenvio_tras_un_corte_no_duplica(servidor, spool):
+    claves = spool.agregar_lote('pesajes_tiempo_real', lecturas(10))
+    replayer = ReplayerSpool(spool, create_client(servidor.url, CLAVE_FALSA))
+
+    # Se subió pero se cortó antes de confirmar: el lote vuelve a salir con las mismas claves
+    replayer._subir('pesajes_tiempo_real', [r for _, r in spool.leer_pendientes('pesajes_tiempo_real')])
+    assert replayer.drenar() == 10
+
+    assert servidor.total('pesajes_tiempo_real') == 10
+    assert {f['clave_idempotencia'] for f in servidor.filas['pesajes_tiempo_real']} == set(claves)
+
+
+def test_misma_clave_se_guarda_una_vez(spool):
+    fila = dict(lecturas(1)[0], clave_idempotencia='saco-1')
+
+    spool.agregar('sacos', fila)
+    spool.agregar('sacos', fila)
+
+    assert spool.contar() == 1
+    assert spool.tablas_pendientes() == ['sacos']
+
+
+def test_fila_rechazada_no_bloquea_las_siguientes(servidor, spool):
+    spool.agregar_lote('pesajes_tiempo_real', lecturas(450))
+    replayer = ReplayerSpool(spool, create_client(servidor.url, CLAVE_FALSA), tamano_lote=200)
+    servidor.rechazar = lambda fila: fila['peso_actual'] == 1.1  # La fila 100 viola un CHECK
+
+    assert replayer.drenar() == 449
+
+    assert spool.contar() == 0 and spool.contar_rechazadas() == 1 and replayer.rechazadas == 1
+    pesos = [f['peso_actual'] for f in servidor.filas['pesajes_tiempo_real']]
+    assert pesos == [1.0 + i / 1000 for i in range(450) if i != 100]
+
+
+def test_rechazo_de_todas_las_filas_no_las_aparta(servidor, spool):
+    spool.agregar_lote('pesajes_tiempo_real', lecturas(10))
+    replayer = ReplayerSpool(spool, create_client(servidor.url, CLAVE_FALSA))
+    servidor.rechazar = lambda fila: True  # Permisos o esquema: falla cualquier fila
+
+    with pytest.raises(Exception):
+        replayer.drenar()
+
+    assert spool.contar() == 10 and spool.contar_rechazadas() == 0
+    servidor.rechazar = None
+    assert replayer.drenar() == 10
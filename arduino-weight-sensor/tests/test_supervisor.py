@@ -0,0 +1,53 @@
+import queue
+import time
+
+import serial
+
+from supervisor import SupervisorConexion
+
+
+def esperar(condicion, plazo=3.0):
+    limite = time.monotonic() + plazo
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def puerto_que_falla(veces: int):
+    """abrir() que falla las primeras `veces` y después da un puerto en loopback"""
+    intentos = []
+
+    def abrir():
+        intentos.append(time.monotonic())
+        if len(intentos) <= veces:
+            raise serial.SerialException("puerto ocupado")
+        return serial.serial_for_url('loop://', timeout=0.05)
+    return abrir, intentos
+
+
+def test_conectar_mientras_esta_caido_no_tumba_la_conexion_nueva():
+    abrir, intentos = puerto_que_falla(1)
+    supervisor = SupervisorConexion('COM9', 9600, queue.Queue(), abrir=abrir, plazo=60,
+                                    revision=0.02, espera_min=10, espera_max=10).iniciar()
+    try:
+        assert esperar(lambda: len(intentos) == 1)
+        supervisor.reconectar()  # Botón "Conectar" sin conexión: reintentar ya
+        assert esperar(lambda: supervisor.conectado)
+        time.sleep(0.2)  # Varias pasadas de vigilancia
+        assert supervisor.conectado
+        assert supervisor.caidas == 0 and len(intentos) == 2
+    finally:
+        supervisor.detener()
+
+
+def test_conectar_con_conexion_abierta_la_reabre():
+    abrir, intentos = puerto_que_falla(0)
+    supervisor = SupervisorConexion('COM9', 9600, queue.Queue(), abrir=abrir, plazo=60,
+                                    revision=0.02, espera_min=0.01).iniciar()
+    try:
+        assert esperar(lambda: supervisor.conectado)
+        supervisor.reconectar()
+        assert esperar(lambda: supervisor.reconexiones == 1)
+        assert supervisor.caidas == 1 and len(intentos) == 2
+    finally:
+        supervisor.detener()
@@ -0,0 +1,47 @@
+import time
+import uuid
+
+import pytest
+
+from tablero import LARGO_ESTACION, TableroPesos
+
+
+@pytest.fixture
+def crear():
+    tableros = []
+
+    def crear(estaciones):
+        tableros.append(TableroPesos.crear(estaciones, f"prueba_{uuid.uuid4().hex[:12]}"))
+        return tableros[-1]
+    yield crear
+    for tablero in tableros:
+        tablero.cerrar()
+
+
+def test_publicar_y_leer(crear):
+    tablero = crear(["Linea-1", "Linea-2"])
+    tablero.publicar(1, peso=5.02, objetivo=5.0, lecturas=3, conectado=True)
+
+    r = tablero.leer(1)
+    assert r['peso'] == pytest.approx(5.02) and r['lecturas'] == 3 and r['conectado']
+    assert r['seq'] % 2 == 0
+    todo = tablero.leer_todo()
+    assert todo['lecturas'].tolist() == [0, 3]
+
+
+def test_nombre_largo_se_corta_en_un_caracter_completo(crear):
+    nombre = "a" * (LARGO_ESTACION - 1) + "ñandú"  # La ñ queda partida en el byte 32
+    tablero = crear([nombre, "Balanza Ñuñoa"])
+
+    assert tablero.estaciones == ["a" * (LARGO_ESTACION - 1), "Balanza Ñuñoa"]
+
+
+def test_escritor_muerto_a_mitad_no_cuelga_al_lector(crear):
+    tablero = crear(["Linea-1"])
+    tablero.publicar(0, lecturas=7)
+    tablero.registros['seq'][0] += 1  # Como si el proceso muriera entre los dos `seq += 1`
+
+    inicio = time.monotonic()
+    assert tablero.leer(0)['lecturas'] == 7
+    assert tablero.leer_todo()['lecturas'][0] == 7
+    assert time.monotonic() - inicio < 1.0
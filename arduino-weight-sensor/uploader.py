@@ -0,0 +1,156 @@
+"""
+Uploader por lotes - Cola acotada en memoria + hilo de envío a Supabase
+
+El hilo serial solo encola registros (nunca espera la red). Un hilo de
+fondo junta los registros y los envía como un único insert multi-fila,
+vaciando el lote cuando llega a `tamano_lote` o cuando pasan
+`intervalo_max` segundos desde el primer registro pendiente.
+"""
+
+import queue
+import threading
+import time
+
+
+class UploaderPorLotes:
+    """Cola acotada con un hilo que envía los registros en lotes"""
+
+    def __init__(self, enviar_lote, tamano_lote=50, intervalo_max=1.0,
+                 capacidad=10000, reintentos=3, intervalo_reporte=30.0, metricas=None):
+        # enviar_lote(filas: list[dict]) debe lanzar una excepción si falla
+        self.enviar_lote = enviar_lote
+        self.tamano_lote = tamano_lote
+        self.intervalo_max = intervalo_max
+        self.reintentos = reintentos
+        self.intervalo_reporte = intervalo_reporte
+
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._detener = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self.encolados = 0
+        self.enviados = 0
+        self.descartados = 0
+        self.errores = 0
+        self._inicio = time.monotonic()
+
+        self._h_espera = self._h_envio = None
+        if metricas:
+            self._h_espera = metricas.histograma('espera_uploader', 'Registro encolado → envío de su lote')
+            self._h_envio = metricas.histograma('envio_lote', 'Duración de enviar_lote()')
+            metricas.indicador('profundidad_cola_uploader', self._cola.qsize, 'Registros esperando lote')
+            metricas.indicador('filas_descartadas', lambda: self.descartados,
+                               'Filas perdidas por cola llena o reintentos agotados')
+            metricas.indicador('errores_envio', lambda: self.errores, 'Intentos de envío fallidos')
+
+    # -------------------- API para el hilo serial --------------------
+
+    def encolar(self, registro: dict) -> bool:
+        """Encola un registro sin bloquear. Devuelve False si la cola está llena."""
+        try:
+            self._cola.put_nowait((time.monotonic(), registro))
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+            return False
+        with self._lock:
+            self.encolados += 1
+        return True
+
+    def iniciar(self):
+        """Arranca el hilo de envío"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._inicio = time.monotonic()
+        self._hilo = threading.Thread(target=self._trabajar, name="uploader-lotes", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=10.0):
+        """Pide al hilo que vacíe lo pendiente y termine"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout)
+
+    def estadisticas(self) -> dict:
+        """Profundidad de la cola, filas enviadas y tasa de filas/seg"""
+        with self._lock:
+            transcurrido = max(time.monotonic() - self._inicio, 1e-9)
+            return {
+                'profundidad_cola': self._cola.qsize(),
+                'encolados': self.encolados,
+                'enviados': self.enviados,
+                'descartados': self.descartados,
+                'errores': self.errores,
+                'filas_por_seg': self.enviados / transcurrido,
+            }
+
+    # -------------------- Hilo de envío --------------------
+
+    def _siguiente_lote(self) -> list:
+        """Bloquea hasta tener un registro y luego junta hasta llenar el lote o vencer el plazo.
+
+        Devuelve [(instante_encolado, registro)].
+        """
+        try:
+            primero = self._cola.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        lote = [primero]
+        limite = time.monotonic() + self.intervalo_max
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _enviar_con_reintentos(self, lote: list):
+        if self._h_espera:
+            ahora = time.monotonic()
+            self._h_espera.observar_varios([ahora - instante for instante, _ in lote])
+        lote = [registro for _, registro in lote]
+        espera = 0.5
+        for intento in range(self.reintentos + 1):
+            try:
+                inicio = time.perf_counter()
+                self.enviar_lote(lote)
+                if self._h_envio:
+                    self._h_envio.observar(time.perf_counter() - inicio)
+                with self._lock:
+                    self.enviados += len(lote)
+                return
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                print(f"⚠️ Error enviando lote de {len(lote)} filas (intento {intento + 1}): {e}")
+                if intento < self.reintentos and not self._detener.is_set():
+                    time.sleep(espera)
+                    espera = min(espera * 2, 10.0)
+
+        with self._lock:
+            self.descartados += len(lote)
+
+    def _reportar(self):
+        e = self.estadisticas()
+        print(
+            f"📈 Cola: {e['profundidad_cola']} | Enviadas: {e['enviados']} "
+            f"({e['filas_por_seg']:.1f} filas/s) | Descartadas: {e['descartados']} | Errores: {e['errores']}"
+        )
+
+    def _trabajar(self):
+        proximo_reporte = time.monotonic() + self.intervalo_reporte
+        while not (self._detener.is_set() and self._cola.empty()):
+            lote = self._siguiente_lote()
+            if lote:
+                self._enviar_con_reintentos(lote)
+
+            if self.intervalo_reporte and time.monotonic() >= proximo_reporte:
+                self._reportar()
+                proximo_reporte = time.monotonic() + self.intervalo_reporte
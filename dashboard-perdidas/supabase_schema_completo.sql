@@ -16,6 +16,8 @@ CREATE TABLE IF NOT EXISTS fabricas (
 );
 
 CREATE INDEX idx_fabricas_nombre ON fabricas(nombre);
+-- Único para que las estaciones de pesaje puedan hacer upsert por nombre sin duplicar fábricas
+CREATE UNIQUE INDEX IF NOT EXISTS uq_fabricas_nombre ON fabricas(nombre);
 CREATE INDEX idx_fabricas_activa ON fabricas(activa);
 
 -- 2. TABLA DE PEDIDOS (Lista 2024 China Contados)
@@ -49,9 +51,12 @@ CREATE TABLE IF NOT EXISTS sacos (
   estado VARCHAR(20) CHECK (estado IN ('OK', 'FUERA_RANGO')),
   fecha_pesaje TIMESTAMPTZ DEFAULT NOW(),
   lote VARCHAR(100),
+  clave_idempotencia UUID UNIQUE, -- Generada por el spool local de la estación de pesaje
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+ALTER TABLE sacos ADD COLUMN IF NOT EXISTS clave_idempotencia UUID UNIQUE;
+
 CREATE INDEX idx_sacos_codigo ON sacos(codigo);
 CREATE INDEX idx_sacos_fecha ON sacos(fecha_pesaje DESC);
 CREATE INDEX idx_sacos_estado ON sacos(estado);
@@ -68,6 +73,9 @@ CREATE TABLE IF NOT EXISTS usuarios (
   created_by UUID REFERENCES usuarios(id)
 );
 
+-- Estación de pesaje de un operador: solo escribe las recetas de esa estación (recetas.estacion)
+ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS estacion VARCHAR(100);
+
 CREATE INDEX idx_usuarios_email ON usuarios(email);
 CREATE INDEX idx_usuarios_rol ON usuarios(rol);
 
@@ -97,6 +105,66 @@ CREATE TABLE IF NOT EXISTS perdidas (
 
 CREATE INDEX idx_perdidas_fecha ON perdidas(fecha DESC);
 CREATE INDEX idx_perdidas_fabrica ON perdidas(fabrica_id);
+-- Una fila por día/fábrica/tipo: analisis_perdidas.py (tipo 'PESAJE') hace upsert sobre esta clave
+CREATE UNIQUE INDEX IF NOT EXISTS uq_perdidas_fecha_fabrica_tipo
+  ON perdidas(fecha, fabrica_id, tipo) NULLS NOT DISTINCT;
+
+-- 7. PRODUCTOS Y RECETAS (estaciones de pesaje, recetas.py)
+CREATE TABLE IF NOT EXISTS productos (
+  clave VARCHAR(50) PRIMARY KEY, -- 'ATUN', 'PALMITO'
+  nombre VARCHAR(200) NOT NULL,
+  unidades INTEGER NOT NULL CHECK (unidades > 0),
+  lote VARCHAR(100), -- Se copia a sacos.lote
+  activo BOOLEAN DEFAULT true,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Peso por unidad aprendido de los sacos aceptados: una fila por producto/fábrica/estación
+-- (muestras, media y M2 de Welford; cada estación sube la suya y combina las demás)
+CREATE TABLE IF NOT EXISTS recetas (
+  id BIGSERIAL PRIMARY KEY,
+  producto VARCHAR(50) NOT NULL REFERENCES productos(clave),
+  fabrica_id BIGINT NOT NULL REFERENCES fabricas(id),
+  estacion VARCHAR(100) NOT NULL,
+  muestras INTEGER NOT NULL,
+  media_kg DECIMAL(12, 6) NOT NULL,
+  m2 DOUBLE PRECISION NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  UNIQUE (producto, fabrica_id, estacion)
+);
+
+INSERT INTO productos (clave, nombre, unidades, lote) VALUES
+  ('ATUN', 'Saco de 5 latas de Atún', 5, 'ATUN-5'),
+  ('PALMITO', 'Saco de 3 latas de Palmitos', 3, 'PALM-3')
+ON CONFLICT (clave) DO NOTHING;
+
+-- 8. RESÚMENES DE PESAJE (resumenes.py)
+-- Totales por tabla de origen, hora/día, fábrica y estado. Las estaciones y el bridge
+-- los suman con sumar_resumen(); `python resumenes.py --backfill` los rearma del historial.
+CREATE TABLE IF NOT EXISTS resumen_pesajes (
+  id BIGSERIAL PRIMARY KEY,
+  tabla VARCHAR(30) NOT NULL CHECK (tabla IN ('sacos', 'pesajes_tiempo_real')),
+  periodo VARCHAR(4) NOT NULL CHECK (periodo IN ('hora', 'dia')),
+  inicio TIMESTAMPTZ NOT NULL, -- Inicio de la hora o del día (hora local de la planta)
+  fabrica_id BIGINT REFERENCES fabricas(id), -- sacos
+  fabrica VARCHAR(200), -- pesajes_tiempo_real guarda el nombre
+  estado VARCHAR(20),
+  cantidad BIGINT NOT NULL DEFAULT 0,
+  suma_diferencia DOUBLE PRECISION NOT NULL DEFAULT 0,
+  fuera_rango BIGINT NOT NULL DEFAULT 0,
+  kg_faltantes DOUBLE PRECISION NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_resumen_pesajes
+  ON resumen_pesajes(tabla, periodo, inicio, fabrica_id, fabrica, estado) NULLS NOT DISTINCT;
+
+-- Lotes ya sumados: un envío reintentado no se cuenta dos veces
+CREATE TABLE IF NOT EXISTS resumen_lotes (
+  lote UUID PRIMARY KEY,
+  aplicado TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_resumen_lotes_aplicado ON resumen_lotes(aplicado);
 
 -- ========================================
 -- ROW LEVEL SECURITY (RLS)
@@ -108,6 +176,10 @@ ALTER TABLE sacos ENABLE ROW LEVEL SECURITY;
 ALTER TABLE usuarios ENABLE ROW LEVEL SECURITY;
 ALTER TABLE reportes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE perdidas ENABLE ROW LEVEL SECURITY;
+ALTER TABLE productos ENABLE ROW LEVEL SECURITY;
+ALTER TABLE recetas ENABLE ROW LEVEL SECURITY;
+ALTER TABLE resumen_pesajes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE resumen_lotes ENABLE ROW LEVEL SECURITY;
 
 -- Políticas para FABRICAS (todos pueden leer, solo admin puede editar)
 CREATE POLICY "Permitir lectura pública fabricas" ON fabricas
@@ -148,6 +220,102 @@ CREATE POLICY "Permitir escritura operador sacos" ON sacos
     )
   );
 
+-- Políticas para PRODUCTOS y RECETAS (las estaciones leen todo y suben sus recetas)
+CREATE POLICY "Permitir lectura pública productos" ON productos
+  FOR SELECT USING (true);
+
+CREATE POLICY "Permitir escritura admin productos" ON productos
+  FOR ALL USING (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND usuarios.rol IN ('admin', 'supervisor')
+    )
+  );
+
+CREATE POLICY "Permitir lectura pública recetas" ON recetas
+  FOR SELECT USING (true);
+
+-- Las recetas fijan los objetivos que se mandan a las balanzas (OBJ:): un operador solo
+-- escribe las filas de su estación (usuarios.estacion); admin y supervisor, todas
+CREATE POLICY "Permitir alta estaciones recetas" ON recetas
+  FOR INSERT WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND (usuarios.rol IN ('admin', 'supervisor')
+           OR (usuarios.rol = 'operador' AND usuarios.estacion = recetas.estacion))
+    )
+  );
+
+CREATE POLICY "Permitir actualización estaciones recetas" ON recetas
+  FOR UPDATE USING (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND (usuarios.rol IN ('admin', 'supervisor')
+           OR (usuarios.rol = 'operador' AND usuarios.estacion = recetas.estacion))
+    )
+  ) WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND (usuarios.rol IN ('admin', 'supervisor')
+           OR (usuarios.rol = 'operador' AND usuarios.estacion = recetas.estacion))
+    )
+  );
+
+CREATE POLICY "Permitir borrado estaciones recetas" ON recetas
+  FOR DELETE USING (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND (usuarios.rol IN ('admin', 'supervisor')
+           OR (usuarios.rol = 'operador' AND usuarios.estacion = recetas.estacion))
+    )
+  );
+
+-- Políticas para RESÚMENES (lectura para el dashboard; se escriben con sumar_resumen o el backfill)
+CREATE POLICY "Permitir lectura pública resumen_pesajes" ON resumen_pesajes
+  FOR SELECT USING (true);
+
+-- sumar_resumen corre con los permisos de quien llama: mismos escritores que sacos
+CREATE POLICY "Permitir suma operador resumen_pesajes" ON resumen_pesajes
+  FOR INSERT WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND usuarios.rol IN ('admin', 'supervisor', 'operador')
+    )
+  );
+
+CREATE POLICY "Permitir actualización operador resumen_pesajes" ON resumen_pesajes
+  FOR UPDATE USING (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND usuarios.rol IN ('admin', 'supervisor', 'operador')
+    )
+  );
+
+CREATE POLICY "Permitir escritura operador resumen_lotes" ON resumen_lotes
+  FOR ALL USING (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND usuarios.rol IN ('admin', 'supervisor', 'operador')
+    )
+  );
+
+CREATE POLICY "Permitir escritura admin resumen_pesajes" ON resumen_pesajes
+  FOR ALL USING (
+    EXISTS (
+      SELECT 1 FROM usuarios 
+      WHERE usuarios.id = auth.uid() 
+      AND usuarios.rol IN ('admin', 'supervisor')
+    )
+  );
+
 -- Políticas para USUARIOS (solo admin puede gestionar)
 CREATE POLICY "Permitir lectura admin usuarios" ON usuarios
   FOR SELECT USING (
@@ -215,6 +383,22 @@ WHERE cantidad_pedidos > 0
 GROUP BY DATE_TRUNC('month', fecha_llegada)
 ORDER BY mes DESC;
 
+-- Vista de sacos por día y fábrica (lee resumen_pesajes, no recorre sacos)
+CREATE OR REPLACE VIEW sacos_diarios_fabricas AS
+SELECT 
+  r.inicio as dia,
+  r.fabrica_id,
+  f.nombre,
+  SUM(r.cantidad) as sacos,
+  SUM(r.fuera_rango) as fuera_rango,
+  SUM(r.suma_diferencia) / NULLIF(SUM(r.cantidad), 0) as diferencia_media,
+  SUM(r.kg_faltantes) as kg_faltantes
+FROM resumen_pesajes r
+LEFT JOIN fabricas f ON f.id = r.fabrica_id
+WHERE r.tabla = 'sacos' AND r.periodo = 'dia'
+GROUP BY r.inicio, r.fabrica_id, f.nombre
+ORDER BY dia DESC;
+
 -- ========================================
 -- FUNCIONES ÚTILES
 -- ========================================
@@ -223,7 +407,8 @@ ORDER BY mes DESC;
 CREATE OR REPLACE FUNCTION calcular_perdidas()
 RETURNS void AS $$
 BEGIN
-  TRUNCATE TABLE perdidas;
+  -- Las filas 'PESAJE' las calcula analisis_perdidas.py a partir de los sacos pesados
+  DELETE FROM perdidas WHERE tipo IS DISTINCT FROM 'PESAJE';
   
   INSERT INTO perdidas (fecha, fabrica_id, cantidad_perdida, porcentaje_perdida, tipo)
   SELECT 
@@ -242,6 +427,43 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Suma un lote de celdas a resumen_pesajes (llamada por resumenes.py vía rpc).
+-- SECURITY INVOKER: aplica las políticas de resumen_pesajes/resumen_lotes de quien llama,
+-- así que la clave anon no puede sumar (usar una sesión de operador o la clave de servicio)
+CREATE OR REPLACE FUNCTION sumar_resumen(lote UUID, filas JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  aplicadas INTEGER;
+BEGIN
+  -- Un lote reintentado tras un corte no se suma dos veces
+  INSERT INTO resumen_lotes (lote) VALUES (sumar_resumen.lote) ON CONFLICT DO NOTHING;
+  IF NOT FOUND THEN
+    RETURN 0;
+  END IF;
+  DELETE FROM resumen_lotes WHERE aplicado < NOW() - INTERVAL '7 days';
+
+  INSERT INTO resumen_pesajes AS r (tabla, periodo, inicio, fabrica_id, fabrica, estado,
+                                    cantidad, suma_diferencia, fuera_rango, kg_faltantes)
+  SELECT f.tabla, f.periodo, f.inicio, f.fabrica_id, f.fabrica, f.estado,
+         f.cantidad, f.suma_diferencia, f.fuera_rango, f.kg_faltantes
+  FROM jsonb_to_recordset(filas) AS f(
+    tabla VARCHAR, periodo VARCHAR, inicio TIMESTAMPTZ, fabrica_id BIGINT, fabrica VARCHAR,
+    estado VARCHAR, cantidad BIGINT, suma_diferencia DOUBLE PRECISION, fuera_rango BIGINT,
+    kg_faltantes DOUBLE PRECISION)
+  ON CONFLICT (tabla, periodo, inicio, fabrica_id, fabrica, estado) DO UPDATE SET
+    cantidad = r.cantidad + EXCLUDED.cantidad,
+    suma_diferencia = r.suma_diferencia + EXCLUDED.suma_diferencia,
+    fuera_rango = r.fuera_rango + EXCLUDED.fuera_rango,
+    kg_faltantes = r.kg_faltantes + EXCLUDED.kg_faltantes,
+    updated_at = NOW();
+  GET DIAGNOSTICS aplicadas = ROW_COUNT;
+  RETURN aplicadas;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION sumar_resumen(UUID, JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION sumar_resumen(UUID, JSONB) TO authenticated, service_role;
+
 -- Trigger para actualizar updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -1,14 +1,41 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import serial, threading, csv
+import threading, queue
 from datetime import datetime
 import os
+import sys
+
+# Módulos compartidos del bridge (lector serial, protocolo, ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "arduino-weight-sensor"))
+from bomba_ui import BombaUI
+from protocolo import BAUD_BINARIO, ParserBinario, ParserTramas, TRAMA_MUESTRA, TRAMA_PESO
+from registro_local import RegistroRotativo, DIRECTORIO_REGISTROS
+from supervisor import SupervisorConexion
 
 # --- Configuración de conexión ---
 PORT = 'COM6'
-BAUD = 9600
-arduino = None
+MODO_BINARIO = False  # Debe coincidir con MODO_BINARIO en sketch_pesa_intnuev.ino
+BAUD = BAUD_BINARIO if MODO_BINARIO else 9600
+PLAZO_SILENCIO = 6.0  # Segundos sin tramas (ni HEARTBEAT) para dar la balanza por desconectada
+cola_serial = queue.Queue(maxsize=1000)
+parser = ParserBinario() if MODO_BINARIO else ParserTramas()
+# Abre el puerto en segundo plano y lo reabre si se cae o deja de mandar tramas
+supervisor = SupervisorConexion(PORT, BAUD, cola_serial, parser, plazo=PLAZO_SILENCIO,
+                                separar=parser.separar if MODO_BINARIO else None)
 running = True
+REFRESCO_UI_MS = 100  # Refresco de las etiquetas de peso (10 Hz)
+
+# --- Registro CSV: un archivo por día en registros/, abierto mientras corre la aplicación ---
+registro_csv = RegistroRotativo([
+    "Fecha",
+    "Saco Identificado",
+    "Peso Base (kg)",
+    "Peso Objetivo (kg)",
+    "Peso Actual (kg)",
+    "Unidades Faltantes/Sobrantes",
+    "Tolerancia",
+    "Resultado"
+])
 
 # --- Datos de producto ---
 PRODUCTOS = {
@@ -25,35 +52,38 @@ tolerancia = 0.03  # por defecto 3%
 
 # --- Funciones seriales ---
 def conectar_serial():
-    global arduino
-    try:
-        if arduino and arduino.is_open:
-            arduino.close()
-        arduino = serial.Serial(PORT, BAUD, timeout=1)
-        arduino.reset_input_buffer()
+    """Botón "Conectar": cierra y reabre el puerto sin esperar al plazo de silencio"""
+    supervisor.reconectar()
+
+def mostrar_estado_serial():
+    """Refleja en la ventana el estado del supervisor (hilo de Tk)"""
+    if supervisor.conectado:
         lbl_status.config(text=f"✅ Conectado a {PORT}", foreground="green")
-    except Exception as e:
-        lbl_status.config(text=f"❌ Error al conectar: {e}", foreground="red")
+    else:
+        lbl_status.config(text=f"❌ Sin balanza en {PORT}, reintentando... {supervisor.error or ''}", foreground="red")
+    root.after(500, mostrar_estado_serial)
 
 def enviar_cmd(cmd):
-    if arduino and arduino.is_open:
-        arduino.write((cmd + '\n').encode())
+    supervisor.enviar(cmd)
 
 def leer_serial():
+    """Consume las tramas ya parseadas que publica el LectorSerial (bloquea sin gastar CPU)"""
     global ultimo_peso, peso_objetivo
     while running:
-        if arduino and arduino.in_waiting:
-            try:
-                data = arduino.readline().decode().strip()
-                if data.startswith("OBJ:"):
-                    partes = data.split(";")
-                    obj = float(partes[0].split(":")[1])
-                    act = float(partes[1].split(":")[1])
-                    dif = float(partes[2].split(":")[1])
-                    ultimo_peso = act
-                    actualizar_pesos(obj, act, dif)
-            except:
-                pass
+        try:
+            _, trama = cola_serial.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        tipo, datos = trama
+        if tipo == TRAMA_MUESTRA:
+            obj, act, dif = datos.objetivo, datos.peso, datos.diferencia
+        elif tipo == TRAMA_PESO:
+            obj, act, dif = datos
+        else:
+            continue
+        ultimo_peso = act
+        # Solo se publica; la interfaz se actualiza en el hilo de Tk
+        bomba_pesos.publicar((round(obj, 3), round(act, 3), round(dif, 3)))
 
 # --- Funciones GUI ---
 def mostrar_pantalla(frame):
@@ -79,11 +109,12 @@ def continuar_a_pesaje():
     global peso_objetivo
     unidades = PRODUCTOS[producto_actual]["unidades"]
     peso_objetivo = peso_base * unidades
-    enviar_cmd(f"OBJ:{peso_objetivo:.3f}")
+    supervisor.enviar_objetivo(peso_objetivo)  # Se repite solo si la balanza se reconecta
     lbl_peso_obj.config(text=f"OBJ: {peso_objetivo:.3f} kg")
     mostrar_pantalla(frame_pesaje)
 
 def actualizar_pesos(obj, act, dif):
+    """Se ejecuta en el hilo de Tk (vía BombaUI), nunca en el hilo serial"""
     lbl_peso_act.config(text=f"ACT: {act:.3f} kg")
     lbl_peso_dif.config(text=f"DIF: {dif:.3f} kg")
     try:
@@ -111,32 +142,19 @@ def guardar_csv():
     fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     nombre = PRODUCTOS[producto_actual]['nombre']
 
-    with open("registro_inventario.csv", "a", newline='') as f:
-        writer = csv.writer(f)
-        if f.tell() == 0:
-            writer.writerow([
-                "Fecha",
-                "Saco Identificado",
-                "Peso Base (kg)",
-                "Peso Objetivo (kg)",
-                "Peso Actual (kg)",
-                "Unidades Faltantes/Sobrantes",
-                "Tolerancia",
-                "Resultado"
-            ])
-        writer.writerow([
-            fecha,
-            nombre,
-            f"{peso_base:.3f}",
-            f"{peso_objetivo:.3f}",
-            f"{ultimo_peso:.3f}",
-            f"{unidades_faltantes:.2f}",
-            f"±{tolerancia*100:.1f}%",
-            resultado
-        ])
+    registro_csv.escribir([
+        fecha,
+        nombre,
+        f"{peso_base:.3f}",
+        f"{peso_objetivo:.3f}",
+        f"{ultimo_peso:.3f}",
+        f"{unidades_faltantes:.2f}",
+        f"±{tolerancia*100:.1f}%",
+        resultado
+    ])
 
     messagebox.showinfo("Guardado", f"Registro guardado exitosamente.\nEstado: {resultado}")
-    messagebox.showinfo("Ubicación del archivo", f"CSV guardado en:\n{os.path.abspath('registro_inventario.csv')}")
+    messagebox.showinfo("Ubicación del archivo", f"CSV guardado en:\n{os.path.abspath(registro_csv.ruta_actual)}")
     volver_menu()
 
 def volver_menu():
@@ -158,6 +176,7 @@ def cambiar_tolerancia():
     def set_tol(valor, txt):
         global tolerancia
         tolerancia = valor
+        bomba_pesos.refrescar()
         messagebox.showinfo("Tolerancia cambiada", f"Tolerancia ajustada a {txt}")
         win.destroy()
 
@@ -193,7 +212,7 @@ for key, val in PRODUCTOS.items():
 
 ttk.Button(frame_menu, text="↩️ Tare / Cero", command=tare).pack(fill="x", pady=5)
 ttk.Button(frame_menu, text="⚙️ Cambiar tolerancia", command=cambiar_tolerancia).pack(fill="x", pady=5)
-ttk.Button(frame_menu, text="💾 Ver CSV", command=lambda: messagebox.showinfo("CSV", "El archivo se guarda como 'registro_inventario.csv'")).pack(fill="x", pady=5)
+ttk.Button(frame_menu, text="💾 Ver CSV", command=lambda: messagebox.showinfo("CSV", f"Un archivo por día en '{DIRECTORIO_REGISTROS}/' (registro_inventario_AAAA-MM-DD.csv)")).pack(fill="x", pady=5)
 
 # --- Frame: Tomar muestra ---
 frame_muestra = ttk.Frame(root, padding=15)
@@ -224,14 +243,21 @@ ttk.Button(frame_pesaje, text="🏠 Volver al menú", command=volver_menu).pack(
 
 mostrar_pantalla(frame_menu)
 
+# --- Actualización de pesos en el hilo de Tk ---
+bomba_pesos = BombaUI(root, lambda valores: actualizar_pesos(*valores), REFRESCO_UI_MS)
+bomba_pesos.iniciar()
+
 # --- Hilo serial ---
 threading.Thread(target=leer_serial, daemon=True).start()
+supervisor.iniciar()
+mostrar_estado_serial()
 
 def on_close():
     global running
     running = False
-    if arduino:
-        arduino.close()
+    bomba_pesos.detener()
+    supervisor.detener()
+    registro_csv.cerrar()
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_close)
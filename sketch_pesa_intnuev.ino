@@ -1,6 +1,19 @@
 #include <HX711.h>
 #include <LiquidCrystal_I2C.h>
 
+// --- Modo de envío ---
+// 0: texto "OBJ:x;ACT:y;DIF:z" cada 500 ms a 9600 baud (promedio de 10 lecturas)
+// 1: trama binaria de 27 bytes por cada lectura del HX711 a 115200 baud, con la
+//    lectura cruda y la media móvil en cuentas (MODO_BINARIO = True en Python)
+#define MODO_BINARIO 0
+#define MUESTRAS_PROMEDIO 10
+
+#if MODO_BINARIO
+const long BAUDIOS = 115200;
+#else
+const long BAUDIOS = 9600;
+#endif
+
 HX711 scale;
 LiquidCrystal_I2C lcd(0x27, 16, 2);
 
@@ -15,8 +28,76 @@ const long OFFSET_VALOR = -91830;
 unsigned long ultimoEnvio = 0;
 unsigned long ultimoHeartbeat = 0;
 
+#if MODO_BINARIO
+// Trama binaria (little-endian, igual que protocolo.FORMATO_BINARIO)
+const uint8_t TIPO_MUESTRA = 1;
+const uint8_t TIPO_CALIBRACION = 2;  // Reemplaza al HEARTBEAT: crudo = offset, peso = escala
+
+struct __attribute__((packed)) Trama {
+  uint8_t sincronia[2];  // 0xA5 0x5A
+  uint8_t tipo;
+  uint16_t seq;
+  uint32_t ms;
+  int32_t crudo;         // Una lectura del HX711
+  int32_t promedio;      // Media móvil de las últimas MUESTRAS_PROMEDIO lecturas
+  float peso;
+  float objetivo;
+  uint16_t crc;          // CRC-16/CCITT (0x1021, inicial 0xFFFF) de los bytes anteriores
+};
+
+uint16_t seq = 0;
+long ventana[MUESTRAS_PROMEDIO];
+uint8_t posicion = 0;
+uint8_t llenas = 0;
+long suma = 0;
+
+uint16_t crc16(const uint8_t *datos, size_t n) {
+  uint16_t crc = 0xFFFF;
+  while (n--) {
+    crc ^= (uint16_t)(*datos++) << 8;
+    for (uint8_t i = 0; i < 8; i++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void enviarTrama(uint8_t tipo, long crudo, long promedio, float peso) {
+  Trama t;
+  t.sincronia[0] = 0xA5;
+  t.sincronia[1] = 0x5A;
+  t.tipo = tipo;
+  t.seq = seq++;
+  t.ms = millis();
+  t.crudo = crudo;
+  t.promedio = promedio;
+  t.peso = peso;
+  t.objetivo = peso_objetivo;
+  t.crc = crc16((const uint8_t *)&t, sizeof(Trama) - 2);
+  Serial.write((const uint8_t *)&t, sizeof(Trama));
+}
+
+void enviarCalibracion() {
+  enviarTrama(TIPO_CALIBRACION, scale.get_offset(), 0, scale.get_scale());
+}
+#endif
+
+void mostrarLCD() {
+  lcd.setCursor(0, 0);
+  lcd.print("O:");
+  lcd.print(peso_objetivo, 2);
+  lcd.print(" A:");
+  lcd.print(peso_actual, 2);
+  lcd.print("   "); // limpia restos
+
+  lcd.setCursor(0, 1);
+  lcd.print("D:");
+  lcd.print(diferencia, 3);
+  lcd.print("   ");
+}
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BAUDIOS);
   while (!Serial) {
     ; // esperar a que el puerto serie se conecte. Necesario para USB nativo
   }
@@ -25,6 +106,9 @@ void setup() {
   scale.begin(8, 9);  // DT, SCK
   scale.set_scale(SCALE_VALOR);
   scale.set_offset(OFFSET_VALOR);
+#if MODO_BINARIO
+  enviarCalibracion();  // El PC la necesita para convertir las cuentas crudas a kg
+#endif
 
   lcd.init();
   lcd.backlight();
@@ -39,12 +123,37 @@ void loop() {
   // Envía un latido cada 2 segundos para saber si el Arduino está vivo
   if (millis() - ultimoHeartbeat > 2000) {
     ultimoHeartbeat = millis();
+#if MODO_BINARIO
+    enviarCalibracion();
+#else
     Serial.println("HEARTBEAT");
+#endif
   }
 
+#if MODO_BINARIO
+  // Cada lectura sale apenas el HX711 la tiene (10 u 80 por segundo según el pin RATE)
+  if (scale.is_ready()) {
+    long crudo = scale.read();
+    suma += crudo - ventana[posicion];
+    ventana[posicion] = crudo;
+    posicion = (posicion + 1) % MUESTRAS_PROMEDIO;
+    if (llenas < MUESTRAS_PROMEDIO) llenas++;
+    long promedio = suma / llenas;
+
+    peso_actual = (promedio - scale.get_offset()) / scale.get_scale();
+    diferencia = peso_actual - peso_objetivo;
+    enviarTrama(TIPO_MUESTRA, crudo, promedio, peso_actual);
+
+    // El LCD por I2C es lento: se refresca igual que en modo texto
+    if (millis() - ultimoEnvio > 500) {
+      ultimoEnvio = millis();
+      mostrarLCD();
+    }
+  }
+#else
   // Lectura estable promediando 10 muestras
   if (scale.is_ready()) {
-    peso_actual = scale.get_units(10);
+    peso_actual = scale.get_units(MUESTRAS_PROMEDIO);
     diferencia = peso_actual - peso_objetivo;
 
     // Enviar datos al Serial solo si hay una nueva lectura
@@ -58,23 +167,14 @@ void loop() {
       Serial.println(diferencia, 3);
 
       // Mostrar en LCD
-      lcd.setCursor(0, 0);
-      lcd.print("O:");
-      lcd.print(peso_objetivo, 2);
-      lcd.print(" A:");
-      lcd.print(peso_actual, 2);
-      lcd.print("   "); // limpia restos
-
-      lcd.setCursor(0, 1);
-      lcd.print("D:");
-      lcd.print(diferencia, 3);
-      lcd.print("   ");
+      mostrarLCD();
     }
   } else {
     // Descomenta la siguiente línea si quieres un log constante cuando no está listo.
     // ¡CUIDADO! Puede inundar el puerto serial.
     // Serial.println("Scale not ready");
   }
+#endif
 
   // Comandos desde el navegador
   if (Serial.available()) {
@@ -90,10 +190,13 @@ void loop() {
       scale.tare();
       peso_objetivo = 0;
       Serial.println("Tara realizada");
+#if MODO_BINARIO
+      enviarCalibracion();  // El PC necesita el nuevo offset para convertir las cuentas
+#endif
       lcd.clear();
       lcd.print("Tara OK");
       delay(800);
       lcd.clear();
     }
   }
-}
\ No newline at end of file
+}